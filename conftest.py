@@ -0,0 +1,11 @@
+import pytest
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_configure(config):
+    """Тесты не трогают файловые кеши работающего сайта."""
+    from core.testing import isolated_caches
+
+    caches = isolated_caches()
+    caches.__enter__()
+    config.add_cleanup(lambda: caches.__exit__(None, None, None))
@@ -0,0 +1,130 @@
+"""Сериализация ответов API из values() без создания моделей.
+
+Каждый сериализатор описывает поля ответа как пути для values(), поэтому
+запрос читает только нужные колонки и делает JOIN только для полей
+связанных моделей, которые попросили в ?fields=.
+"""
+from django.core.files.storage import default_storage
+
+from posts import counters
+from posts.models import Counter
+
+
+class QueryError(Exception):
+    """Неверные параметры запроса, отвечаем 400."""
+
+
+class Serializer:
+    # Поле ответа → путь для values().
+    fields = {}
+    # Поля ответа, которые считаются после выборки.
+    extra_fields = ()
+    # Поля-файлы, отдаются ссылкой.
+    file_fields = ()
+
+    def __init__(self, requested=None):
+        available = (*self.fields, *self.extra_fields)
+        if not requested:
+            self.names = available
+            return
+        self.names = tuple(dict.fromkeys(
+            name.strip() for name in requested.split(',') if name.strip()
+        ))
+        unknown = sorted(set(self.names) - set(available))
+        if unknown:
+            raise QueryError(f'Неизвестные поля: {", ".join(unknown)}.')
+
+    def values(self, queryset, keys=()):
+        """values() с полями ответа и ключами пагинации."""
+        columns = [self.fields[name] for name in self.names if (
+            name in self.fields
+        )]
+        # pk нужен для ?ids= и дополнительных полей.
+        return queryset.values(*dict.fromkeys(('pk', *columns, *keys)))
+
+    def serialize(self, rows):
+        result = []
+        for row in rows:
+            item = {}
+            for name in self.names:
+                if name not in self.fields:
+                    continue
+                value = row[self.fields[name]]
+                if name in self.file_fields:
+                    value = default_storage.url(value) if value else None
+                item[name] = value
+            result.append(item)
+        if set(self.names) & set(self.extra_fields):
+            self.add_extra(rows, result)
+        return result
+
+    def add_extra(self, rows, items):
+        """Дополняет items полями из extra_fields одним запросом."""
+
+
+class PostSerializer(Serializer):
+    fields = {
+        'id': 'pk',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'updated': 'updated',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'image': 'image',
+    }
+    file_fields = ('image',)
+
+
+class GroupSerializer(Serializer):
+    fields = {
+        'id': 'pk',
+        'title': 'title',
+        'slug': 'slug',
+        'description': 'description',
+    }
+
+
+class CommentSerializer(Serializer):
+    fields = {
+        'id': 'pk',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    }
+
+
+class FollowSerializer(Serializer):
+    fields = {
+        'id': 'pk',
+        'user': 'user__username',
+        'author': 'author__username',
+    }
+
+
+class ProfileSerializer(Serializer):
+    fields = {
+        'id': 'pk',
+        'username': 'username',
+        'first_name': 'first_name',
+        'last_name': 'last_name',
+    }
+    # Поле ответа → вид денормализованного счётчика.
+    counter_kinds = {
+        'posts': Counter.AUTHOR_POSTS,
+        'followers': Counter.FOLLOWERS,
+        'following': Counter.FOLLOWING,
+    }
+    extra_fields = tuple(counter_kinds)
+
+    def add_extra(self, rows, items):
+        if not rows:
+            return
+        names = [name for name in self.names if name in self.counter_kinds]
+        values = counters.get(*(
+            (self.counter_kinds[name], row['pk'])
+            for row in rows for name in names
+        ))
+        for row, item in zip(rows, items):
+            for name in names:
+                item[name] = values[self.counter_kinds[name], row['pk']]
@@ -0,0 +1,231 @@
+import gzip
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from posts.utils import encode_cursor
+
+User = get_user_model()
+
+
+@override_settings(API_PAGE_SIZE=3, API_MAX_IDS=5)
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Тестовый пост {i}',
+                author=cls.author,
+                group=cls.group if i % 2 else None
+            )
+            for i in range(8)
+        ]
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.posts[0], author=cls.reader, text=f'Комментарий {i}'
+            )
+            for i in range(4)
+        ]
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(ApiTests.reader)
+
+    def collect(self, client, url, **params):
+        """Проходит список по ссылкам next, отдаёт все записи."""
+        data = client.get(url, params).json()
+        results = data['results']
+        while data['next']:
+            data = client.get(data['next']).json()
+            results += data['results']
+        return results
+
+    def test_posts_pages(self):
+        """Посты идут страницами от новых к старым без пропусков."""
+        results = self.collect(self.client, reverse('api:posts'))
+        self.assertEqual(
+            [post['id'] for post in results],
+            [post.pk for post in reversed(ApiTests.posts)]
+        )
+        self.assertEqual(results[0], {
+            'id': ApiTests.posts[-1].pk,
+            'text': 'Тестовый пост 7',
+            'pub_date': ApiTests.posts[-1].pub_date.isoformat()[:23] + 'Z',
+            'updated': ApiTests.posts[-1].updated.isoformat()[:23] + 'Z',
+            'author': 'author',
+            'group': 'test-slug',
+            'image': None,
+        })
+
+    def test_cursor_of_other_type_falls_back(self):
+        """Курсор с числом вместо даты открывает первую страницу."""
+        first = self.client.get(reverse('api:posts')).json()
+        response = self.client.get(
+            reverse('api:posts'), {'after': encode_cursor(1.5, 1, 2)}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], first['results'])
+
+    def test_previous_page(self):
+        first = self.client.get(reverse('api:posts')).json()
+        second = self.client.get(first['next']).json()
+        self.assertIsNone(first['previous'])
+        self.assertEqual(
+            self.client.get(second['previous']).json()['results'],
+            first['results']
+        )
+
+    def test_filters(self):
+        results = self.collect(
+            self.client, reverse('api:posts'), group='test-slug'
+        )
+        self.assertEqual(len(results), 4)
+        self.assertEqual({post['group'] for post in results}, {'test-slug'})
+        self.assertEqual(self.collect(
+            self.client, reverse('api:posts'), author='reader'
+        ), [])
+
+    def test_sparse_fields(self):
+        """Лишние колонки и JOIN не читаются."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('api:posts'), {'fields': 'id,text'}
+            )
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'text'})
+        self.assertNotIn('auth_user', queries[0]['sql'])
+        self.assertNotIn('"posts_post"."image"', queries[0]['sql'])
+        self.assertIn('fields=id%2Ctext', response.json()['next'])
+
+    def test_unknown_field(self):
+        response = self.client.get(reverse('api:posts'), {'fields': 'secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.json()['detail'])
+
+    def test_ids(self):
+        """?ids= отдаёт записи в заданном порядке и пропускает чужие."""
+        ids = [ApiTests.posts[2].pk, 10_000, ApiTests.posts[5].pk]
+        response = self.client.get(
+            reverse('api:posts'),
+            {'ids': ','.join(map(str, ids)), 'fields': 'id'}
+        )
+        self.assertEqual(response.json(), {'results': [
+            {'id': ApiTests.posts[2].pk}, {'id': ApiTests.posts[5].pk}
+        ]})
+
+    def test_bad_ids(self):
+        for ids in ('1,a', '', '1,2,3,4,5,6'):
+            with self.subTest(ids=ids):
+                response = self.client.get(reverse('api:posts'), {'ids': ids})
+                self.assertEqual(response.status_code, 400)
+
+    def test_compressed(self):
+        response = self.client.get(
+            reverse('api:posts'), HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        data = json.loads(gzip.decompress(response.content))
+        self.assertEqual(len(data['results']), 3)
+
+    def test_read_only(self):
+        response = self.reader_client.post(reverse('api:posts'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_details(self):
+        cases = (
+            (
+                reverse('api:post_detail',
+                        kwargs={'post_id': ApiTests.posts[0].pk}),
+                {'text': 'Тестовый пост 0'},
+            ),
+            (
+                reverse('api:group_detail', kwargs={'slug': 'test-slug'}),
+                {'title': 'Тестовая группа'},
+            ),
+            (
+                reverse('api:profile_detail', kwargs={'username': 'author'}),
+                {'last_name': 'Толстой', 'posts': 8, 'followers': 1},
+            ),
+        )
+        for url, expected in cases:
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(
+                    {name: data[name] for name in expected}, expected
+                )
+
+    def test_missing_details(self):
+        for url in (
+            reverse('api:post_detail', kwargs={'post_id': 10_000}),
+            reverse('api:post_comments', kwargs={'post_id': 10_000}),
+            reverse('api:group_detail', kwargs={'slug': 'missing'}),
+            reverse('api:profile_detail', kwargs={'username': 'missing'}),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_profiles_by_ids(self):
+        """Счётчики всех профилей читаются одним запросом."""
+        ids = f'{ApiTests.reader.pk},{ApiTests.author.pk}'
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                reverse('api:profiles'),
+                {'ids': ids, 'fields': 'username,following'}
+            )
+        self.assertEqual(response.json()['results'], [
+            {'username': 'reader', 'following': 1},
+            {'username': 'author', 'following': 0},
+        ])
+        response = self.client.get(reverse('api:profiles'))
+        self.assertEqual(response.status_code, 400)
+
+    def test_comments(self):
+        results = self.collect(
+            self.client,
+            reverse('api:post_comments',
+                    kwargs={'post_id': ApiTests.posts[0].pk}),
+            fields='text',
+        )
+        self.assertEqual(
+            results, [{'text': f'Комментарий {i}'} for i in range(4)]
+        )
+
+    def test_groups(self):
+        results = self.collect(self.client, reverse('api:groups'))
+        self.assertEqual([group['slug'] for group in results], ['test-slug'])
+
+    def test_follows_and_feed(self):
+        follows = self.collect(self.reader_client, reverse('api:follows'))
+        self.assertEqual(
+            follows,
+            [{'id': follows[0]['id'], 'user': 'reader', 'author': 'author'}]
+        )
+        feed = self.collect(
+            self.reader_client, reverse('api:feed'), fields='id'
+        )
+        self.assertEqual(
+            [post['id'] for post in feed],
+            [post.pk for post in reversed(ApiTests.posts)]
+        )
+
+    def test_login_required(self):
+        for name in ('api:follows', 'api:feed'):
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name))
+                self.assertEqual(response.status_code, 401)
@@ -0,0 +1,181 @@
+from functools import wraps
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_safe
+
+from posts.feed import feed_posts
+from posts.models import Comment, Follow, Group, Post, User
+from posts.utils import CursorPaginator
+
+from .serializers import (
+    CommentSerializer, FollowSerializer, GroupSerializer, PostSerializer,
+    ProfileSerializer, QueryError
+)
+
+
+def json_response(data, status=200):
+    # Кириллица без \uXXXX: втрое короче до сжатия.
+    return JsonResponse(
+        data, status=status, json_dumps_params={'ensure_ascii': False}
+    )
+
+
+def api_view(view):
+    """Только чтение, сжатие ответа и 400 для неверных параметров."""
+    @gzip_page
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except QueryError as error:
+            return json_response({'detail': str(error)}, status=400)
+    return wrapper
+
+
+def login_required(view):
+    """Как auth.decorators.login_required, но 401 вместо редиректа."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return json_response(
+                {'detail': 'Требуется авторизация.'}, status=401
+            )
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def parse_ids(value):
+    if value is None:
+        return None
+    try:
+        ids = list(dict.fromkeys(
+            int(pk) for pk in value.split(',') if pk.strip()
+        ))
+    except ValueError:
+        raise QueryError('ids — список чисел через запятую.')
+    if not 0 < len(ids) <= settings.API_MAX_IDS:
+        raise QueryError(f'В ids от 1 до {settings.API_MAX_IDS} чисел.')
+    return ids
+
+
+def link(request, query):
+    return f'{request.path}?{query}' if query is not None else None
+
+
+def listing(request, queryset, serializer_class, keys=None,
+            ascending=False):
+    """Страница списка по курсору или записи из ?ids= в заданном порядке.
+
+    Ссылки next и previous сохраняют остальные параметры запроса.
+    """
+    serializer = serializer_class(request.GET.get('fields'))
+    ids = parse_ids(request.GET.get('ids'))
+    if ids is not None:
+        rows = {
+            row['pk']: row
+            for row in serializer.values(queryset.filter(pk__in=ids))
+        }
+        return json_response({'results': serializer.serialize(
+            [rows[pk] for pk in ids if pk in rows]
+        )})
+    paginator = CursorPaginator(
+        serializer.values(queryset, keys or CursorPaginator.keys),
+        settings.API_PAGE_SIZE,
+        window=1,
+        keys=keys,
+        ascending=ascending,
+    )
+    page = paginator.paginate(request.GET)
+    return json_response({
+        'results': serializer.serialize(page.object_list),
+        'next': link(request, paginator.next_query),
+        'previous': link(request, paginator.previous_query),
+    })
+
+
+def detail(request, queryset, serializer_class):
+    serializer = serializer_class(request.GET.get('fields'))
+    rows = list(serializer.values(queryset)[:1])
+    if not rows:
+        return json_response({'detail': 'Не найдено.'}, status=404)
+    return json_response(serializer.serialize(rows)[0])
+
+
+@api_view
+def posts(request):
+    """Посты по дате, ?group=<slug> и ?author=<username> сужают список."""
+    queryset = Post.objects.all()
+    if 'group' in request.GET:
+        queryset = queryset.filter(group__slug=request.GET['group'])
+    if 'author' in request.GET:
+        queryset = queryset.filter(author__username=request.GET['author'])
+    return listing(request, queryset, PostSerializer)
+
+
+@api_view
+def post_detail(request, post_id):
+    return detail(request, Post.objects.filter(pk=post_id), PostSerializer)
+
+
+@api_view
+def post_comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        return json_response({'detail': 'Не найдено.'}, status=404)
+    return listing(
+        request,
+        Comment.objects.filter(post_id=post_id),
+        CommentSerializer,
+        keys=('created', 'pk'),
+        ascending=True,
+    )
+
+
+@api_view
+def groups(request):
+    return listing(
+        request, Group.objects.all(), GroupSerializer,
+        keys=('id', 'pk'), ascending=True,
+    )
+
+
+@api_view
+def group_detail(request, slug):
+    return detail(request, Group.objects.filter(slug=slug), GroupSerializer)
+
+
+@api_view
+def profiles(request):
+    """Профили только по ?ids=: список всех пользователей не отдаём."""
+    if 'ids' not in request.GET:
+        raise QueryError('Укажите ids.')
+    return listing(request, User.objects.all(), ProfileSerializer)
+
+
+@api_view
+def profile_detail(request, username):
+    return detail(
+        request, User.objects.filter(username=username), ProfileSerializer
+    )
+
+
+@api_view
+@login_required
+def follows(request):
+    """Подписки текущего пользователя в порядке оформления."""
+    return listing(
+        request,
+        Follow.objects.filter(user=request.user),
+        FollowSerializer,
+        keys=('id', 'pk'),
+        ascending=True,
+    )
+
+
+@api_view
+@login_required
+def feed(request):
+    posts, keys = feed_posts(request.user)
+    return listing(request, posts, PostSerializer, keys=keys)
@@ -0,0 +1,124 @@
+"""Допуск запросов под нагрузкой.
+
+Процесс считает запросы, которые он сейчас обрабатывает, и сглаженное
+время ожидания в очереди перед ним. Ожидание берётся из заголовка
+X-Request-Start, который ставит прокси (nginx: ``proxy_set_header
+X-Request-Start "t=${msec}"``): с синхронными воркерами только оно и
+показывает, что запросы копятся. Заголовок учитывается, только если
+SHED_TRUST_REQUEST_START говорит, что его ставит прокси: иначе клиент
+подделает его и включит сброс для всех. Запрос без заголовка считается
+не ждавшим, а среднее ещё и убывает со временем, так что одно неверное
+значение не держит сброс долго.
+
+SHED_RULES решает, что делать с адресом под нагрузкой: отдать
+сохранённую копию страницы или сразу ответить 503. Адреса без правила,
+например запись постов и комментариев, пропускаются всегда.
+"""
+import threading
+import time
+from math import ceil, exp, isfinite
+
+from django.conf import settings
+
+# Что делать с адресом под нагрузкой.
+STALE, REJECT = 'stale', 'reject'
+
+# Вес нового замера в сглаженном ожидании.
+SMOOTHING = 0.2
+# Замер ожидания обрезается до этого значения, в секундах: заголовок
+# приходит от клиента, и одно вранье не должно надолго сдвинуть среднее.
+MAX_QUEUE_WAIT = 60.0
+# За столько секунд без запросов сглаженное ожидание убывает в e раз.
+WAIT_DECAY = 5.0
+
+
+def parse_request_start(value):
+    """Время из X-Request-Start: t=секунды, миллисекунды или микросекунды.
+
+    Возвращает timestamp или None, если заголовок не разобрать или
+    значение не конечно и не положительно.
+    """
+    if value.startswith('t='):
+        value = value[2:]
+    try:
+        started = float(value)
+    except ValueError:
+        return None
+    if not isfinite(started) or started <= 0:
+        return None
+    # Секунды, миллисекунды и микросекунды от эпохи различаются на
+    # порядки, поэтому единицы видны по величине числа.
+    for _ in range(2):
+        if started > 1e11:
+            started /= 1000
+    if started > 1e11:
+        return None
+    return started
+
+
+class Admission:
+    """Нагрузка процесса: запросы в работе и ожидание в очереди."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.queue_wait = 0.0
+        self._updated = time.monotonic()
+
+    def enter(self, queue_wait=None):
+        """Учитывает новый запрос; возвращает, сколько было в работе.
+
+        queue_wait None — запрос не ждал в очереди или неизвестно сколько.
+        """
+        if queue_wait is None or not isfinite(queue_wait):
+            queue_wait = 0.0
+        now = time.monotonic()
+        with self._lock:
+            in_flight = self.in_flight
+            self.in_flight += 1
+            self.queue_wait *= exp((self._updated - now) / WAIT_DECAY)
+            self._updated = now
+            self.queue_wait += SMOOTHING * (
+                min(max(queue_wait, 0.0), MAX_QUEUE_WAIT) - self.queue_wait
+            )
+        return in_flight
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def overloaded(self, in_flight, share):
+        """Превышена ли доля share от пределов SHED_MAX_*."""
+        return (
+            in_flight >= ceil(settings.SHED_MAX_IN_FLIGHT * share)
+            or self.queue_wait >= settings.SHED_MAX_QUEUE_WAIT * share
+        )
+
+    def reset(self):
+        with self._lock:
+            self.in_flight = 0
+            self.queue_wait = 0.0
+            self._updated = time.monotonic()
+
+
+state = Admission()
+
+
+def rule(view_name):
+    """(действие, доля пределов) для адреса или None."""
+    return settings.SHED_RULES.get(view_name)
+
+
+def queue_wait(request, now=None):
+    """Сколько запрос ждал перед процессом, в секундах, или None.
+
+    None и без SHED_TRUST_REQUEST_START. Результат лежит в
+    [0, MAX_QUEUE_WAIT]: часы прокси и процесса могут расходиться.
+    """
+    value = request.META.get('HTTP_X_REQUEST_START')
+    if not value or not settings.SHED_TRUST_REQUEST_START:
+        return None
+    started = parse_request_start(value)
+    if started is None:
+        return None
+    return min(max((now or time.time()) - started, 0.0), MAX_QUEUE_WAIT)
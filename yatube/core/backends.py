@@ -0,0 +1,140 @@
+"""Бэкенды кеша и шаблонов, которые пишут замеры в core.timing."""
+import os
+import pickle
+import tempfile
+import time
+import zlib
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files import locks
+from django.core.files.move import file_move_safe
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import (
+    DjangoTemplates, Template, reraise
+)
+
+from . import timing
+
+_MISSING = object()
+
+
+class TimedCacheMixin:
+    """Считает попадания и промахи кеша и время обращений к нему."""
+
+    def get(self, key, default=None, version=None):
+        with timing.measure('cache'):
+            value = super().get(key, _MISSING, version)
+        hit = value is not _MISSING
+        timing.record_cache(hit, not hit)
+        return value if hit else default
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        with timing.measure('cache'):
+            values = super().get_many(keys, version)
+        timing.record_cache(len(values), len(keys) - len(values))
+        return values
+
+    def set(self, *args, **kwargs):
+        with timing.measure('cache'):
+            return super().set(*args, **kwargs)
+
+    def add(self, *args, **kwargs):
+        with timing.measure('cache'):
+            return super().add(*args, **kwargs)
+
+    def incr(self, *args, **kwargs):
+        with timing.measure('cache'):
+            return super().incr(*args, **kwargs)
+
+
+class SharedFileBasedCache(FileBasedCache):
+    """Файловый кеш, общий для всех процессов одной машины.
+
+    add() и incr() атомарны между процессами: они идут под блокировкой
+    файла в каталоге кеша, а incr() сохраняет срок жизни ключа. Каталог
+    листается для вытеснения не при каждой записи, а раз в CULL_EVERY
+    записей процесса.
+    """
+    CULL_EVERY = 100
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self._writes = 0
+
+    @contextmanager
+    def _locked(self):
+        self._createdir()
+        with open(os.path.join(self._dir, 'lock'), 'ab') as lock:
+            locks.lock(lock, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(lock)
+
+    def _cull(self):
+        self._writes += 1
+        if self._writes % self.CULL_EVERY == 1:
+            super()._cull()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._locked():
+            return super().add(key, value, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        fname = self._key_to_file(key, version)
+        with self._locked():
+            try:
+                with open(fname, 'rb') as f:
+                    expiry = pickle.load(f)
+                    value = pickle.loads(zlib.decompress(f.read()))
+            except (FileNotFoundError, EOFError):
+                expiry = 0
+            if expiry is not None and expiry < time.time():
+                raise ValueError(f"Key '{key}' not found")
+            value += delta
+            # Как в set(): новый файл подменяет старый целиком, и читатели
+            # без блокировки не видят его наполовину записанным.
+            fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+            with open(fd, 'wb') as f:
+                f.write(pickle.dumps(expiry, self.pickle_protocol))
+                f.write(zlib.compress(
+                    pickle.dumps(value, self.pickle_protocol)
+                ))
+            file_move_safe(tmp_path, fname, allow_overwrite=True)
+        return value
+
+
+class TimedLocMemCache(TimedCacheMixin, LocMemCache):
+    pass
+
+
+class TimedFileBasedCache(TimedCacheMixin, SharedFileBasedCache):
+    pass
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with timing.measure('template'):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates, который замеряет отрисовку шаблонов целиком.
+
+    Шаблоны из {% include %} и {% extends %} входят во время страницы.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(
+                self.engine.get_template(template_name), self
+            )
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
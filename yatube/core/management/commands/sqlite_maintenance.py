@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# PRAGMA auto_vacuum: 2 — INCREMENTAL.
+INCREMENTAL = 2
+
+
+class Command(BaseCommand):
+    help = (
+        'Обслуживание базы SQLite для запуска по расписанию (cron): '
+        'обновляет статистику планировщика, возвращает свободные '
+        'страницы и обрезает журнал WAL.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--full-analyze', action='store_true',
+            help='ANALYZE всех таблиц вместо PRAGMA optimize.'
+        )
+        parser.add_argument(
+            '--vacuum-pages', type=int, default=1000,
+            help='Сколько свободных страниц вернуть за один запуск.'
+        )
+        parser.add_argument(
+            '--enable-incremental-vacuum', action='store_true',
+            help='Перевести существующую базу в auto_vacuum=INCREMENTAL '
+                 'полным VACUUM.'
+        )
+
+    def pragma(self, cursor, sql):
+        cursor.execute(f'PRAGMA {sql}')
+        return cursor.fetchone()
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда работает только с SQLite.')
+        with connection.cursor() as cursor:
+            if options['full_analyze']:
+                cursor.execute('ANALYZE')
+            else:
+                self.pragma(cursor, 'optimize')
+            self.stdout.write('Статистика планировщика обновлена')
+
+            mode, = self.pragma(cursor, 'auto_vacuum')
+            if mode != INCREMENTAL and options['enable_incremental_vacuum']:
+                self.pragma(cursor, 'auto_vacuum = INCREMENTAL')
+                cursor.execute('VACUUM')
+                mode, = self.pragma(cursor, 'auto_vacuum')
+            if mode == INCREMENTAL:
+                before, = self.pragma(cursor, 'freelist_count')
+                cursor.execute(
+                    'PRAGMA incremental_vacuum(%d)' % options['vacuum_pages']
+                )
+                cursor.fetchall()
+                after, = self.pragma(cursor, 'freelist_count')
+                self.stdout.write(
+                    f'Освобождено страниц: {before - after}, '
+                    f'осталось свободных: {after}'
+                )
+            else:
+                self.stdout.write(
+                    'auto_vacuum выключен, запустите с '
+                    '--enable-incremental-vacuum'
+                )
+            busy, log, checkpointed = self.pragma(
+                cursor, 'wal_checkpoint(TRUNCATE)'
+            )
+            if log >= 0:
+                self.stdout.write(
+                    f'WAL: перенесено страниц {checkpointed} из {log}'
+                )
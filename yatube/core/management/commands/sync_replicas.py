@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в реплики из REPLICA_DATABASES '
+        'через backup API. Запускается по расписанию: реплики отстают '
+        'от основной базы не больше, чем на период запуска.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--replica', action='append', dest='replicas',
+            help='Реплика для обновления; по умолчанию все.'
+        )
+
+    def handle(self, *args, **options):
+        primary = connections[options['database']]
+        replicas = options['replicas'] or settings.REPLICA_DATABASES
+        if primary.vendor != 'sqlite':
+            raise CommandError('Команда работает только с SQLite.')
+        if not replicas:
+            raise CommandError('REPLICA_DATABASES пуст.')
+        primary.ensure_connection()
+        for alias in replicas:
+            replica = connections[alias]
+            if replica.vendor != 'sqlite':
+                raise CommandError(f'{alias}: реплика не на SQLite.')
+            # Читающие соединения реплики держат снимок старой копии.
+            replica.close()
+            replica.ensure_connection()
+            try:
+                primary.connection.backup(replica.connection)
+            finally:
+                replica.close()
+            self.stdout.write(f'{alias}: скопирована')
@@ -0,0 +1,157 @@
+from contextlib import ExitStack
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve, reverse
+from django.utils.cache import patch_cache_control
+
+from . import admission, routers, timing
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+class ServerTimingMiddleware:
+    """Отдаёт замеры запроса в заголовке Server-Timing.
+
+    Стоит первым в MIDDLEWARE, чтобы total включал остальные middleware.
+    Замеры запросов к адресам с именем копятся в сводке core.timing.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = timing.start()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(timings.sql)
+                    )
+                response = self.get_response(request)
+        finally:
+            timing.stop()
+        response['Server-Timing'] = timings.header()
+        match = request.resolver_match
+        if match is not None and match.view_name:
+            timing.add_sample(match.view_name, timings)
+        return response
+
+
+class LoadSheddingMiddleware:
+    """Сбрасывает нагрузку до того, как запрос дойдёт до view.
+
+    Если процесс перегружен, запросы к адресам из SHED_RULES получают
+    сохранённую копию страницы или 503 с Retry-After, а остальные
+    обрабатываются как обычно. Копии хранятся в кеше 'stale', по одной
+    на адрес и только для гостей: у вошедших шапка своя, и копия на
+    каждую сессию вытесняла бы остальные.
+
+    Стоит сразу после ServerTimingMiddleware: отказ не читает ни
+    сессию, ни базу.
+    """
+    key = 'core:stale:{}'
+    fresh_key = 'core:stale-fresh:{}'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def stale_key(self, request):
+        """Ключ копии или None, если копия запросу не положена."""
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        if settings.SESSION_COOKIE_NAME in request.COOKIES:
+            return None
+        digest = md5(request.get_full_path().encode()).hexdigest()
+        return self.key.format(digest)
+
+    def __call__(self, request):
+        try:
+            view_name = resolve(request.path_info).view_name
+        except Resolver404:
+            view_name = None
+        action, share = admission.rule(view_name) or (None, None)
+        in_flight = admission.state.enter(admission.queue_wait(request))
+        try:
+            if action and admission.state.overloaded(in_flight, share):
+                return self.shed(request, view_name, action)
+            response = self.get_response(request)
+            if action == admission.STALE:
+                self.store(request, response)
+            return response
+        finally:
+            admission.state.leave()
+
+    def store(self, request, response):
+        """Обновляет копию, если она старше SHED_STALE_REFRESH."""
+        key = self.stale_key(request)
+        if (key is None or request.method != 'GET'
+                or response.status_code != 200 or response.streaming
+                or response.cookies):
+            return
+        stale = caches['stale']
+        if stale.add(self.fresh_key.format(key), True,
+                     settings.SHED_STALE_REFRESH):
+            stale.set(
+                key,
+                (response['Content-Type'], response.content),
+                settings.SHED_STALE_TIMEOUT,
+            )
+
+    def shed(self, request, view_name, action):
+        key = self.stale_key(request)
+        if action == admission.STALE and key is not None:
+            stored = caches['stale'].get(key)
+            if stored is not None:
+                timing.record_shed(view_name, admission.STALE)
+                content_type, content = stored
+                response = HttpResponse(content, content_type=content_type)
+                response['Warning'] = '110 - "Response is Stale"'
+                patch_cache_control(response, no_cache=True, private=True)
+                return response
+        timing.record_shed(view_name, admission.REJECT)
+        response = HttpResponse(
+            'Сервер перегружен, повторите запрос позже.',
+            status=503,
+            content_type='text/plain; charset=utf-8',
+        )
+        response['Retry-After'] = str(settings.SHED_RETRY_AFTER)
+        return response
+
+
+class PrimaryPinMiddleware:
+    """Закрепляет чтение за основной базой после записи.
+
+    Если за запрос была запись, ответ ставит подписанную cookie на
+    routers.pin_seconds(), и следующие запросы пользователя читают из
+    основной базы, пока реплики её догоняют.
+    """
+    cookie = 'primary_pin'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def is_pinned(self, request):
+        if request.method not in SAFE_METHODS:
+            return True
+        if request.path.startswith(reverse('admin:index')):
+            return True
+        return request.get_signed_cookie(
+            self.cookie, default=None, max_age=routers.pin_seconds()
+        ) is not None
+
+    def __call__(self, request):
+        with routers.request_state(self.is_pinned(request)) as state:
+            response = self.get_response(request)
+            wrote = state.wrote
+        if wrote:
+            response.set_signed_cookie(
+                self.cookie, '1',
+                max_age=routers.pin_seconds(),
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,129 @@
+"""Ограничение частоты записи по пользователю и IP.
+
+Для каждого view из RATE_LIMITS держится корзина жетонов на
+пользователя и на IP: в ней до N жетонов, и они пополняются со
+скоростью N за период. Запрос забирает по жетону из обеих корзин, а
+если хоть одна пуста, получает 429 с Retry-After и ничего не забирает.
+
+Корзины лежат как (жетоны, время) в кеше ratelimit. Он должен быть
+общим для всех процессов: с кешем в памяти процесса у каждого воркера
+свои корзины, и настоящий лимит в столько раз больше, сколько воркеров.
+Чтение и запись корзин идут под замком из атомарного add() на каждую
+корзину. Если замок не взять за LOCK_ATTEMPTS попыток, запрос проверяется
+без него: тогда параллельные запросы могут пройти по одному жетону.
+Вытесненная из кеша корзина снова полна, поэтому кеш ratelimit отдельный
+и с запасом по размеру.
+"""
+import time
+from contextlib import contextmanager
+from functools import wraps
+from math import ceil
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from . import timing
+
+KEY = 'core:ratelimit:{}:{}:{}'
+LOCK_KEY = '{}:lock'
+# Замок живёт секунду, даже если процесс не успел его снять.
+LOCK_TIMEOUT = 1
+LOCK_ATTEMPTS = 5
+LOCK_WAIT = 0.01
+
+# Исход проверки для timing.record_rate_limit(): пропущен или отклонён
+# корзиной пользователя или IP.
+ALLOWED, REJECTED = 'allowed', 'rejected_{}'
+
+
+def _identities(request):
+    """Пары (область, идентификатор) для корзин запроса."""
+    if request.user.is_authenticated:
+        yield 'user', request.user.pk
+    address = request.META.get(settings.RATE_LIMIT_IP_META)
+    if address:
+        yield 'ip', address
+
+
+@contextmanager
+def _locked(cache, keys):
+    """Замки корзин keys; берутся по порядку, чтобы не ждать друг друга."""
+    acquired = []
+    try:
+        for key in sorted(keys):
+            lock = LOCK_KEY.format(key)
+            for _ in range(LOCK_ATTEMPTS):
+                if cache.add(lock, True, LOCK_TIMEOUT):
+                    acquired.append(lock)
+                    break
+                time.sleep(LOCK_WAIT)
+        yield
+    finally:
+        cache.delete_many(acquired)
+
+
+def check(request, name):
+    """Забирает жетоны запроса к name.
+
+    Возвращает None, если запрос пропущен, или через сколько секунд
+    появится жетон в пустой корзине.
+    """
+    limits = settings.RATE_LIMITS.get(name)
+    if not limits:
+        return None
+    buckets = [
+        (KEY.format(name, scope, ident), scope, *limits[scope])
+        for scope, ident in _identities(request) if scope in limits
+    ]
+    cache = caches['ratelimit']
+    keys = [key for key, *_ in buckets]
+    outcome, retry_after = ALLOWED, None
+    with _locked(cache, keys):
+        stored = cache.get_many(keys)
+        now = time.time()
+        taken = {}
+        for key, scope, capacity, period in buckets:
+            rate = capacity / period
+            tokens, updated = stored.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens < 1:
+                outcome = REJECTED.format(scope)
+                retry_after = ceil((1 - tokens) / rate)
+                break
+            taken[key] = (tokens - 1, now), period
+        else:
+            for key, (value, period) in taken.items():
+                # За период без запросов корзина наполняется заново.
+                cache.set(key, value, period)
+    # Счётчик тоже в общем кеше: пишется без замков корзин, чтобы не
+    # держать их дольше.
+    timing.record_rate_limit(name, outcome)
+    return retry_after
+
+
+def rate_limited(methods=None):
+    """Ограничивает частоту запросов к view по RATE_LIMITS.
+
+    Лимит берётся по имени адреса; methods — какие методы считаются,
+    по умолчанию все.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if methods is None or request.method in methods:
+                retry_after = check(
+                    request, request.resolver_match.view_name
+                )
+                if retry_after is not None:
+                    response = HttpResponse(
+                        'Слишком много запросов, повторите через '
+                        f'{retry_after} с.',
+                        status=429,
+                        content_type='text/plain; charset=utf-8',
+                    )
+                    response['Retry-After'] = str(retry_after)
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
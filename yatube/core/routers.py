@@ -0,0 +1,75 @@
+"""Чтение с реплик, запись в основную базу.
+
+Реплики перечислены в REPLICA_DATABASES; пока список пуст, всё идёт в
+default. PrimaryPinMiddleware закрепляет за основной базой запросы,
+которые пишут, запросы к админке и запросы пользователя, который писал
+в последние pin_seconds(): так он сразу видит свои изменения.
+"""
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Приложения, которые всегда читают из основной базы: сессия нужна сразу
+# после входа, а ключи миниатюр — сразу после их создания.
+PRIMARY_APPS = {'sessions', 'thumbnail'}
+
+_state = threading.local()
+
+
+@contextmanager
+def request_state(pinned):
+    """Состояние маршрутизации на время запроса."""
+    _state.pinned = pinned
+    _state.wrote = False
+    try:
+        yield _state
+    finally:
+        _state.pinned = _state.wrote = False
+
+
+def pin_seconds():
+    """Сколько читать из основной базы после записи.
+
+    Не меньше REPLICA_MAX_LAG: иначе пользователь попадёт на реплику,
+    которая ещё не видела его записи.
+    """
+    return max(settings.PRIMARY_PIN_SECONDS, settings.REPLICA_MAX_LAG)
+
+
+def pinned():
+    return getattr(_state, 'pinned', False)
+
+
+def reading_from_replica():
+    """Идёт ли чтение текущего запроса с реплик."""
+    return bool(settings.REPLICA_DATABASES) and not pinned()
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.REPLICA_DATABASES
+        if (
+            not replicas
+            or pinned()
+            or model._meta.app_label in PRIMARY_APPS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        _state.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Реплики получают схему вместе с копией основной базы."""
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
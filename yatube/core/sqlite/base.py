@@ -0,0 +1,55 @@
+"""Бэкенд SQLite с настройками для работы под нагрузкой.
+
+При подключении выполняются PRAGMA из PRAGMAS (их можно переопределить
+в OPTIONS['pragmas']): журнал WAL, ожидание блокировки, мягкая
+синхронизация, mmap и кеш страниц. Транзакции atomic() открываются
+через BEGIN IMMEDIATE: блокировка на запись берётся сразу, и две
+транзакции, которые сначала читают, а потом пишут, не упираются во
+взаимную блокировку, на которой SQLite не ждёт busy_timeout и сразу
+отвечает «database is locked».
+
+Перед закрытием соединения выполняется PRAGMA optimize, а ANALYZE и
+incremental_vacuum по расписанию запускает команда sqlite_maintenance.
+"""
+from django.db.backends.sqlite3 import base
+
+Database = base.Database
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    PRAGMAS = {
+        # auto_vacuum действует только для новой базы или после VACUUM.
+        'auto_vacuum': 'INCREMENTAL',
+        'journal_mode': 'WAL',
+        'busy_timeout': 5000,
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -20000,
+        'temp_store': 'MEMORY',
+    }
+    transaction_mode = 'IMMEDIATE'
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = {**self.PRAGMAS, **kwargs.pop('pragmas', {})}
+        self.transaction_mode = kwargs.pop(
+            'transaction_mode', self.transaction_mode
+        )
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}'.strip())
+
+    def _close(self):
+        if self.connection is not None:
+            try:
+                self.connection.execute('PRAGMA optimize')
+            except Database.Error:
+                pass
+        super()._close()
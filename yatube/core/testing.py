@@ -0,0 +1,45 @@
+"""Тесты и замеры на своих кешах.
+
+Файловые кеши общие для всех процессов машины, а тесты и benchmark_views
+чистят кеш и пишут в него свои данные. Поэтому они работают с копиями
+файловых кешей во временном каталоге, пустыми на старте.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+from django.utils.module_loading import import_string
+
+from .backends import SharedFileBasedCache
+
+
+@contextmanager
+def isolated_caches():
+    """Подменяет каталоги файловых кешей временным на время блока."""
+    with tempfile.TemporaryDirectory() as directory:
+        aliases = {}
+        for alias, params in settings.CACHES.items():
+            backend = import_string(params['BACKEND'])
+            if issubclass(backend, SharedFileBasedCache):
+                params = dict(
+                    params, LOCATION=os.path.join(directory, alias)
+                )
+            aliases[alias] = params
+        with override_settings(CACHES=aliases):
+            yield
+
+
+class IsolatedCachesRunner(DiscoverRunner):
+    """manage.py test на временных файловых кешах."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._caches = isolated_caches()
+        self._caches.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self._caches.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,225 @@
+import time
+from hashlib import md5
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.http import HttpResponse
+from django.test import (
+    Client, RequestFactory, TestCase, override_settings
+)
+from django.urls import reverse
+
+from posts.models import Post
+from posts.urls import urlpatterns
+
+from .. import admission, timing
+from ..middleware import LoadSheddingMiddleware
+
+User = get_user_model()
+
+
+@override_settings(
+    SHED_MAX_IN_FLIGHT=4, SHED_MAX_QUEUE_WAIT=1.0,
+    SHED_TRUST_REQUEST_START=True,
+)
+class LoadSheddingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+        cls.staff = User.objects.create_user(
+            username='staff', is_staff=True
+        )
+
+    def setUp(self):
+        cache.clear()
+        caches['stale'].clear()
+        timing.reset()
+        admission.state.reset()
+        self.client = Client()
+
+    def tearDown(self):
+        admission.state.reset()
+
+    def busy(self, in_flight):
+        """Нагрузка, как будто in_flight запросов уже в работе."""
+        admission.state.in_flight = in_flight
+
+    def test_rules_name_posts_urls(self):
+        """Правила ссылаются на существующие адреса posts/urls.py."""
+        names = {f'posts:{pattern.name}' for pattern in urlpatterns}
+        for name, (action, share) in settings.SHED_RULES.items():
+            with self.subTest(name=name):
+                self.assertIn(name, names)
+                self.assertIn(action, (admission.STALE, admission.REJECT))
+                self.assertTrue(0 < share <= 1)
+
+    def test_parse_request_start(self):
+        for value in ('t=1700000000.5', '1700000000500', '1700000000500000'):
+            with self.subTest(value=value):
+                self.assertAlmostEqual(
+                    admission.parse_request_start(value), 1700000000.5
+                )
+        for value in ('t=вчера', 't=inf', 'inf', 't=1e400', 'nan', 't=0',
+                      '-5', '1e20'):
+            with self.subTest(value=value):
+                self.assertIsNone(admission.parse_request_start(value))
+
+    def test_bad_request_start_ignored(self):
+        """Подделанный заголовок не вешает процесс и не портит среднее."""
+        for value in ('t=inf', 't=1e400', 'nan', 't=0'):
+            with self.subTest(value=value):
+                response = self.client.get(
+                    reverse('posts:index'), HTTP_X_REQUEST_START=value
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(admission.state.queue_wait, 0.0)
+
+    def test_queue_wait_clamped(self):
+        request = RequestFactory().get(
+            '/', HTTP_X_REQUEST_START='t=1000000000'
+        )
+        self.assertEqual(
+            admission.queue_wait(request), admission.MAX_QUEUE_WAIT
+        )
+        request = RequestFactory().get(
+            '/', HTTP_X_REQUEST_START=f't={time.time() + 100}'
+        )
+        self.assertEqual(admission.queue_wait(request), 0.0)
+        admission.state.enter(float('nan'))
+        self.assertEqual(admission.state.queue_wait, 0.0)
+
+    @override_settings(SHED_TRUST_REQUEST_START=False)
+    def test_untrusted_request_start_ignored(self):
+        """Без прокси заголовок клиента не влияет на нагрузку."""
+        self.client.get(reverse('posts:index'), HTTP_X_REQUEST_START='t=1')
+        self.assertEqual(admission.state.queue_wait, 0.0)
+        response = self.client.get(reverse('posts:search'), {'q': 'пост'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_bad_wait_does_not_stick(self):
+        """Одно большое ожидание гасят запросы без заголовка и время."""
+        self.client.get(reverse('posts:index'), HTTP_X_REQUEST_START='t=1')
+        self.assertEqual(admission.state.queue_wait, 12.0)
+        for _ in range(15):
+            self.client.get(reverse('posts:post_detail', kwargs={
+                'post_id': self.post.pk
+            }))
+        self.assertLess(admission.state.queue_wait, 1.0)
+        self.client.get(reverse('posts:index'), HTTP_X_REQUEST_START='t=1')
+        later = time.monotonic() + 6 * admission.WAIT_DECAY
+        with mock.patch.object(
+            admission.time, 'monotonic', return_value=later
+        ):
+            response = self.client.get(
+                reverse('posts:search'), {'q': 'пост'}
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_in_flight_released(self):
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(admission.state.in_flight, 0)
+
+    def test_reject(self):
+        """Поиск под нагрузкой сразу получает 503 с Retry-After."""
+        self.busy(2)
+        response = self.client.get(reverse('posts:search'), {'q': 'пост'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+        self.assertEqual(
+            timing.shed_summary(), {'posts:search': {'reject': 1}}
+        )
+
+    def test_unlisted_urls_admitted(self):
+        """Адреса без правила обрабатываются при любой нагрузке."""
+        self.busy(100)
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_stale_copy(self):
+        """Главная под нагрузкой отдаёт копию, сохранённую до неё."""
+        url = reverse('posts:index')
+        fresh = self.client.get(url)
+        Post.objects.create(text='Новый пост', author=self.user)
+        self.busy(3)
+        stale = self.client.get(url)
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(stale.content, fresh.content)
+        self.assertIn('Stale', stale['Warning'])
+        self.assertEqual(timing.shed_summary(), {'posts:index': {'stale': 1}})
+
+    def test_stale_without_copy(self):
+        self.busy(3)
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 503)
+
+    def test_stale_copy_for_guests_only(self):
+        """Вошедшим копия не сохраняется и не отдаётся."""
+        url = reverse('posts:index')
+        author = Client()
+        author.force_login(self.user)
+        author.get(url)
+        self.assertIsNone(caches['stale'].get(
+            LoadSheddingMiddleware.key.format(md5(url.encode()).hexdigest())
+        ))
+        self.client.get(url)
+        self.busy(3)
+        self.assertEqual(author.get(url).status_code, 503)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_stale_copy_skips_cookies(self):
+        """Ответ, ставящий cookie, в копию не попадает."""
+        request = RequestFactory().get(reverse('posts:index'))
+        response = HttpResponse('Страница')
+        response.set_cookie('csrftoken', 'secret')
+        LoadSheddingMiddleware(lambda request: response).store(
+            request, response
+        )
+        key = LoadSheddingMiddleware.key.format(
+            md5(request.get_full_path().encode()).hexdigest()
+        )
+        self.assertIsNone(caches['stale'].get(key))
+
+    def test_stale_copy_refresh(self):
+        """Копия обновляется не чаще раза в SHED_STALE_REFRESH."""
+        url = reverse('posts:index')
+        first = self.client.get(url)
+        Post.objects.create(text='Новый пост', author=self.user)
+        self.assertNotEqual(self.client.get(url).content, first.content)
+        self.busy(3)
+        self.assertEqual(self.client.get(url).content, first.content)
+
+    def test_stale_copies_leave_default_cache(self):
+        """Копии не занимают места в default и не вытесняют его ключи."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        key = LoadSheddingMiddleware.key.format(md5(url.encode()).hexdigest())
+        self.assertIsNotNone(caches['stale'].get(key))
+        self.assertFalse(cache.has_key(key))
+        self.assertFalse(
+            cache.has_key(LoadSheddingMiddleware.fresh_key.format(key))
+        )
+
+    def test_queue_wait(self):
+        """Долгое ожидание в очереди перегружает процесс без потоков."""
+        started = f't={time.time() - 30:.3f}'
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'пост'},
+            HTTP_X_REQUEST_START=started,
+        )
+        self.assertEqual(response.status_code, 503)
+        self.assertGreater(admission.state.queue_wait, 1)
+
+    def test_timings_report_load(self):
+        self.client.force_login(self.staff)
+        self.busy(2)
+        self.client.get(reverse('posts:search'))
+        load = self.client.get(reverse('core:request_timings')).json()['load']
+        # Сам запрос сводки тоже в работе.
+        self.assertEqual(load['in_flight'], 3)
+        self.assertEqual(load['shed'], {'posts:search': {'reject': 1}})
@@ -0,0 +1,46 @@
+import multiprocessing
+import tempfile
+
+from django.test import SimpleTestCase
+
+from ..backends import SharedFileBasedCache
+
+
+def increment(cache, times):
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SharedFileBasedCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = SharedFileBasedCache(directory.name, {})
+
+    def test_incr_keeps_timeout(self):
+        self.cache.set('counter', 1, timeout=None)
+        self.assertEqual(self.cache.incr('counter', 2), 3)
+        self.assertEqual(self.cache.get('counter'), 3)
+        self.cache.set('short', 1, timeout=-1)
+        for key in 'short', 'missing':
+            with self.subTest(key=key), self.assertRaises(ValueError):
+                self.cache.incr(key)
+
+    def test_add(self):
+        self.assertTrue(self.cache.add('key', 1))
+        self.assertFalse(self.cache.add('key', 2))
+        self.assertEqual(self.cache.get('key'), 1)
+
+    def test_incr_atomic_between_processes(self):
+        """Параллельные процессы не теряют увеличений."""
+        self.cache.set('counter', 0, timeout=None)
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=increment, args=(self.cache, 50))
+            for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(self.cache.get('counter'), 200)
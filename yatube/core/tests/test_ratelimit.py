@@ -0,0 +1,162 @@
+import multiprocessing
+import os
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post
+
+from .. import ratelimit, timing
+
+User = get_user_model()
+
+LIMITS = {
+    'posts:add_comment': {'user': (2, 60), 'ip': (3, 60)},
+    'posts:post_create': {'user': (1, 60)},
+    'posts:profile_follow': {'user': (1, 60)},
+}
+
+
+@override_settings(RATE_LIMITS=LIMITS)
+class RateLimitTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = [
+            User.objects.create_user(username=f'user-{number}')
+            for number in range(3)
+        ]
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.users[0]
+        )
+        cls.staff = User.objects.create_user(
+            username='staff', is_staff=True
+        )
+
+    def setUp(self):
+        caches['ratelimit'].clear()
+        timing.reset()
+        self.clients = []
+        for user in self.users:
+            client = Client()
+            client.force_login(user)
+            self.clients.append(client)
+        self.url = reverse(
+            'posts:add_comment', kwargs={'post_id': self.post.pk}
+        )
+
+    def comment(self, client):
+        return client.post(self.url, {'text': 'Комментарий'})
+
+    def test_user_bucket(self):
+        """Сверх лимита пользователь получает 429, а запись не идёт."""
+        for _ in range(2):
+            self.assertEqual(self.comment(self.clients[0]).status_code, 302)
+        response = self.comment(self.clients[0])
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(Comment.objects.count(), 2)
+
+    def test_ip_bucket(self):
+        """Разные пользователи с одного IP упираются в лимит IP."""
+        statuses = [self.comment(client).status_code for client in (
+            self.clients[0], self.clients[0], self.clients[1],
+            self.clients[2],
+        )]
+        self.assertEqual(statuses, [302, 302, 302, 429])
+
+    def test_rejected_takes_no_tokens(self):
+        """Отказ по IP не тратит жетоны пользователя."""
+        for client in self.clients:
+            self.comment(client)
+        with self.settings(RATE_LIMIT_IP_META='HTTP_X_REAL_IP'):
+            response = self.clients[2].post(
+                self.url, {'text': 'Комментарий'},
+                HTTP_X_REAL_IP='192.0.2.1',
+            )
+        self.assertEqual(response.status_code, 302)
+
+    def test_refill(self):
+        self.comment(self.clients[0])
+        self.comment(self.clients[0])
+        now = ratelimit.time.time()
+        with mock.patch.object(ratelimit.time, 'time', return_value=now + 31):
+            self.assertEqual(self.comment(self.clients[0]).status_code, 302)
+            self.assertEqual(self.comment(self.clients[0]).status_code, 429)
+
+    def test_buckets_survive_default_clear(self):
+        """Корзины лежат отдельно и не пропадают вместе с default."""
+        self.comment(self.clients[0])
+        self.comment(self.clients[0])
+        cache.clear()
+        self.assertEqual(self.comment(self.clients[0]).status_code, 429)
+
+    def test_limit_shared_between_processes(self):
+        """Процессы делят корзины и вместе не проходят сверх лимита."""
+        request = RequestFactory().post('/')
+        request.user = self.users[0]
+
+        def run():
+            os._exit(sum(
+                ratelimit.check(request, 'posts:add_comment') is None
+                for _ in range(3)
+            ))
+
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=run) for _ in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(sum(process.exitcode for process in processes), 2)
+
+    def test_form_display_not_counted(self):
+        """Показ формы поста не тратит жетоны, отправка — тратит."""
+        url = reverse('posts:post_create')
+        for _ in range(3):
+            self.assertEqual(self.clients[0].get(url).status_code, 200)
+        data = {'text': 'Новый пост'}
+        self.assertEqual(self.clients[0].post(url, data).status_code, 302)
+        self.assertEqual(self.clients[0].post(url, data).status_code, 429)
+
+    def test_follow(self):
+        client = self.clients[1]
+        for user in self.users[0], self.users[2]:
+            client.get(reverse(
+                'posts:profile_follow', kwargs={'username': user.username}
+            ))
+        self.assertEqual(
+            list(Follow.objects.values_list('author', flat=True)),
+            [self.users[0].pk],
+        )
+
+    def test_counters_in_timings(self):
+        for _ in range(3):
+            self.comment(self.clients[0])
+        staff = Client()
+        staff.force_login(self.staff)
+        limits = staff.get(reverse('core:request_timings')).json()[
+            'rate_limits'
+        ]
+        self.assertEqual(limits, {'posts:add_comment': {
+            'allowed': 2, 'rejected_user': 1, 'rejected_ratio': 1 / 3,
+        }})
+
+    def test_counters_shared_between_processes(self):
+        """Счётчики лимитов общие: их видит и другой процесс."""
+        self.comment(self.clients[0])
+        # Так же счётчик увеличил бы другой воркер.
+        caches['ratelimit'].incr(timing.COUNTER_KEY.format(
+            'ratelimit', 'posts:add_comment', 'allowed'
+        ))
+        staff = Client()
+        staff.force_login(self.staff)
+        data = staff.get(reverse('core:request_timings')).json()
+        self.assertEqual(
+            data['rate_limits']['posts:add_comment']['allowed'], 2
+        )
+        self.assertEqual(data['pid'], os.getpid())
+        self.assertIn('views', data['per_process'])
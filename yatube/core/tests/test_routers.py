@@ -0,0 +1,157 @@
+import os
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.core import signing
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+)
+
+from posts.models import Group
+
+from .. import routers
+from ..middleware import PrimaryPinMiddleware
+
+REPLICAS = ['replica1', 'replica2']
+
+
+@override_settings(REPLICA_DATABASES=REPLICAS)
+class RouterTests(SimpleTestCase):
+    router = routers.PrimaryReplicaRouter()
+
+    def test_reads_go_to_replicas(self):
+        with routers.request_state(pinned=False):
+            self.assertIn(self.router.db_for_read(Group), REPLICAS)
+            self.assertTrue(routers.reading_from_replica())
+
+    def test_pinned_reads_go_to_primary(self):
+        with routers.request_state(pinned=True):
+            self.assertEqual(self.router.db_for_read(Group), DEFAULT_DB_ALIAS)
+            self.assertFalse(routers.reading_from_replica())
+
+    def test_write_pins_rest_of_request(self):
+        """После записи запрос дочитывает из основной базы."""
+        with routers.request_state(pinned=False) as state:
+            self.assertEqual(
+                self.router.db_for_write(Group), DEFAULT_DB_ALIAS
+            )
+            self.assertTrue(state.wrote)
+            self.assertEqual(self.router.db_for_read(Group), DEFAULT_DB_ALIAS)
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_without_replicas(self):
+        with routers.request_state(pinned=False):
+            self.assertEqual(self.router.db_for_read(Group), DEFAULT_DB_ALIAS)
+
+    def test_no_migrations_on_replicas(self):
+        self.assertFalse(self.router.allow_migrate('replica1', 'posts'))
+        self.assertIsNone(self.router.allow_migrate('default', 'posts'))
+
+
+class PrimaryPinMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.seen = {}
+
+    def view(self, write=False):
+        def get_response(request):
+            self.seen['pinned'] = routers.pinned()
+            if write:
+                routers.PrimaryReplicaRouter().db_for_write(Group)
+            return HttpResponse()
+        return PrimaryPinMiddleware(get_response)
+
+    def test_post_is_pinned_and_sets_cookie(self):
+        response = self.view(write=True)(self.factory.post('/create/'))
+        self.assertTrue(self.seen['pinned'])
+        self.assertIn(PrimaryPinMiddleware.cookie, response.cookies)
+
+    def test_get_without_writes(self):
+        response = self.view()(self.factory.get('/'))
+        self.assertFalse(self.seen['pinned'])
+        self.assertNotIn(PrimaryPinMiddleware.cookie, response.cookies)
+
+    def test_cookie_pins_next_requests(self):
+        """Пользователь, который только что писал, читает своё."""
+        response = self.view(write=True)(self.factory.get('/follow/'))
+        request = self.factory.get('/')
+        request.COOKIES[PrimaryPinMiddleware.cookie] = response.cookies[
+            PrimaryPinMiddleware.cookie
+        ].value
+        self.view()(request)
+        self.assertTrue(self.seen['pinned'])
+
+    @override_settings(PRIMARY_PIN_SECONDS=10, REPLICA_MAX_LAG=30)
+    def test_pin_outlasts_replica_lag(self):
+        """Закрепление длится не меньше REPLICA_MAX_LAG."""
+        response = self.view(write=True)(self.factory.post('/create/'))
+        cookie = response.cookies[PrimaryPinMiddleware.cookie]
+        self.assertEqual(cookie['max-age'], 30)
+        now = time.time()
+        for age, pinned in (20, True), (29, True), (32, False):
+            with self.subTest(age=age):
+                request = self.factory.get('/')
+                request.COOKIES[PrimaryPinMiddleware.cookie] = cookie.value
+                with mock.patch.object(
+                    signing.time, 'time', return_value=now + age
+                ):
+                    self.view()(request)
+                self.assertIs(self.seen['pinned'], pinned)
+
+    def test_forged_cookie_ignored(self):
+        request = self.factory.get('/')
+        request.COOKIES[PrimaryPinMiddleware.cookie] = '1'
+        self.view()(request)
+        self.assertFalse(self.seen['pinned'])
+
+    def test_admin_is_pinned(self):
+        self.view()(self.factory.get('/admin/posts/post/'))
+        self.assertTrue(self.seen['pinned'])
+
+    def test_state_reset_after_request(self):
+        self.view(write=True)(self.factory.post('/create/'))
+        self.assertFalse(routers.pinned())
+
+
+class ReplicaSyncTests(TransactionTestCase):
+    alias = 'replica_sync'
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        connections.databases[self.alias] = {
+            'ENGINE': 'core.sqlite',
+            'NAME': os.path.join(self.directory.name, 'replica.sqlite3'),
+        }
+        self.settings = override_settings(REPLICA_DATABASES=[self.alias])
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        connections[self.alias].close()
+        del connections[self.alias]
+        del connections.databases[self.alias]
+        self.directory.cleanup()
+
+    def replica_slugs(self):
+        with routers.request_state(pinned=False):
+            return set(Group.objects.values_list('slug', flat=True))
+
+    def test_replica_sees_writes_after_sync(self):
+        call_command('sync_replicas', stdout=StringIO())
+        Group.objects.create(title='Группа', slug='group')
+        self.assertEqual(self.replica_slugs(), set())
+        call_command('sync_replicas', stdout=StringIO())
+        self.assertEqual(self.replica_slugs(), {'group'})
+
+    def test_atomic_reads_from_primary(self):
+        """Чтение внутри транзакции видит её же незакоммиченные записи."""
+        with routers.request_state(pinned=False):
+            with transaction.atomic():
+                self.assertEqual(
+                    Group.objects.db_manager().db, DEFAULT_DB_ALIAS
+                )
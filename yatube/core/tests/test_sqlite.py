@@ -0,0 +1,68 @@
+import os
+import sqlite3
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.test import SimpleTestCase
+
+
+class SQLiteBackendTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'test.sqlite3')
+        self.alias = f'sqlite_{self._testMethodName}'
+        connections.databases[self.alias] = {
+            'ENGINE': 'core.sqlite',
+            'NAME': self.path,
+        }
+        self.connection = connections[self.alias]
+
+    def tearDown(self):
+        self.connection.close()
+        del connections[self.alias]
+        del connections.databases[self.alias]
+        self.directory.cleanup()
+
+    def pragma(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas(self):
+        """При подключении включаются WAL и остальные PRAGMA."""
+        expected = {
+            'journal_mode': 'wal',
+            'busy_timeout': 5000,
+            'synchronous': 1,
+            'auto_vacuum': 2,
+            'cache_size': -20000,
+        }
+        for name, value in expected.items():
+            with self.subTest(name=name):
+                self.assertEqual(self.pragma(name), value)
+
+    def test_atomic_takes_write_lock(self):
+        """atomic() сразу берёт блокировку на запись."""
+        other = sqlite3.connect(self.path, timeout=0, isolation_level=None)
+        self.addCleanup(other.close)
+        with transaction.atomic(using=self.alias):
+            with self.assertRaisesMessage(
+                sqlite3.OperationalError, 'locked'
+            ):
+                other.execute('BEGIN IMMEDIATE')
+        other.execute('BEGIN IMMEDIATE')
+        other.execute('ROLLBACK')
+
+
+class StressCommandTests(SimpleTestCase):
+    def test_no_lock_errors(self):
+        """Под параллельной записью core.sqlite не отвечает «locked»."""
+        out = StringIO()
+        call_command('stress_sqlite', threads=4, writes=25, stdout=out)
+        row = next(
+            line.split() for line in out.getvalue().splitlines()
+            if line.startswith('core.sqlite')
+        )
+        self.assertEqual(row[1:3], ['100', '0'])
@@ -0,0 +1,95 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+
+from .. import timing
+
+User = get_user_model()
+
+
+def server_timing(response):
+    """{метрика: (длительность, описание)} из заголовка Server-Timing."""
+    metrics = {}
+    for part in response['Server-Timing'].split(', '):
+        name, *params = part.split(';')
+        values = dict(param.split('=', 1) for param in params)
+        metrics[name] = (float(values['dur']), values.get('desc', ''))
+    return metrics
+
+
+class ServerTimingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        Post.objects.create(text='Тестовый пост', author=cls.user)
+        cls.staff = User.objects.create_user(
+            username='staff', is_staff=True
+        )
+
+    def setUp(self):
+        cache.clear()
+        timing.reset()
+        self.client = Client()
+
+    def test_header(self):
+        """Заголовок содержит все метрики и число SQL-запросов."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        metrics = server_timing(response)
+        self.assertEqual(
+            set(metrics), {'db', 'tpl', 'thumb', 'cache', 'app', 'total'}
+        )
+        self.assertEqual(metrics['db'][1], f'"{len(queries)} queries"')
+        self.assertGreater(metrics['tpl'][0], 0)
+        self.assertLessEqual(metrics['tpl'][0], metrics['total'][0])
+
+    def test_cache_hits(self):
+        """Повторный показ страницы берёт список из кеша."""
+        url = reverse('posts:index')
+        first = server_timing(self.client.get(url))['cache'][1]
+        second = server_timing(self.client.get(url))['cache'][1]
+        hits = re.compile(r'(\d+) hits')
+        self.assertGreater(
+            int(hits.search(second)[1]), int(hits.search(first)[1])
+        )
+
+    def test_summary_for_staff_only(self):
+        """Сводку по адресам видит только персонал."""
+        for _ in range(3):
+            self.client.get(reverse('posts:index'))
+        url = reverse('core:request_timings')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+        self.client.force_login(ServerTimingTests.staff)
+        views = self.client.get(url).json()['views']
+        self.assertEqual(views['posts:index']['requests'], 3)
+        self.assertLessEqual(
+            views['posts:index']['p50_ms'], views['posts:index']['p99_ms']
+        )
+
+    def test_lookup_summary(self):
+        """Доля попаданий считает и отрицательные попадания."""
+        timing.reset()
+        for outcome in ('misses', 'hits', 'hits', 'negative_hits'):
+            timing.record_lookup('group', outcome)
+        self.client.force_login(ServerTimingTests.staff)
+        lookups = self.client.get(
+            reverse('core:request_timings')
+        ).json()['lookups']
+        self.assertEqual(lookups['group']['hit_ratio'], 0.75)
+        self.assertEqual(lookups['group']['negative_hits'], 1)
+
+    def test_percentile(self):
+        """Перцентиль считается по ближайшему рангу."""
+        timings = list(range(1, 101))
+        self.assertEqual(timing.percentile(timings, 50), 50)
+        self.assertEqual(timing.percentile(timings, 99), 99)
+        self.assertEqual(timing.percentile([7], 95), 7)
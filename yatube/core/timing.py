@@ -0,0 +1,275 @@
+"""Замеры времени внутри запроса и сводка по адресам.
+
+ServerTimingMiddleware создаёт RequestTimings на время запроса, а
+SQL-обёртка, шаблоны, кеш и миниатюры добавляют в него свои замеры
+через measure() и record_cache(). Сводка хранит последние TIMING_WINDOW
+запросов каждого адреса в памяти процесса, record_lookup() считает
+попадания в кеши строк вроде posts.lookups, record_shed() — запросы,
+сброшенные LoadSheddingMiddleware, а record_rate_limit() — пропущенные и
+отклонённые core.ratelimit.
+
+Замеры и кеши строк — свои у каждого процесса. Сброс и лимиты считаются
+в общем кеше ratelimit, рядом с корзинами: их итог по всем воркерам и
+нужен, чтобы подобрать пределы.
+"""
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from math import ceil
+from time import perf_counter
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import admission
+
+COUNTER_KEY = 'core:timing:{}:{}:{}'
+
+_local = threading.local()
+_lock = threading.Lock()
+_samples = {}
+_requests = defaultdict(int)
+_lookups = defaultdict(lambda: defaultdict(int))
+
+# Метрики заголовка Server-Timing: (атрибут, имя в заголовке).
+METRICS = (
+    ('db', 'db'),
+    ('template', 'tpl'),
+    ('thumbnail', 'thumb'),
+    ('cache', 'cache'),
+    ('app', 'app'),
+    ('total', 'total'),
+)
+
+
+def percentile(timings, p):
+    """Перцентиль по ближайшему рангу для отсортированного списка."""
+    return timings[max(ceil(p / 100 * len(timings)) - 1, 0)]
+
+
+class RequestTimings:
+    """Замеры одного запроса, время в секундах."""
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.queries = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.db = self.template = self.thumbnail = self.cache = 0.0
+        self.total = 0.0
+        self._active = set()
+
+    @property
+    def app(self):
+        """Время самого приложения без базы, шаблонов и кеша."""
+        return max(self.total - self.db - self.template - self.cache, 0.0)
+
+    def finish(self):
+        self.total = perf_counter() - self.started
+
+    def sql(self, execute, sql, params, many, context):
+        """Обёртка для connection.execute_wrapper()."""
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += perf_counter() - started
+            self.queries += 1
+
+    def header(self):
+        """Значение заголовка Server-Timing."""
+        parts = []
+        for attr, name in METRICS:
+            part = f'{name};dur={getattr(self, attr) * 1000:.2f}'
+            if attr == 'db':
+                part += f';desc="{self.queries} queries"'
+            elif attr == 'cache':
+                part += (
+                    f';desc="{self.cache_hits} hits / '
+                    f'{self.cache_misses} misses"'
+                )
+            parts.append(part)
+        return ', '.join(parts)
+
+
+def start():
+    _local.timings = RequestTimings()
+    return _local.timings
+
+
+def stop():
+    timings = current()
+    _local.timings = None
+    if timings:
+        timings.finish()
+    return timings
+
+
+def current():
+    return getattr(_local, 'timings', None)
+
+
+@contextmanager
+def measure(metric):
+    """Добавляет время блока к метрике текущего запроса.
+
+    Вложенные замеры той же метрики не считаются второй раз.
+    """
+    timings = current()
+    if timings is None or metric in timings._active:
+        yield
+        return
+    timings._active.add(metric)
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        timings._active.discard(metric)
+        setattr(
+            timings, metric,
+            getattr(timings, metric) + perf_counter() - started
+        )
+
+
+def record_cache(hits, misses):
+    timings = current()
+    if timings is not None:
+        timings.cache_hits += hits
+        timings.cache_misses += misses
+
+
+def record_lookup(name, outcome):
+    """Считает исход поиска в кеше строк name: hits, misses и т.п."""
+    with _lock:
+        _lookups[name][outcome] += 1
+
+
+def lookup_summary():
+    """Счётчики кешей строк и доля попаданий, включая отрицательные."""
+    with _lock:
+        lookups = {name: dict(counts) for name, counts in _lookups.items()}
+    result = {}
+    for name, counts in sorted(lookups.items()):
+        total = sum(counts.values())
+        misses = counts.get('misses', 0)
+        result[name] = dict(
+            counts, hit_ratio=(total - misses) / total if total else None
+        )
+    return result
+
+
+def _count(kind, name, outcome):
+    """Увеличивает общий счётчик исхода outcome для адреса name."""
+    cache = caches['ratelimit']
+    key = COUNTER_KEY.format(kind, name, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def _counts(kind, outcomes):
+    """{адрес: {исход: число}} по парам (адрес, исход) из outcomes."""
+    keys = {
+        COUNTER_KEY.format(kind, name, outcome): (name, outcome)
+        for name, outcome in outcomes
+    }
+    result = defaultdict(dict)
+    for key, value in caches['ratelimit'].get_many(keys).items():
+        name, outcome = keys[key]
+        result[name][outcome] = value
+    return {name: result[name] for name in sorted(result)}
+
+
+def _shed_outcomes():
+    return [
+        (name, outcome) for name in settings.SHED_RULES
+        for outcome in (admission.STALE, admission.REJECT)
+    ]
+
+
+def _rate_limit_outcomes():
+    # ratelimit сам импортирует timing.
+    from .ratelimit import ALLOWED, REJECTED
+    return [
+        (name, outcome) for name, limits in settings.RATE_LIMITS.items()
+        for outcome in (ALLOWED, *map(REJECTED.format, limits))
+    ]
+
+
+def record_shed(name, outcome):
+    """Считает сброшенный запрос к адресу name: stale или reject."""
+    _count('shed', name, outcome)
+
+
+def shed_summary():
+    return _counts('shed', _shed_outcomes())
+
+
+def record_rate_limit(name, outcome):
+    """Считает проверку лимита name: allowed, rejected_user и т.п."""
+    _count('ratelimit', name, outcome)
+
+
+def rate_limit_summary():
+    """Счётчики лимитов и доля отклонённых запросов."""
+    limits = _counts('ratelimit', _rate_limit_outcomes())
+    result = {}
+    for name, counts in sorted(limits.items()):
+        total = sum(counts.values())
+        rejected = total - counts.get('allowed', 0)
+        result[name] = dict(counts, rejected_ratio=rejected / total)
+    return result
+
+
+def add_sample(name, timings):
+    """Запоминает замеры запроса к адресу name."""
+    sample = (
+        timings.total, timings.queries, timings.db, timings.template,
+        timings.cache_hits, timings.cache_misses,
+    )
+    with _lock:
+        _samples.setdefault(
+            name, deque(maxlen=settings.TIMING_WINDOW)
+        ).append(sample)
+        _requests[name] += 1
+
+
+def summary():
+    """Сводка по адресам: перцентили времени и средние по окну, в мс."""
+    with _lock:
+        samples = {name: list(values) for name, values in _samples.items()}
+        requests = dict(_requests)
+    result = {}
+    for name, values in sorted(samples.items()):
+        count = len(values)
+        totals = sorted(value[0] for value in values)
+        hits = sum(value[4] for value in values)
+        lookups = hits + sum(value[5] for value in values)
+        result[name] = {
+            'requests': requests[name],
+            'window': count,
+            'p50_ms': percentile(totals, 50) * 1000,
+            'p95_ms': percentile(totals, 95) * 1000,
+            'p99_ms': percentile(totals, 99) * 1000,
+            'queries': sum(value[1] for value in values) / count,
+            'db_ms': sum(value[2] for value in values) / count * 1000,
+            'template_ms': sum(value[3] for value in values) / count * 1000,
+            'cache_hit_ratio': hits / lookups if lookups else None,
+        }
+    return result
+
+
+def reset():
+    with _lock:
+        _samples.clear()
+        _requests.clear()
+        _lookups.clear()
+    caches['ratelimit'].delete_many(
+        [COUNTER_KEY.format('shed', *pair) for pair in _shed_outcomes()]
+        + [
+            COUNTER_KEY.format('ratelimit', *pair)
+            for pair in _rate_limit_outcomes()
+        ]
+    )
@@ -1,5 +1,12 @@
+import os
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from . import admission, timing
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +22,27 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+def request_timings(request):
+    """Сводка замеров по адресам для персонала.
+
+    Замеры, кеши строк и нагрузка — только этого процесса pid, а
+    load.shed и rate_limits — общие для всех процессов.
+    """
+    return JsonResponse({
+        'pid': os.getpid(),
+        'per_process': [
+            'views', 'lookups', 'load.in_flight', 'load.queue_wait_ms',
+        ],
+        'window': settings.TIMING_WINDOW,
+        'views': timing.summary(),
+        'lookups': timing.lookup_summary(),
+        'load': {
+            'in_flight': admission.state.in_flight,
+            'queue_wait_ms': admission.state.queue_wait * 1000,
+            'shed': timing.shed_summary(),
+        },
+        'rate_limits': timing.rate_limit_summary(),
+    })
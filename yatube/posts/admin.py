@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Group, Post, Follow, Comment
+from .search import filter_posts
 
 EMPTY = '-пусто-'
 
@@ -17,6 +18,12 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = EMPTY
 
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет по тексту поста через индекс FTS5, а не LIKE."""
+        if not search_term:
+            return queryset, False
+        return filter_posts(queryset, search_term, comments=False), False
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
@@ -0,0 +1,179 @@
+"""Версии кеша для фрагментов со списками постов.
+
+Ключ фрагмента содержит номер версии списка, поэтому при изменении поста
+достаточно увеличить версию: старые фрагменты больше не читаются и
+вытесняются по таймауту.
+
+Рядом с версией хранится время последнего изменения области: из него
+строятся ETag и Last-Modified страниц. Время меняется и там, где версию
+фрагментов увеличивать незачем: при комментариях и подписках.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import QueryDict
+
+from core import routers
+
+from .utils import CURSOR_PARAMS, CursorPaginator
+
+VERSION_KEY = 'posts:listing-version:{}'
+MODIFIED_KEY = 'posts:modified:{}'
+PAGE_KEY = 'posts:listing-page:{}:{}:{}'
+
+
+def index_scope():
+    return 'index'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def profile_scope(author_id):
+    return f'profile:{author_id}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def follows_scope(user_id):
+    return f'follows:{user_id}'
+
+
+def feed_scope(user_id):
+    """Лента подписок пользователя."""
+    return f'feed:{user_id}'
+
+
+def all_feeds_scope():
+    """Все ленты сразу: для массовой загрузки без сигналов."""
+    return 'feeds'
+
+
+def suggestions_scope():
+    """Рекомендации подписок, которые показываются на страницах."""
+    return 'suggestions'
+
+
+def post_scopes(post, group_id=None):
+    """Списки, в которые попадает пост."""
+    scopes = [index_scope(), profile_scope(post.author_id)]
+    for pk in {post.group_id, group_id} - {None}:
+        scopes.append(group_scope(pk))
+    return scopes
+
+
+def bump(*scopes):
+    """Увеличивает версии списков.
+
+    Если версия вытеснена из кеша, она начинается заново с текущего
+    времени в миллисекундах, чтобы не совпасть с уже сохранёнными
+    фрагментами.
+    """
+    for scope in scopes:
+        key = VERSION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, int(time.time() * 1000), timeout=None)
+    touch(*scopes)
+
+
+def touch(*scopes):
+    """Отмечает, что содержимое областей изменилось сейчас."""
+    now = time.time()
+    cache.set_many(
+        {MODIFIED_KEY.format(scope): now for scope in scopes}, timeout=None
+    )
+
+
+def modified(*scopes):
+    """Время последнего изменения областей, timestamp.
+
+    Вытесненное из кеша время считается текущим: страница один раз
+    отдаётся целиком, но никогда не получает 304 по устаревшему времени.
+    """
+    keys = [MODIFIED_KEY.format(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        now = time.time()
+        for key in missing:
+            if not cache.add(key, now, timeout=None):
+                found[key] = cache.get(key, now)
+            else:
+                found[key] = now
+    return max(found.values(), default=0.0)
+
+
+def get_version(scope):
+    key = VERSION_KEY.format(scope)
+    version = cache.get(key)
+    if version is None:
+        version = int(time.time() * 1000)
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def listing_timeout():
+    """Сколько хранить список постов под текущей версией.
+
+    Список, собранный по данным реплики, может не содержать последних
+    изменений при уже новой версии, поэтому живёт не дольше
+    REPLICA_MAX_LAG.
+    """
+    timeout = settings.LISTING_CACHE_TIMEOUT
+    if routers.reading_from_replica():
+        timeout = min(timeout, settings.REPLICA_MAX_LAG)
+    return timeout
+
+
+def cursor_params(request):
+    """Только параметры пагинатора из адреса запроса."""
+    params = QueryDict(mutable=True)
+    for name in CURSOR_PARAMS:
+        if name in request.GET:
+            params[name] = request.GET[name]
+    return params
+
+
+def listing_cache_context(request, scope):
+    """Переменные для {% cache %} вокруг списка постов.
+
+    В ключ страницы входят только параметры пагинатора: иначе любой
+    выдуманный параметр в адресе заводил бы новый фрагмент в кеше.
+    """
+    return {
+        'listing_timeout': listing_timeout(),
+        'listing_version': get_version(scope),
+        'listing_page': cursor_params(request).urlencode(),
+    }
+
+
+def listing_context(request, post_list, scope):
+    """Страница списка постов и переменные для {% cache %} вокруг неё.
+
+    Положение страницы — номер, ссылки и id постов — хранится под той же
+    версией, что и фрагмент. При попадании пагинатор не ходит в базу, а
+    посты страницы читаются, только если шаблону не хватило фрагмента.
+    Ссылки строятся без посторонних параметров адреса: иначе один запрос
+    с ними попал бы в ссылки у всех следующих посетителей.
+    """
+    context = listing_cache_context(request, scope)
+    key = PAGE_KEY.format(
+        scope, context['listing_version'], context['listing_page']
+    )
+    paginator = CursorPaginator(post_list, settings.NUMBER_OF_POSTS)
+    params = cursor_params(request)
+    state = cache.get(key)
+    if state is None:
+        page = paginator.paginate(params)
+        cache.set(key, paginator.state(page), context['listing_timeout'])
+    else:
+        page = paginator.restore(params, state)
+    context['page_obj'] = page
+    return context
@@ -0,0 +1,103 @@
+"""Условные GET-запросы к страницам постов.
+
+Декоратор conditional считает ETag и Last-Modified по времени изменения
+страницы до вызова view и отвечает 304, если страница у клиента не
+устарела: без выборки постов и рендеринга шаблона. Время берётся из
+caching.modified() и поля Post.updated.
+"""
+from functools import wraps
+from hashlib import md5
+
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers
+)
+from django.utils.http import http_date
+
+from . import caching, feed, lookups
+from .models import Post
+
+
+def conditional(get_modified):
+    """Добавляет view ETag и Last-Modified.
+
+    get_modified получает аргументы view и возвращает время изменения
+    страницы или None, если страницы нет, тогда view вызывается как
+    обычно. Лишние аргументы адреса, например формат ленты, get_modified
+    принимает в **kwargs. В ETag входит пользователь: шапка страницы у
+    каждого своя.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            timestamp = get_modified(request, *args, **kwargs)
+            if timestamp is None:
+                return view(request, *args, **kwargs)
+            digest = md5(f'{request.user.pk}:{timestamp!r}'.encode())
+            etag = f'W/"{digest.hexdigest()}"'
+            last_modified = int(timestamp)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = view(request, *args, **kwargs)
+            response.setdefault('ETag', etag)
+            response.setdefault('Last-Modified', http_date(last_modified))
+            # Без no-cache браузер сам решает, сколько держать страницу,
+            # и не спрашивает сервер.
+            patch_cache_control(
+                response,
+                no_cache=True,
+                private=request.user.is_authenticated,
+            )
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
+
+
+def index_modified(request, **kwargs):
+    return caching.modified(caching.index_scope())
+
+
+def group_modified(request, slug, **kwargs):
+    group = lookups.groups.get(slug)
+    if group is None:
+        return None
+    return caching.modified(caching.group_scope(group.pk))
+
+
+def profile_modified(request, username, **kwargs):
+    """Посты автора, его подписчики, подписки и рекомендации."""
+    author = lookups.users.get(username)
+    if author is None:
+        return None
+    return caching.modified(
+        caching.profile_scope(author.pk),
+        caching.follows_scope(author.pk),
+        caching.suggestions_scope(),
+    )
+
+
+def post_modified(request, post_id):
+    """Сам пост, его комментарии, счётчик постов автора и группа."""
+    row = Post.objects.filter(pk=post_id).values_list(
+        'updated', 'author_id', 'group_id'
+    ).first()
+    if row is None:
+        return None
+    updated, author_id, group_id = row
+    scopes = [caching.post_scope(post_id), caching.profile_scope(author_id)]
+    if group_id is not None:
+        scopes.append(caching.group_scope(group_id))
+    return max(updated.timestamp(), caching.modified(*scopes))
+
+
+def feed_modified(request):
+    """Посты авторов из подписок, сами подписки и рекомендации."""
+    return caching.modified(
+        caching.follows_scope(request.user.pk),
+        caching.suggestions_scope(),
+        *feed.scopes(request.user.pk)
+    )
@@ -0,0 +1,128 @@
+"""Денормализованные счётчики постов, подписок и комментариев.
+
+Значения меняются сигналами в той же транзакции, что и сама запись,
+а команда reconcile_counters пересчитывает их по таблицам.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+
+from .models import Comment, Counter, Follow, Post
+
+
+def change(kind, object_id, delta):
+    """Прибавляет delta к счётчику, создавая его при первом увеличении.
+
+    Значение не опускается ниже нуля: разошедшийся счётчик не должен
+    мешать удалению записи, его поправит reconcile_counters.
+    """
+    if object_id is None:
+        return
+    counters = Counter.objects.filter(kind=kind, object_id=object_id)
+    value = Greatest(F('value') + delta, 0)
+    if counters.update(value=value) or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            Counter.objects.create(kind=kind, object_id=object_id, value=delta)
+    except IntegrityError:
+        counters.update(value=value)
+
+
+def get(*pairs):
+    """Возвращает {(kind, object_id): value} для пар (kind, object_id).
+
+    Отсутствующие счётчики равны нулю.
+    """
+    values = dict.fromkeys(pairs, 0)
+    query = Q()
+    for kind, object_id in pairs:
+        query |= Q(kind=kind, object_id=object_id)
+    for kind, object_id, value in Counter.objects.filter(query).values_list(
+        'kind', 'object_id', 'value'
+    ):
+        values[kind, object_id] = value
+    return values
+
+
+def for_author(author):
+    """Счётчики для страницы автора."""
+    values = get(
+        (Counter.AUTHOR_POSTS, author.pk),
+        (Counter.FOLLOWERS, author.pk),
+        (Counter.FOLLOWING, author.pk),
+    )
+    return {kind: value for (kind, _), value in values.items()}
+
+
+def for_group(group):
+    """Счётчики для страницы группы."""
+    values = get((Counter.GROUP_POSTS, group.pk))
+    return {kind: value for (kind, _), value in values.items()}
+
+
+def for_post(post):
+    """Счётчики для страницы поста."""
+    values = get(
+        (Counter.AUTHOR_POSTS, post.author_id),
+        (Counter.POST_COMMENTS, post.pk),
+    )
+    return {kind: value for (kind, _), value in values.items()}
+
+
+def count_all(post_model, comment_model, follow_model, using='default'):
+    """Считает все счётчики по таблицам, отдаёт (kind, object_id, value).
+
+    Модели передаются явно, чтобы функцию можно было вызвать из миграции.
+    """
+    posts = post_model.objects.using(using)
+    follows = follow_model.objects.using(using)
+    sources = (
+        (Counter.AUTHOR_POSTS, posts, 'author'),
+        (Counter.GROUP_POSTS, posts.filter(group__isnull=False), 'group'),
+        (Counter.FOLLOWERS, follows, 'author'),
+        (Counter.FOLLOWING, follows, 'user'),
+        (Counter.POST_COMMENTS, comment_model.objects.using(using), 'post'),
+    )
+    for kind, queryset, field in sources:
+        rows = queryset.order_by().values_list(field).annotate(n=Count('pk'))
+        for object_id, value in rows.iterator():
+            yield kind, object_id, value
+
+
+def reconcile(counter_model=Counter, post_model=Post, comment_model=Comment,
+              follow_model=Follow, batch_size=None, using='default'):
+    """Пересчитывает все счётчики заново и возвращает число исправленных.
+
+    Без batch_size размер пачки выбирает бэкенд: SQLite не принимает
+    больше 500 строк в одном INSERT.
+    """
+    counters = counter_model.objects.using(using)
+    with transaction.atomic(using=using):
+        stored = {
+            (kind, object_id): value
+            for kind, object_id, value in counters.values_list(
+                'kind', 'object_id', 'value'
+            ).iterator()
+        }
+        actual = {
+            (kind, object_id): value
+            for kind, object_id, value in count_all(
+                post_model, comment_model, follow_model, using
+            )
+        }
+        fixed = sum(
+            stored.get(key, 0) != actual.get(key, 0)
+            for key in stored.keys() | actual.keys()
+        )
+        if not fixed:
+            return 0
+        counters.all().delete()
+        counters.bulk_create(
+            (
+                counter_model(kind=kind, object_id=object_id, value=value)
+                for (kind, object_id), value in actual.items()
+            ),
+            batch_size=batch_size,
+        )
+    return fixed
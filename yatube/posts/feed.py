@@ -0,0 +1,347 @@
+"""Лента подписок: раскладка постов по лентам при записи.
+
+Посты автора копируются в FeedEntry каждого подписчика, поэтому чтение
+ленты сводится к одному проходу по индексу (user, -pub_date). Авторов,
+у которых подписчиков больше FEED_FANOUT_LIMIT, не раскладываем: их посты
+дочитываются из Post при показе ленты.
+
+Список авторов из PulledAuthor, как и подписки в posts.follows, хранится
+в кеше отсортированным array('I'), поэтому лента не читает Follow.
+"""
+import heapq
+from array import array
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, OuterRef, Subquery
+
+from . import caching, follows
+from .models import FeedEntry, Follow, Post, PulledAuthor
+
+PULLED_KEY = 'posts:pulled-authors'
+
+
+def _entries(post, user_ids):
+    return [
+        FeedEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in user_ids
+    ]
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора.
+
+    Возвращает подписчиков, чьи ленты изменились.
+    """
+    limit = settings.FEED_FANOUT_LIMIT
+    if PulledAuthor.objects.filter(author_id=post.author_id).exists():
+        return []
+    followers = list(
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)[:limit + 1]
+    )
+    if len(followers) > limit:
+        PulledAuthor.objects.get_or_create(author_id=post.author_id)
+        return []
+    FeedEntry.objects.bulk_create(
+        _entries(post, followers),
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    return followers
+
+
+def readers(author_id):
+    """Подписчики, в ленты которых разложены посты автора.
+
+    У авторов из PulledAuthor таких нет: их посты читаются при показе,
+    и время изменения ленты берётся из profile_scope автора.
+    """
+    if follows.contains(pulled_authors(), author_id):
+        return []
+    return list(
+        Follow.objects.filter(author_id=author_id)
+        .values_list('user_id', flat=True)
+    )
+
+
+def fan_out_many(posts):
+    """Раскладывает пачку постов по лентам уже существующих подписчиков.
+
+    Для массовой загрузки, где post_save не шлётся. Авторов, у которых
+    подписчиков больше FEED_FANOUT_LIMIT, пропускает: их переводит в
+    PulledAuthor pull_popular_authors(). Возвращает число записей.
+    """
+    limit = settings.FEED_FANOUT_LIMIT
+    by_author = defaultdict(list)
+    for post in posts:
+        by_author[post.author_id].append(post)
+    pulled = pulled_authors()
+    authors = [
+        author_id for author_id in by_author
+        if not follows.contains(pulled, author_id)
+    ]
+    followers = defaultdict(list)
+    for start in range(0, len(authors), settings.FEED_BATCH_SIZE):
+        rows = Follow.objects.filter(
+            author_id__in=authors[start:start + settings.FEED_BATCH_SIZE]
+        ).values_list('author_id', 'user_id')
+        for author_id, user_id in rows.iterator():
+            followers[author_id].append(user_id)
+    entries = []
+    created = 0
+    for author_id in authors:
+        user_ids = followers[author_id]
+        if len(user_ids) > limit:
+            continue
+        for post in by_author[author_id]:
+            entries.extend(_entries(post, user_ids))
+        if len(entries) >= settings.FEED_BATCH_SIZE:
+            FeedEntry.objects.bulk_create(
+                entries,
+                batch_size=settings.FEED_BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+            created += len(entries)
+            entries = []
+    FeedEntry.objects.bulk_create(
+        entries, batch_size=settings.FEED_BATCH_SIZE, ignore_conflicts=True
+    )
+    return created + len(entries)
+
+
+def backfill(follow):
+    """Добавляет в ленту последние посты автора, на которого подписались."""
+    if PulledAuthor.objects.filter(author_id=follow.author_id).exists():
+        return
+    posts = Post.objects.filter(author_id=follow.author_id).only(
+        'pk', 'author_id', 'pub_date'
+    )[:settings.FEED_BACKFILL_SIZE]
+    FeedEntry.objects.bulk_create(
+        [_entries(post, [follow.user_id])[0] for post in posts],
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_many(new_follows):
+    """backfill() для пачки подписок, где post_save не шлётся.
+
+    Последние FEED_BACKFILL_SIZE постов всех авторов пачки читаются
+    одним запросом по индексу (author, -pub_date, -id), записи в ленты
+    пишутся общим bulk_create. Возвращает число записей.
+    """
+    pulled = pulled_authors()
+    new_follows = [
+        follow for follow in new_follows
+        if not follows.contains(pulled, follow.author_id)
+    ]
+    authors = list({follow.author_id for follow in new_follows})
+    latest = Post.objects.filter(
+        author_id=OuterRef('author_id')
+    ).order_by('-pub_date', '-id').values('pk')[:settings.FEED_BACKFILL_SIZE]
+    posts = defaultdict(list)
+    for start in range(0, len(authors), settings.FEED_BATCH_SIZE):
+        rows = Post.objects.filter(
+            author_id__in=authors[start:start + settings.FEED_BATCH_SIZE],
+            pk__in=Subquery(latest),
+        ).only('pk', 'author_id', 'pub_date')
+        for post in rows.iterator():
+            posts[post.author_id].append(post)
+    entries = [
+        entry
+        for follow in new_follows
+        for post in posts[follow.author_id]
+        for entry in _entries(post, [follow.user_id])
+    ]
+    FeedEntry.objects.bulk_create(
+        entries, batch_size=settings.FEED_BATCH_SIZE, ignore_conflicts=True
+    )
+    return len(entries)
+
+
+def drop(follow):
+    """Убирает из ленты посты автора, от которого отписались."""
+    FeedEntry.objects.filter(
+        user_id=follow.user_id,
+        author_id=follow.author_id,
+    ).delete()
+
+
+def pull_popular_authors():
+    """Переводит в PulledAuthor авторов, у которых подписчиков больше
+    FEED_FANOUT_LIMIT, и убирает их посты из лент.
+
+    Нужна после массовой загрузки подписок, где fan_out не вызывался.
+    Возвращает число переведённых авторов.
+    """
+    authors = list(
+        Follow.objects.filter(author__pulled__isnull=True)
+        .values_list('author_id')
+        .annotate(followers=Count('pk'))
+        .filter(followers__gt=settings.FEED_FANOUT_LIMIT)
+        .values_list('author_id', flat=True)
+    )
+    PulledAuthor.objects.bulk_create(
+        [PulledAuthor(author_id=author_id) for author_id in authors],
+        ignore_conflicts=True,
+    )
+    FeedEntry.objects.filter(author_id__in=authors).delete()
+    # bulk_create не шлёт сигналов, сбрасывающих список.
+    forget_pulled_authors()
+    return len(authors)
+
+
+def pulled_authors():
+    """Отсортированный array('I') авторов из PulledAuthor."""
+    blob = cache.get(PULLED_KEY)
+    if blob is not None:
+        authors = array('I')
+        authors.frombytes(blob)
+        return authors
+    authors = array('I', sorted(
+        PulledAuthor.objects.values_list('author_id', flat=True)
+    ))
+    cache.set(PULLED_KEY, authors.tobytes(), follows.timeout())
+    return authors
+
+
+def forget_pulled_authors():
+    cache.delete(PULLED_KEY)
+
+
+def pulled_followees(followees):
+    """Авторы из подписок, посты которых не разложены по лентам."""
+    return _intersect(followees, pulled_authors())
+
+
+def scopes(user_id):
+    """Области, по которым считается время изменения ленты.
+
+    Разложенные посты, подписки и отписки отмечают одну область
+    feed_scope пользователя, поэтому к ней добавляются только области
+    авторов из PulledAuthor, а не по области на каждую подписку.
+    """
+    return [
+        caching.feed_scope(user_id),
+        caching.all_feeds_scope(),
+    ] + [
+        caching.profile_scope(author_id)
+        for author_id in pulled_followees(follows.followees(user_id))
+    ]
+
+
+def _intersect(small, large):
+    """Общие элементы двух отсортированных массивов."""
+    if len(small) > len(large):
+        small, large = large, small
+    return [item for item in small if follows.contains(large, item)]
+
+
+class MergedFeed:
+    """Посты из нескольких QuerySet, слитые в Python по общему ключу.
+
+    Каждая часть упорядочена сама и читается своим индексом: срез [a:b]
+    берёт из каждой части первые b записей и сливает их. Поддерживает
+    то, что нужно CursorPaginator и api.views.listing: filter(),
+    order_by(), values(), values_list() и срезы.
+    """
+    model = Post
+
+    def __init__(self, parts, order=(), fields=None):
+        self.parts = parts
+        self.order = order
+        self.fields = fields
+
+    @property
+    def query(self):
+        return self.parts[0].query
+
+    def _clone(self, method, *args, order=None, fields=None, **kwargs):
+        return MergedFeed(
+            [getattr(part, method)(*args, **kwargs) for part in self.parts],
+            order or self.order,
+            fields or self.fields,
+        )
+
+    def filter(self, *args, **kwargs):
+        return self._clone('filter', *args, **kwargs)
+
+    def order_by(self, *order):
+        return self._clone('order_by', *order, order=order)
+
+    def values(self, *fields):
+        return self._clone('values', *fields)
+
+    def values_list(self, *fields):
+        return self._clone('values_list', *fields, fields=fields)
+
+    def _key(self, item):
+        names = [name.lstrip('-') for name in self.order]
+        if isinstance(item, dict):
+            return tuple(item[name] for name in names)
+        if isinstance(item, tuple):
+            return tuple(item[self.fields.index(name)] for name in names)
+        return tuple(getattr(item, name) for name in names)
+
+    def _merge(self, parts):
+        """Слияние частей; пост, который есть в нескольких, идёт один раз.
+
+        Так бывает с постами, разложенными до того, как автор попал в
+        PulledAuthor.
+        """
+        reverse = bool(self.order) and self.order[0].startswith('-')
+        last = None
+        for item in heapq.merge(*parts, key=self._key, reverse=reverse):
+            key = self._key(item)
+            if key != last:
+                last = key
+                yield item
+
+    def __getitem__(self, index):
+        start, stop = index.start or 0, index.stop
+        return list(islice(
+            self._merge(part[:stop] for part in self.parts), start, stop
+        ))
+
+    def __iter__(self):
+        return iter(self._merge(self.parts))
+
+
+def feed_posts(user):
+    """Возвращает посты ленты и ключи для CursorPaginator.
+
+    Без подписок лента пуста и в базу не ходит.
+
+    Посты обычных авторов читаются из FeedEntry по индексу
+    (user, -pub_date, -post). Посты авторов из PulledAuthor не
+    разложены: каждый такой автор читается отдельно по индексу
+    (author, -pub_date, -id), и части сливаются в MergedFeed. Ключ у
+    всех частей один — (feed_date, feed_post), дата и id поста.
+    """
+    followees = follows.followees(user.pk)
+    if not followees:
+        return Post.objects.none(), None
+    keys = ('feed_date', 'feed_post')
+    posts = Post.objects.for_listing().filter(
+        feed_entries__user=user
+    ).annotate(
+        feed_date=F('feed_entries__pub_date'),
+        feed_post=F('feed_entries__post'),
+    )
+    pulled = pulled_followees(followees)
+    if not pulled:
+        return posts, keys
+    return MergedFeed([posts] + [
+        Post.objects.for_listing().filter(author_id=author_id).annotate(
+            feed_date=F('pub_date'), feed_post=F('id'),
+        )
+        for author_id in pulled
+    ]), keys
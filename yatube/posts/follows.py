@@ -0,0 +1,66 @@
+"""Граф подписок в кеше: на кого подписан каждый пользователь.
+
+Подписки пользователя хранятся в общем кеше одним значением — байтами
+отсортированного array('I'), по 4 байта на автора. Проверка «подписан
+ли» — бинарный поиск по массиву без запроса к базе, а лента и её ETag
+берут список авторов отсюда же.
+
+Сигналы Follow не правят сохранённый массив, а сбрасывают его: правка
+на месте — это чтение и запись без блокировки, и параллельные подписки
+теряли бы друг друга. Массив собирается из базы при следующем чтении.
+Кеш default общий для всех процессов, иначе сброс виден только одному.
+"""
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core import routers
+
+from .models import Follow
+
+KEY = 'posts:followees:{}'
+
+
+def timeout():
+    """Массив, собранный по данным реплики, живёт не дольше её отставания."""
+    if routers.reading_from_replica():
+        return min(settings.FOLLOW_GRAPH_TIMEOUT, settings.REPLICA_MAX_LAG)
+    return settings.FOLLOW_GRAPH_TIMEOUT
+
+
+def _load(blob):
+    followees = array('I')
+    followees.frombytes(blob)
+    return followees
+
+
+def followees(user_id):
+    """Отсортированный array('I') авторов, на которых подписан user_id."""
+    key = KEY.format(user_id)
+    blob = cache.get(key)
+    if blob is not None:
+        return _load(blob)
+    result = array('I', sorted(
+        Follow.objects.filter(user_id=user_id).values_list(
+            'author_id', flat=True
+        )
+    ))
+    cache.set(key, result.tobytes(), timeout())
+    return result
+
+
+def contains(items, author_id):
+    """Есть ли author_id в отсортированном массиве."""
+    index = bisect_left(items, author_id)
+    return index < len(items) and items[index] == author_id
+
+
+def is_following(user_id, author_id):
+    return contains(followees(user_id), author_id)
+
+
+def forget(*user_ids):
+    """Сбрасывает массивы; нужно после записи в обход сигналов."""
+    cache.delete_many([KEY.format(user_id) for user_id in user_ids])
@@ -0,0 +1,101 @@
+"""Нормализация картинок при загрузке.
+
+Снимок с телефона весит несколько мегабайт и хранит EXIF с координатами.
+normalize() уменьшает его до IMAGE_MAX_SIZE, поворачивает по EXIF и
+пересохраняет без метаданных: прогрессивный JPEG, или PNG, если есть
+прозрачность. Для <picture> миниатюры дополнительно готовятся в форматах
+из variant_formats().
+"""
+import os
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+from sorl.thumbnail.base import EXTENSIONS
+
+# Формат → (кодек Pillow, MIME-тип для <source>).
+VARIANTS = {
+    'AVIF': ('avif', 'image/avif'),
+    'WEBP': ('webp', 'image/webp'),
+}
+
+
+@lru_cache(maxsize=None)
+def _supported(image_format):
+    codec, _ = VARIANTS[image_format]
+    try:
+        return features.check_module(codec) and image_format in EXTENSIONS
+    except ValueError:
+        # Pillow не знает такого кодека.
+        return False
+
+
+def variant_formats():
+    """Форматы из IMAGE_VARIANT_FORMATS, которые умеют Pillow и sorl."""
+    return [
+        image_format for image_format in settings.IMAGE_VARIANT_FORMATS
+        if image_format in VARIANTS and _supported(image_format)
+    ]
+
+
+def mime_type(image_format):
+    return VARIANTS[image_format][1]
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def normalize(file):
+    """Уменьшенная копия картинки без EXIF в виде ContentFile.
+
+    Размер проверяется по заголовку, до распаковки пикселей; JPEG
+    распаковывается сразу в уменьшенном масштабе (draft), так что память
+    на декодирование ограничена.
+    """
+    file.seek(0)
+    try:
+        image = Image.open(file)
+        width, height = image.size
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            raise ValidationError(
+                'Слишком большое изображение: %(pixels)s пикселей.',
+                code='too_many_pixels',
+                params={'pixels': width * height},
+            )
+        max_size = (settings.IMAGE_MAX_SIZE, settings.IMAGE_MAX_SIZE)
+        image.draft('RGB', max_size)
+        # Профиль цвета нужен браузеру, но только для тех же каналов.
+        icc_profile = image.info.get('icc_profile') if image.mode in (
+            'RGB', 'RGBA'
+        ) else None
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(max_size, Image.LANCZOS)
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError(
+            'Не удалось прочитать изображение.', code='invalid_image'
+        )
+    output = BytesIO()
+    alpha = has_alpha(image)
+    image = image.convert('RGBA' if alpha else 'RGB')
+    # PNG сохраняет EXIF из info, JPEG — только переданный явно.
+    image.info.pop('exif', None)
+    if alpha:
+        extension = 'png'
+        image.save(output, 'PNG', optimize=True, icc_profile=icc_profile)
+    else:
+        extension = 'jpg'
+        image.save(
+            output, 'JPEG',
+            quality=settings.IMAGE_QUALITY,
+            optimize=True,
+            progressive=True,
+            icc_profile=icc_profile,
+        )
+    stem = os.path.splitext(os.path.basename(file.name))[0]
+    return ContentFile(output.getvalue(), name=f'{stem}.{extension}')
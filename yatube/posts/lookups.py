@@ -0,0 +1,143 @@
+"""Кеш групп и пользователей по slug и username в памяти процесса.
+
+Страницы группы, профиля и их ленты каждый раз ищут строку по адресу,
+хотя группы и пользователи почти не меняются. LookupCache хранит значения
+колонок в словаре процесса, а отсутствие строки — тоже, чтобы повторные
+404 не ходили в базу.
+
+Сигналы сохранения и удаления сбрасывают словарь своего процесса и
+увеличивают версию в общем кеше. Остальные процессы сверяют версию не
+чаще раза в LOOKUP_VERSION_CHECK секунд и при расхождении сбрасывают свой
+словарь. Поэтому кеш default должен быть общим для всех процессов:
+с кешем в памяти процесса версия видна только ему самому, и остальные
+отдают удалённые и переименованные строки до истечения таймаута.
+Попадания и промахи видны в сводке /timings/.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import router
+from django.http import Http404
+
+from core import routers, timing
+
+from . import caching
+from .models import Group, User
+
+# Исход поиска для timing.record_lookup().
+HIT, NEGATIVE_HIT, MISS = 'hits', 'negative_hits', 'misses'
+
+
+class LookupCache:
+    """Строки model по уникальному полю field.
+
+    fields — колонки, которые читаются сразу; остальные отложены и
+    загрузятся из базы при обращении.
+    """
+
+    def __init__(self, name, model, field, fields=None):
+        self.name = name
+        self.model = model
+        self.field = field
+        self.fields = list(fields or (
+            f.attname for f in model._meta.concrete_fields
+        ))
+        self.scope = f'lookup:{name}'
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked = float('-inf')
+        # Меняется при каждом сбросе: строка, прочитанная до сброса,
+        # в словарь уже не попадает.
+        self._generation = 0
+
+    def timeout(self, found):
+        """Сколько хранить строку; данные реплики — не дольше её отставания."""
+        timeout = (
+            settings.LOOKUP_CACHE_TIMEOUT if found
+            else settings.LOOKUP_NEGATIVE_TIMEOUT
+        )
+        if routers.reading_from_replica():
+            timeout = min(timeout, settings.REPLICA_MAX_LAG)
+        return timeout
+
+    def sync(self):
+        """Сбрасывает словарь, если версию увеличил другой процесс."""
+        now = time.monotonic()
+        if now - self._checked < settings.LOOKUP_VERSION_CHECK:
+            return
+        version = caching.get_version(self.scope)
+        with self._lock:
+            self._checked = now
+            if version != self._version:
+                self._clear()
+                self._version = version
+
+    def get(self, key):
+        """Объект с field=key или None, если его нет."""
+        self.sync()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._rows.get(key)
+            generation = self._generation
+            if entry is not None and entry[0] > now:
+                self._rows.move_to_end(key)
+                values = entry[1]
+            else:
+                entry = None
+        if entry is not None:
+            timing.record_lookup(
+                self.name, HIT if values is not None else NEGATIVE_HIT
+            )
+        else:
+            timing.record_lookup(self.name, MISS)
+            values = self.model.objects.filter(
+                **{self.field: key}
+            ).values_list(*self.fields).first()
+            self.store(
+                key, values, now + self.timeout(values is not None),
+                generation,
+            )
+        if values is None:
+            return None
+        return self.model.from_db(
+            router.db_for_read(self.model), self.fields, values
+        )
+
+    def store(self, key, values, expires, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._rows[key] = (expires, values)
+            self._rows.move_to_end(key)
+            while len(self._rows) > settings.LOOKUP_CACHE_SIZE:
+                self._rows.popitem(last=False)
+
+    def get_or_404(self, key):
+        obj = self.get(key)
+        if obj is None:
+            raise Http404(
+                f'{self.model._meta.verbose_name} {key} не существует.'
+            )
+        return obj
+
+    def invalidate(self):
+        """Сбрасывает словарь здесь и, через версию, во всех процессах."""
+        caching.bump(self.scope)
+        with self._lock:
+            self._clear()
+            self._checked = float('-inf')
+
+    def _clear(self):
+        self._rows.clear()
+        self._generation += 1
+
+
+groups = LookupCache('group', Group, 'slug')
+# Для страниц автора хватает имени; пароль в памяти держать незачем.
+users = LookupCache(
+    'user', User, 'username',
+    fields=('id', 'username', 'first_name', 'last_name'),
+)
@@ -0,0 +1,118 @@
+from io import BytesIO
+from time import process_time
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.parsers import parse_geometry
+
+from posts import images, thumbnails
+
+# Ориентация «повернуть на 90°», как у снимка с телефона.
+EXIF_ORIENTATION = 0x0112
+EXIF_MAKE = 0x010F
+
+
+class Sink:
+    """Принимает миниатюру от движка sorl вместо файла в хранилище."""
+    data = b''
+
+    def write(self, data):
+        self.data = data
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает загрузку картинки как есть и с нормализацией: '
+        'процессорное время на загрузку и миниатюры, объём оригинала в '
+        'хранилище и объём миниатюр, которые получает браузер.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            help='Файл картинки; по умолчанию синтетический снимок с EXIF.'
+        )
+        parser.add_argument('--width', type=int, default=4000)
+        parser.add_argument('--height', type=int, default=3000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        if options['source']:
+            try:
+                with open(options['source'], 'rb') as file:
+                    original = file.read()
+            except OSError as error:
+                raise CommandError(error)
+        else:
+            original = self.photo(options['width'], options['height'])
+        repeat = options['repeat']
+        self.stdout.write(
+            f'Оригинал: {len(original)} байт, '
+            f'доп. форматы: {", ".join(images.variant_formats()) or "нет"}'
+        )
+
+        normalized, upload = self.measure(
+            repeat, lambda: images.normalize(
+                ContentFile(original, name='photo.jpg')
+            ).read()
+        )
+        self.row('как сейчас', 'загрузка', 0, len(original))
+        self.row('нормализация', 'загрузка', upload, len(normalized))
+        for geometry, options in thumbnails.variants():
+            label = f'{geometry} {options.get("format", "JPEG")}'
+            if 'format' not in options:
+                data, elapsed = self.measure(
+                    repeat, lambda: self.thumbnail(original, geometry, options)
+                )
+                self.row('как сейчас', label, elapsed, len(data))
+            data, elapsed = self.measure(
+                repeat, lambda: self.thumbnail(normalized, geometry, options)
+            )
+            self.row('нормализация', label, elapsed, len(data))
+
+    def photo(self, width, height):
+        """Шумная картинка, которая сжимается примерно как фотография."""
+        channels = [
+            Image.effect_noise((width // 16, height // 16), 80).resize(
+                (width, height), Image.BICUBIC
+            )
+            for _ in range(3)
+        ]
+        grain = Image.effect_noise((width, height), 12).convert('RGB')
+        image = Image.blend(Image.merge('RGB', channels), grain, 0.15)
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = 6
+        exif[EXIF_MAKE] = 'Yatube'
+        output = BytesIO()
+        image.save(output, 'JPEG', quality=92, exif=exif.tobytes())
+        return output.getvalue()
+
+    def thumbnail(self, data, geometry, options):
+        """Миниатюра тем же движком и с теми же настройками, что у sorl."""
+        engine = default.engine
+        options = dict(ThumbnailBackend.default_options, **options)
+        image = engine.get_image(ContentFile(data))
+        options['image_info'] = engine.get_image_info(image)
+        ratio = engine.get_image_ratio(image, options)
+        image = engine.create(image, parse_geometry(geometry, ratio), options)
+        sink = Sink()
+        engine.write(image, options, sink)
+        return sink.data
+
+    def measure(self, repeat, func):
+        """Результат func и лучшее процессорное время из repeat запусков."""
+        best = None
+        for _ in range(repeat):
+            started = process_time()
+            result = func()
+            elapsed = process_time() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return result, best
+
+    def row(self, mode, label, elapsed, size):
+        self.stdout.write(
+            f'{mode:<14}{label:<16}{elapsed * 1000:>9.1f} мс{size:>11} байт'
+        )
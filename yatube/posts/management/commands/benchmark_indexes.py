@@ -0,0 +1,185 @@
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+from time import perf_counter
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from posts.models import Comment, Follow, Group, Post, User
+
+ALIAS = 'benchmark'
+START = datetime(2020, 1, 1)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет отдельную базу SQLite и сравнивает время горячих '
+        'запросов с составными индексами и без них.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--comments', type=int, default=200_000)
+        parser.add_argument('--follows', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument(
+            '--db-path',
+            help='Файл базы; по умолчанию временный и удаляется в конце.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        path = options['db_path']
+        temporary = path is None
+        if temporary:
+            path = os.path.join(tempfile.mkdtemp(), 'benchmark.sqlite3')
+        connections.databases[ALIAS] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': path,
+        }
+        try:
+            call_command('migrate', database=ALIAS, verbosity=0)
+            if not Post.objects.using(ALIAS).exists():
+                with transaction.atomic(using=ALIAS):
+                    self.seed(**options)
+            self.run(options['repeat'])
+        finally:
+            connections[ALIAS].close()
+            if temporary:
+                os.remove(path)
+
+    def insert(self, model, columns, rows, batch_size=10_000):
+        table = model._meta.db_table
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            table, ', '.join(columns), ', '.join('%s' for _ in columns)
+        )
+        with connections[ALIAS].cursor() as cursor:
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) == batch_size:
+                    cursor.executemany(sql, batch)
+                    batch = []
+            if batch:
+                cursor.executemany(sql, batch)
+
+    def seed(self, posts, users, groups, comments, follows, **options):
+        started = perf_counter()
+        self.stdout.write(f'Заполнение: {posts} постов, {users} авторов…')
+        self.insert(
+            User,
+            ('username', 'password', 'first_name', 'last_name', 'email',
+             'is_superuser', 'is_staff', 'is_active', 'date_joined'),
+            (
+                (f'user{i}', '', '', '', '', False, False, True, START)
+                for i in range(users)
+            ),
+        )
+        self.insert(
+            Group,
+            ('title', 'slug', 'description'),
+            ((f'Группа {i}', f'group-{i}', '') for i in range(groups)),
+        )
+        self.insert(
+            Post,
+            ('text', 'pub_date', 'author_id', 'group_id', 'image'),
+            (
+                (
+                    f'Пост {i}',
+                    START + timedelta(seconds=i * 30),
+                    random.randint(1, users),
+                    random.choice((None, random.randint(1, groups))),
+                    '',
+                )
+                for i in range(posts)
+            ),
+        )
+        self.insert(
+            Comment,
+            ('post_id', 'author_id', 'text', 'created'),
+            (
+                (
+                    random.randint(1, posts),
+                    random.randint(1, users),
+                    'Комментарий',
+                    START + timedelta(seconds=i),
+                )
+                for i in range(comments)
+            ),
+        )
+        pairs = {
+            (random.randint(1, users), random.randint(1, users))
+            for _ in range(follows)
+        }
+        self.insert(Follow, ('user_id', 'author_id'), sorted(pairs))
+        with connections[ALIAS].cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.stdout.write(f'Заполнено за {perf_counter() - started:.1f} с')
+
+    def cases(self):
+        """Горячие запросы страниц: (название, queryset)."""
+        posts = Post.objects.using(ALIAS).order_by('-pub_date', '-pk')
+        middle = posts[posts.count() // 2]
+        author = middle.author_id
+        group = (
+            posts.filter(group__isnull=False).values_list('group', flat=True)
+            .first()
+        )
+        commented = (
+            Comment.objects.using(ALIAS).values_list('post', flat=True)
+            .first()
+        )
+        follow = Follow.objects.using(ALIAS).first()
+        older = posts.filter(pub_date__lt=middle.pub_date)
+        return (
+            ('index, первая страница', posts[:10]),
+            ('index, глубокая страница по курсору', older[:10]),
+            ('profile', posts.filter(author_id=author)[:10]),
+            ('group_posts', posts.filter(group_id=group)[:10]),
+            ('comments', Comment.objects.using(ALIAS).filter(
+                post_id=commented
+            ).order_by('created', 'pk')[:50]),
+            ('подписчики автора', Follow.objects.using(ALIAS).filter(
+                author_id=follow.author_id
+            ).values_list('user_id', flat=True)),
+        )
+
+    def time(self, queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = perf_counter()
+            list(queryset.all())
+            timings.append(perf_counter() - started)
+        timings.sort()
+        return timings[len(timings) // 2] * 1000
+
+    def indexes(self):
+        for model in (Post, Comment, Follow):
+            for index in model._meta.indexes:
+                yield model, index
+
+    def run(self, repeat):
+        cases = self.cases()
+        with_indexes = [self.time(qs, repeat) for _, qs in cases]
+        with connections[ALIAS].schema_editor() as editor:
+            for model, index in self.indexes():
+                editor.remove_index(model, index)
+        try:
+            without_indexes = [self.time(qs, repeat) for _, qs in cases]
+        finally:
+            with connections[ALIAS].schema_editor() as editor:
+                for model, index in self.indexes():
+                    editor.add_index(model, index)
+        self.stdout.write(
+            f'{"запрос":<40}{"без индексов, мс":>18}{"с индексами, мс":>18}'
+        )
+        for (name, _), before, after in zip(
+            cases, without_indexes, with_indexes
+        ):
+            self.stdout.write(f'{name:<40}{before:>18.3f}{after:>18.3f}')
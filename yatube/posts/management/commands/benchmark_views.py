@@ -0,0 +1,304 @@
+import json
+import platform
+import random
+import subprocess
+from datetime import datetime
+from time import perf_counter
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from mixer.backend.django import Mixer
+
+from core.testing import isolated_caches
+from core.timing import percentile
+from posts.models import Comment, Follow, Group, Post
+from posts.urls import urlpatterns as posts_urlpatterns
+from users.urls import urlpatterns as users_urlpatterns
+
+User = get_user_model()
+
+PERCENTILES = (50, 95, 99)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет тестовую базу через mixer, замеряет время ответа и число '
+        'SQL-запросов каждой страницы из posts/urls.py и users/urls.py и '
+        'пишет отчёт в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--follows', type=int, default=300)
+        parser.add_argument('--comments', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=100)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--cold-cache', action='store_true',
+            help='Очищать кеш перед каждым запросом.'
+        )
+        parser.add_argument(
+            '--db-path',
+            help='Файл базы; данные в нём сохраняются между запусками. '
+                 'По умолчанию база в памяти.'
+        )
+        parser.add_argument('--output', default='benchmark-views.json')
+        parser.add_argument(
+            '--compare', help='Отчёт прошлого запуска для сравнения.'
+        )
+
+    def handle(self, *args, **options):
+        # Замеры чистят кеш и пишут в него: кеш работающего сайта не трогаем.
+        # Лимиты частоты выключены: сотни одинаковых записей подряд
+        # получили бы 429.
+        with isolated_caches(), override_settings(RATE_LIMITS={}):
+            self.benchmark(**options)
+
+    def benchmark(self, **options):
+        if options['users'] < 2 or options['posts'] < 1:
+            raise CommandError('Нужно хотя бы два автора и один пост.')
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                baseline = json.load(file)
+        creation = connection.creation
+        keepdb = bool(options['db_path'])
+        if keepdb:
+            connection.settings_dict['TEST']['NAME'] = options['db_path']
+        old_name = creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False, keepdb=keepdb
+        )
+        try:
+            if not Post.objects.exists():
+                with transaction.atomic():
+                    self.seed(**options)
+            report = self.run(**options)
+        finally:
+            creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        self.print_report(report, baseline)
+        self.stdout.write(f'Отчёт записан в {options["output"]}')
+
+    def seed(self, users, posts, groups, follows, comments, seed, **options):
+        started = perf_counter()
+        random.seed(seed)
+        mixer = Mixer(locale='ru_RU')
+        mixer.faker.seed_instance(seed)
+        authors = mixer.cycle(users).blend(
+            User, username=mixer.sequence('user{0}')
+        )
+        group_list = mixer.cycle(groups).blend(
+            Group, slug=mixer.sequence('group-{0}')
+        ) if groups else []
+        post_list = mixer.cycle(posts).blend(
+            Post,
+            author=(random.choice(authors) for _ in range(posts)),
+            group=(
+                random.choice(group_list + [None]) for _ in range(posts)
+            ),
+            image='',
+        )
+        pairs = sorted({
+            tuple(random.sample(authors, 2)) for _ in range(follows)
+        }, key=lambda pair: (pair[0].pk, pair[1].pk))
+        if pairs:
+            mixer.cycle(len(pairs)).blend(
+                Follow,
+                user=(user for user, _ in pairs),
+                author=(author for _, author in pairs),
+            )
+        if comments:
+            mixer.cycle(comments).blend(
+                Comment,
+                post=(random.choice(post_list) for _ in range(comments)),
+                author=(random.choice(authors) for _ in range(comments)),
+            )
+        self.stdout.write(f'Заполнено за {perf_counter() - started:.1f} с')
+
+    def clients(self):
+        """Клиенты читателя с подписками и автора поста."""
+        reader = User.objects.filter(follower__isnull=False).first() or (
+            User.objects.first()
+        )
+        post = Post.objects.exclude(author=reader).order_by('pk').first() or (
+            Post.objects.order_by('pk').first()
+        )
+        reader_client = Client()
+        reader_client.force_login(reader)
+        author_client = Client()
+        author_client.force_login(post.author)
+        return reader, reader_client, post, author_client
+
+    def requests(self):
+        """Запрос к каждому адресу: (имя, метод, url, данные, подготовка).
+
+        Подготовка выполняется перед каждым замером и в него не входит.
+        """
+        reader, client, post, author_client = self.clients()
+        author = post.author
+        group = post.group or Group.objects.first()
+        word = post.text.split()[0]
+        guest = Client()
+        leaving = Client()
+
+        def unfollow():
+            Follow.objects.filter(user=reader, author=author).delete()
+
+        def follow():
+            Follow.objects.get_or_create(user=reader, author=author)
+
+        requests = [
+            ('posts:index', client.get, reverse('posts:index')),
+            ('posts:trending', client.get, reverse('posts:trending')),
+            ('posts:profile', client.get, reverse(
+                'posts:profile', kwargs={'username': author.username}
+            )),
+            ('posts:post_detail', client.get, reverse(
+                'posts:post_detail', kwargs={'post_id': post.pk}
+            )),
+            ('posts:comments', client.get, reverse(
+                'posts:comments', kwargs={'post_id': post.pk}
+            )),
+            ('posts:post_create', client.get, reverse('posts:post_create')),
+            ('posts:post_edit', author_client.get, reverse(
+                'posts:post_edit', kwargs={'post_id': post.pk}
+            )),
+            ('posts:add_comment', client.post, reverse(
+                'posts:add_comment', kwargs={'post_id': post.pk}
+            ), {'text': 'Комментарий из бенчмарка'}),
+            ('posts:follow_index', client.get, reverse('posts:follow_index')),
+            ('posts:search', client.get, reverse('posts:search'), {
+                'q': word
+            }),
+            ('posts:site_feed', guest.get, reverse(
+                'posts:site_feed', kwargs={'format': 'rss'}
+            )),
+            ('posts:profile_feed', guest.get, reverse(
+                'posts:profile_feed',
+                kwargs={'username': author.username, 'format': 'atom'}
+            )),
+            ('posts:profile_follow', client.get, reverse(
+                'posts:profile_follow', kwargs={'username': author.username}
+            ), None, unfollow),
+            ('posts:profile_unfollow', client.get, reverse(
+                'posts:profile_unfollow', kwargs={'username': author.username}
+            ), None, follow),
+            ('users:signup', guest.get, reverse('users:signup')),
+            ('users:login', guest.get, reverse('users:login')),
+            ('users:logout', leaving.get, reverse('users:logout'), None,
+             lambda: leaving.force_login(reader)),
+        ]
+        if group:
+            requests.append(('posts:group_list', client.get, reverse(
+                'posts:group_list', kwargs={'slug': group.slug}
+            )))
+            requests.append(('posts:group_feed', guest.get, reverse(
+                'posts:group_feed',
+                kwargs={'slug': group.slug, 'format': 'rss'}
+            )))
+            requests.append(('posts:group_trending', client.get, reverse(
+                'posts:group_trending', kwargs={'slug': group.slug}
+            )))
+        return requests
+
+    def check_coverage(self, requests):
+        names = {
+            f'posts:{pattern.name}' for pattern in posts_urlpatterns
+        } | {f'users:{pattern.name}' for pattern in users_urlpatterns}
+        missing = names - {name for name, *_ in requests}
+        if missing:
+            raise CommandError(
+                'Нет замера для адресов: ' + ', '.join(sorted(missing))
+            )
+
+    def measure(self, method, url, data, prepare, cold_cache):
+        if prepare:
+            prepare()
+        if cold_cache:
+            cache.clear()
+        started = perf_counter()
+        response = method(url, data) if data else method(url)
+        elapsed = perf_counter() - started
+        if response.status_code >= 400:
+            raise CommandError(f'{url} ответил {response.status_code}')
+        return elapsed
+
+    def run(self, repeat, warmup, cold_cache, **options):
+        requests = self.requests()
+        self.check_coverage(requests)
+        views = {}
+        for name, method, url, *extra in requests:
+            data, prepare = (extra + [None, None])[:2]
+            if prepare:
+                prepare()
+            cache.clear()
+            reset_queries()
+            with CaptureQueriesContext(connection) as queries:
+                self.measure(method, url, data, None, False)
+            query_count = len(queries)
+            with override_settings(DEBUG=False):
+                for _ in range(warmup):
+                    self.measure(method, url, data, prepare, cold_cache)
+                timings = sorted(
+                    self.measure(method, url, data, prepare, cold_cache)
+                    for _ in range(repeat)
+                )
+            views[name] = {
+                'method': method.__name__.upper(),
+                'url': url,
+                'queries': query_count,
+                'mean_ms': sum(timings) / len(timings) * 1000,
+            }
+            for p in PERCENTILES:
+                views[name][f'p{p}_ms'] = percentile(timings, p) * 1000
+        return {
+            'commit': self.commit(),
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'dataset': {
+                key: options[key]
+                for key in ('users', 'posts', 'groups', 'follows',
+                            'comments', 'seed')
+            },
+            'repeat': repeat,
+            'cold_cache': cold_cache,
+            'views': dict(sorted(views.items())),
+        }
+
+    def commit(self):
+        try:
+            return subprocess.run(
+                ('git', 'rev-parse', '--short', 'HEAD'),
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def print_report(self, report, baseline=None):
+        header = f'{"страница":<24}{"запросов":>9}'
+        for p in PERCENTILES:
+            header += f'{f"p{p}, мс":>10}'
+        if baseline:
+            header += f'{"p50 к базе":>12}'
+        self.stdout.write(header)
+        old_views = baseline['views'] if baseline else {}
+        for name, view in report['views'].items():
+            line = f'{name:<24}{view["queries"]:>9}'
+            for p in PERCENTILES:
+                line += f'{view[f"p{p}_ms"]:>10.2f}'
+            old = old_views.get(name)
+            if old:
+                change = (view['p50_ms'] / old['p50_ms'] - 1) * 100
+                line += f'{change:>+11.1f}%'
+            self.stdout.write(line)
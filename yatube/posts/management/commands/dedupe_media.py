@@ -0,0 +1,56 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from posts import storage, thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки, загруженные до хранилища по хешу, под имена '
+        'по содержимому: одинаковые файлы сливаются в один, старые файлы '
+        'и их миниатюры удаляются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать, ничего не меняя.'
+        )
+
+    def handle(self, *args, **options):
+        started = perf_counter()
+        moved = merged = missing = 0
+        targets = set()
+        names = list(
+            Post.objects.exclude(image='').order_by()
+            .values_list('image', flat=True).distinct()
+        )
+        media = storage.media_storage
+        field = Post._meta.get_field('image')
+        for name in names:
+            if not media.exists(name):
+                missing += 1
+                continue
+            with media.open(name) as file:
+                target = media.content_name(
+                    storage.upload_name(field, name), file
+                )
+                if target == name:
+                    continue
+                if target in targets or media.exists(target):
+                    merged += 1
+                else:
+                    moved += 1
+                targets.add(target)
+                if options['dry_run']:
+                    continue
+                media.save(storage.upload_name(field, name), file)
+            Post.objects.filter(image=name).update(image=target)
+            storage.release(name)
+            thumbnails.refresh_listings(target)
+        self.stdout.write(
+            f'Перенесено файлов: {moved}, слито с копиями: {merged}, '
+            f'не найдено: {missing}, за {perf_counter() - started:.1f} с'
+        )
@@ -0,0 +1,56 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Создаёт недостающие миниатюры для всех картинок постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=multiprocessing.cpu_count()
+        )
+        parser.add_argument('--chunk-size', type=int, default=20)
+
+    def tasks(self):
+        backend = thumbnails.PregeneratedThumbnailBackend()
+        names = (
+            Post.objects.exclude(image='').order_by()
+            .values_list('image', flat=True).distinct().iterator()
+        )
+        for name in names:
+            for geometry, options in thumbnails.variants():
+                if backend.cached(name, geometry, **options) is None:
+                    yield name, geometry, options
+
+    def handle(self, *args, **options):
+        started = perf_counter()
+        created = failed = 0
+        refreshed = set()
+        with ProcessPoolExecutor(
+            max_workers=options['workers'],
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=thumbnails._init_worker,
+        ) as pool:
+            results = pool.map(
+                thumbnails.generate_task,
+                self.tasks(),
+                chunksize=options['chunk_size'],
+            )
+            for name, ok in results:
+                if not ok:
+                    failed += 1
+                    continue
+                created += 1
+                if name not in refreshed:
+                    thumbnails.refresh_listings(name)
+                    refreshed.add(name)
+        self.stdout.write(
+            f'Создано миниатюр: {created}, ошибок: {failed}, '
+            f'за {perf_counter() - started:.1f} с'
+        )
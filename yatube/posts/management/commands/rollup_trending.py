@@ -0,0 +1,20 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает оценки «популярного» по комментариям за '
+        'TRENDING_WINDOW и убирает посты без свежих комментариев.'
+    )
+
+    def handle(self, *args, **options):
+        started = perf_counter()
+        posts, fixed = trending.rollup()
+        self.stdout.write(
+            f'Постов: {posts}, исправлено оценок: {fixed}, '
+            f'за {perf_counter() - started:.1f} с'
+        )
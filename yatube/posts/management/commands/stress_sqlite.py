@@ -0,0 +1,123 @@
+import os
+import shutil
+import tempfile
+import threading
+from time import perf_counter
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+
+from posts.models import Comment, Counter, Post, User
+
+BACKENDS = (
+    ('sqlite3', 'django.db.backends.sqlite3'),
+    ('core.sqlite', 'core.sqlite'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Пишет в базу из нескольких потоков так же, как add_comment и '
+        'post_create, и сравнивает обычный бэкенд sqlite3 с core.sqlite: '
+        'число записей в секунду и ошибок «database is locked».'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument(
+            '--writes', type=int, default=200,
+            help='Транзакций на поток.'
+        )
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        self.stdout.write(
+            f'{"бэкенд":<14}{"записей":>9}{"блокировок":>12}'
+            f'{"время, с":>10}{"записей/с":>11}'
+        )
+        try:
+            for label, engine in BACKENDS:
+                alias = f'stress_{label}'
+                connections.databases[alias] = {
+                    'ENGINE': engine,
+                    'NAME': os.path.join(directory, f'{label}.sqlite3'),
+                }
+                try:
+                    self.run(label, alias, **options)
+                finally:
+                    connections[alias].close()
+                    del connections[alias]
+                    del connections.databases[alias]
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def prepare(self, alias):
+        """Автор, пост и их счётчики без сигналов."""
+        call_command('migrate', database=alias, verbosity=0)
+        user = User.objects.db_manager(alias).create_user('stress')
+        Post.objects.using(alias).bulk_create(
+            [Post(text='Нагрузочный пост', author=user)]
+        )
+        post = Post.objects.using(alias).get(author=user)
+        Counter.objects.using(alias).bulk_create([
+            Counter(kind=Counter.POST_COMMENTS, object_id=post.pk),
+            Counter(kind=Counter.AUTHOR_POSTS, object_id=user.pk),
+        ])
+        return user.pk, post.pk
+
+    def write(self, alias, user_id, post_id, number):
+        """Транзакция вида add_comment: чтение, вставка, счётчик.
+
+        Каждая пятая запись — новый пост, как в post_create.
+        """
+        with transaction.atomic(using=alias):
+            Post.objects.using(alias).filter(pk=post_id).exists()
+            if number % 5:
+                Comment.objects.using(alias).bulk_create([Comment(
+                    post_id=post_id, author_id=user_id, text='Комментарий'
+                )])
+                kind, object_id = Counter.POST_COMMENTS, post_id
+            else:
+                Post.objects.using(alias).bulk_create([Post(
+                    text='Пост', author_id=user_id
+                )])
+                kind, object_id = Counter.AUTHOR_POSTS, user_id
+            Counter.objects.using(alias).filter(
+                kind=kind, object_id=object_id
+            ).update(value=F('value') + 1)
+
+    def run(self, label, alias, threads, writes, **options):
+        user_id, post_id = self.prepare(alias)
+        results = {'done': 0, 'locked': 0}
+        lock = threading.Lock()
+
+        def worker():
+            done = locked = 0
+            try:
+                for number in range(writes):
+                    try:
+                        self.write(alias, user_id, post_id, number)
+                        done += 1
+                    except OperationalError as error:
+                        if 'locked' not in str(error):
+                            raise
+                        locked += 1
+            finally:
+                connections[alias].close()
+                with lock:
+                    results['done'] += done
+                    results['locked'] += locked
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        started = perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = perf_counter() - started
+        self.stdout.write(
+            f'{label:<14}{results["done"]:>9}{results["locked"]:>12}'
+            f'{elapsed:>10.2f}{results["done"] / elapsed:>11.0f}'
+        )
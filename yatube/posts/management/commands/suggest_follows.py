@@ -0,0 +1,50 @@
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации «на кого подписаться» по графу '
+        'подписок и группам и сохраняет их в Suggestion.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size', type=int, default=settings.FOLLOW_SUGGESTIONS_STORED,
+            help='Сколько рекомендаций хранить на пользователя.'
+        )
+        parser.add_argument(
+            '--sample', type=int, default=50,
+            help='Подписчиков автора и подписок подписчика в выборке.'
+        )
+        parser.add_argument(
+            '--neighbours', type=int, default=50,
+            help='Сколько похожих авторов помнить для каждого автора.'
+        )
+        parser.add_argument('--group-weight', type=float, default=0.5)
+        parser.add_argument(
+            '--group-authors', type=int, default=20,
+            help='Сколько самых пишущих авторов группы рекомендовать.'
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        started = perf_counter()
+        users, stored = suggestions.rebuild(
+            options['size'],
+            sample_size=options['sample'],
+            neighbours=options['neighbours'],
+            group_weight=options['group_weight'],
+            per_group=options['group_authors'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+        )
+        self.stdout.write(
+            f'Пользователей: {users}, рекомендаций: {stored}, '
+            f'за {perf_counter() - started:.1f} с'
+        )
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:40
+
+from django.db import migrations, models
+
+
+def fill_counters(apps, schema_editor):
+    from posts.counters import reconcile
+
+    reconcile(
+        counter_model=apps.get_model('posts', 'Counter'),
+        post_model=apps.get_model('posts', 'Post'),
+        comment_model=apps.get_model('posts', 'Comment'),
+        follow_model=apps.get_model('posts', 'Follow'),
+        using=schema_editor.connection.alias,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('author_posts', 'Постов автора'), ('group_posts', 'Постов в группе'), ('followers', 'Подписчиков'), ('following', 'Подписок'), ('post_comments', 'Комментариев к посту')], max_length=20, verbose_name='Счётчик')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Объект')),
+                ('value', models.PositiveIntegerField(default=0, verbose_name='Значение')),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
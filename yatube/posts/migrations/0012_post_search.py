@@ -0,0 +1,78 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+import posts.models
+
+# Вес текста поста и комментариев в bm25.
+RANK = 'bm25(1.0, 0.3)'
+
+
+def refresh_comments(post_id):
+    return (
+        "UPDATE posts_search SET comments = ("
+        "SELECT coalesce(group_concat(text, ' '), '') FROM posts_comment "
+        f"WHERE post_id = {post_id}) WHERE rowid = {post_id};"
+    )
+
+
+CREATE_SQL = [
+    "CREATE VIRTUAL TABLE posts_search USING fts5("
+    "text, comments, tokenize='unicode61 remove_diacritics 2', "
+    "prefix='2 3');",
+    f"INSERT INTO posts_search(posts_search, rank) VALUES ('rank', '{RANK}');",
+    "INSERT INTO posts_search(rowid, text, comments) "
+    "SELECT id, text, '' FROM posts_post;",
+    "UPDATE posts_search SET comments = ("
+    "SELECT group_concat(text, ' ') FROM posts_comment "
+    "WHERE post_id = posts_search.rowid) "
+    "WHERE rowid IN (SELECT post_id FROM posts_comment);",
+    "CREATE TRIGGER posts_search_post_insert AFTER INSERT ON posts_post "
+    "BEGIN INSERT INTO posts_search(rowid, text, comments) "
+    "VALUES (new.id, new.text, ''); END;",
+    "CREATE TRIGGER posts_search_post_update AFTER UPDATE OF text "
+    "ON posts_post BEGIN UPDATE posts_search SET text = new.text "
+    "WHERE rowid = new.id; END;",
+    "CREATE TRIGGER posts_search_post_delete AFTER DELETE ON posts_post "
+    "BEGIN DELETE FROM posts_search WHERE rowid = old.id; END;",
+    "CREATE TRIGGER posts_search_comment_insert AFTER INSERT "
+    f"ON posts_comment BEGIN {refresh_comments('new.post_id')} END;",
+    "CREATE TRIGGER posts_search_comment_update AFTER UPDATE OF text, "
+    f"post_id ON posts_comment BEGIN {refresh_comments('old.post_id')} "
+    f"{refresh_comments('new.post_id')} END;",
+    "CREATE TRIGGER posts_search_comment_delete AFTER DELETE "
+    f"ON posts_comment BEGIN {refresh_comments('old.post_id')} END;",
+]
+
+DROP_SQL = [
+    f'DROP TRIGGER posts_search_{name};'
+    for name in (
+        'post_insert', 'post_update', 'post_delete',
+        'comment_insert', 'comment_update', 'comment_delete',
+    )
+] + ['DROP TABLE posts_search;']
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearch',
+            fields=[
+                ('post', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search', serialize=False, to='posts.Post')),
+                ('text', posts.models.SearchField()),
+                ('comments', posts.models.SearchField()),
+                ('document', posts.models.SearchField(db_column='posts_search', editable=False)),
+                ('rank', models.FloatField(editable=False)),
+            ],
+            options={
+                'db_table': 'posts_search',
+                'managed': False,
+            },
+        ),
+        migrations.RunSQL(CREATE_SQL, DROP_SQL),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:13
+
+from django.db import migrations, models
+
+# AddField в SQLite пересоздаёт таблицу и теряет триггеры posts_search,
+# поэтому колонка добавляется через ALTER TABLE, без копирования таблицы.
+ADD_SQL = [
+    "ALTER TABLE posts_post ADD COLUMN updated datetime NOT NULL "
+    "DEFAULT '';",
+    'UPDATE posts_post SET updated = pub_date;',
+]
+
+DROP_SQL = ['ALTER TABLE posts_post DROP COLUMN updated;']
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_search'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunSQL(ADD_SQL, DROP_SQL)],
+            state_operations=[
+                migrations.AddField(
+                    model_name='post',
+                    name='updated',
+                    field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+                ),
+            ],
+        ),
+    ]
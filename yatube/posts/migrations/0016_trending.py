@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_suggestion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Trending',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='posts.Post')),
+                ('score', models.FloatField(verbose_name='Оценка')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='posts.Group')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='trending',
+            index=models.Index(fields=['-score'], name='posts_trending_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trending',
+            index=models.Index(fields=['group', '-score'], name='posts_trending_group_idx'),
+        ),
+    ]
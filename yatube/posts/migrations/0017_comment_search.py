@@ -0,0 +1,87 @@
+# Generated by Django 2.2.16 on 2026-10-18 09:12
+
+from importlib import import_module
+
+from django.db import migrations, models
+import django.db.models.deletion
+import posts.models
+
+post_search = import_module('posts.migrations.0012_post_search')
+
+TOKENIZE = "tokenize='unicode61 remove_diacritics 2', prefix='2 3'"
+
+# Комментарии индексируются по строке на комментарий: вставка, правка или
+# удаление комментария меняет одну строку, а не собирает заново все
+# комментарии поста. posts_search остаётся только с текстом поста.
+CREATE_SQL = [
+    f'DROP TRIGGER posts_search_{name};'
+    for name in (
+        'post_insert', 'post_update', 'post_delete',
+        'comment_insert', 'comment_update', 'comment_delete',
+    )
+] + [
+    'DROP TABLE posts_search;',
+    f'CREATE VIRTUAL TABLE posts_search USING fts5(text, {TOKENIZE});',
+    'INSERT INTO posts_search(rowid, text) SELECT id, text FROM posts_post;',
+    "CREATE TRIGGER posts_search_post_insert AFTER INSERT ON posts_post "
+    "BEGIN INSERT INTO posts_search(rowid, text) "
+    "VALUES (new.id, new.text); END;",
+    "CREATE TRIGGER posts_search_post_update AFTER UPDATE OF text "
+    "ON posts_post BEGIN UPDATE posts_search SET text = new.text "
+    "WHERE rowid = new.id; END;",
+    "CREATE TRIGGER posts_search_post_delete AFTER DELETE ON posts_post "
+    "BEGIN DELETE FROM posts_search WHERE rowid = old.id; END;",
+    'CREATE VIRTUAL TABLE posts_comment_search USING fts5('
+    f'text, {TOKENIZE});',
+    'INSERT INTO posts_comment_search(rowid, text) '
+    'SELECT id, text FROM posts_comment;',
+    "CREATE TRIGGER posts_comment_search_insert AFTER INSERT "
+    "ON posts_comment BEGIN INSERT INTO posts_comment_search(rowid, text) "
+    "VALUES (new.id, new.text); END;",
+    "CREATE TRIGGER posts_comment_search_update AFTER UPDATE OF text "
+    "ON posts_comment BEGIN UPDATE posts_comment_search "
+    "SET text = new.text WHERE rowid = new.id; END;",
+    "CREATE TRIGGER posts_comment_search_delete AFTER DELETE "
+    "ON posts_comment BEGIN DELETE FROM posts_comment_search "
+    "WHERE rowid = old.id; END;",
+]
+
+DROP_SQL = [
+    f'DROP TRIGGER {name};'
+    for name in (
+        'posts_search_post_insert', 'posts_search_post_update',
+        'posts_search_post_delete', 'posts_comment_search_insert',
+        'posts_comment_search_update', 'posts_comment_search_delete',
+    )
+] + [
+    'DROP TABLE posts_comment_search;',
+    'DROP TABLE posts_search;',
+] + post_search.CREATE_SQL
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_trending'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='postsearch',
+            name='comments',
+        ),
+        migrations.CreateModel(
+            name='CommentSearch',
+            fields=[
+                ('comment', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search', serialize=False, to='posts.Comment')),
+                ('text', posts.models.SearchField()),
+                ('document', posts.models.SearchField(db_column='posts_comment_search', editable=False)),
+                ('rank', models.FloatField(editable=False)),
+            ],
+            options={
+                'db_table': 'posts_comment_search',
+                'managed': False,
+            },
+        ),
+        migrations.RunSQL(CREATE_SQL, DROP_SQL),
+    ]
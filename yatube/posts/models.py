@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from .storage import media_storage
+
 User = get_user_model()
 
 
@@ -13,6 +15,42 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    """Планы выборки постов под конкретные страницы.
+
+    Каждый план подтягивает связанные объекты одним JOIN и читает только
+    те колонки, которые выводит шаблон.
+    """
+    LISTING_FIELDS = (
+        'text',
+        'pub_date',
+        'image',
+        'author',
+        'author__username',
+        'author__first_name',
+        'author__last_name',
+        'group',
+        'group__slug',
+    )
+    DETAIL_FIELDS = LISTING_FIELDS + ('group__title',)
+    SYNDICATION_FIELDS = DETAIL_FIELDS + ('updated',)
+
+    def for_listing(self):
+        return self.select_related('author', 'group').only(
+            *self.LISTING_FIELDS
+        )
+
+    def for_detail(self):
+        return self.select_related('author', 'group').only(
+            *self.DETAIL_FIELDS
+        )
+
+    def for_syndication(self):
+        return self.select_related('author', 'group').only(
+            *self.SYNDICATION_FIELDS
+        )
+
+
 class Post(models.Model):
     text = models.TextField(
         'Текст поста',
@@ -22,6 +60,10 @@ class Post(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -40,14 +82,40 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=media_storage,
         blank=True
     )
 
+    objects = PostQuerySet.as_manager()
+
     def __str__(self) -> str:
         return self.text[:15]
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='posts_post_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='posts_post_author_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='posts_post_group_date_idx'
+            ),
+            # По нему storage.release() проверяет ссылки на файл.
+            models.Index(fields=['image'], name='posts_post_image_idx'),
+        ]
+
+
+class CommentQuerySet(models.QuerySet):
+    def for_listing(self):
+        return self.select_related('author').only(
+            'text', 'created', 'post', 'author', 'author__username'
+        )
 
 
 class Comment(models.Model):
@@ -66,6 +134,16 @@ class Comment(models.Model):
         auto_now_add=True
     )
 
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='posts_comment_post_idx'
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -81,3 +159,194 @@ class Follow(models.Model):
 
     class Meta:
         unique_together = ['user', 'author']
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='posts_follow_author_idx'
+            ),
+        ]
+
+
+class FeedEntry(models.Model):
+    """Пост в ленте подписчика, разложенный туда при публикации."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        unique_together = ['user', 'post']
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='posts_feed_user_date_idx'
+            ),
+        ]
+
+
+class PulledAuthor(models.Model):
+    """Автор с большим числом подписчиков.
+
+    Его посты не раскладываются по лентам, а читаются при показе ленты.
+    """
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='pulled'
+    )
+
+
+class Suggestion(models.Model):
+    """Автор, на которого стоит подписаться; считает suggest_follows."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggestions'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    score = models.FloatField('Оценка')
+
+    class Meta:
+        unique_together = ['user', 'author']
+        indexes = [
+            models.Index(
+                fields=['user', '-score'],
+                name='posts_suggestion_user_idx'
+            ),
+        ]
+
+
+class Trending(models.Model):
+    """Пост с недавними комментариями и его оценка для «популярного».
+
+    score — логарифм суммы exp(λ·(t − EPOCH)) по комментариям, см.
+    posts.trending; группа повторяет Post.group для индекса.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending'
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='+'
+    )
+    score = models.FloatField('Оценка')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score'], name='posts_trending_score_idx'),
+            models.Index(
+                fields=['group', '-score'],
+                name='posts_trending_group_idx'
+            ),
+        ]
+
+
+class Counter(models.Model):
+    """Денормализованный счётчик, чтобы не считать COUNT(*) при показе."""
+    AUTHOR_POSTS = 'author_posts'
+    GROUP_POSTS = 'group_posts'
+    FOLLOWERS = 'followers'
+    FOLLOWING = 'following'
+    POST_COMMENTS = 'post_comments'
+    KINDS = (
+        (AUTHOR_POSTS, 'Постов автора'),
+        (GROUP_POSTS, 'Постов в группе'),
+        (FOLLOWERS, 'Подписчиков'),
+        (FOLLOWING, 'Подписок'),
+        (POST_COMMENTS, 'Комментариев к посту'),
+    )
+    kind = models.CharField('Счётчик', max_length=20, choices=KINDS)
+    object_id = models.PositiveIntegerField('Объект')
+    value = models.PositiveIntegerField('Значение', default=0)
+
+    class Meta:
+        unique_together = ['kind', 'object_id']
+
+    def __str__(self) -> str:
+        return f'{self.kind}:{self.object_id}={self.value}'
+
+
+class SearchField(models.TextField):
+    """Колонка таблицы FTS5, поддерживает lookup __match."""
+
+
+@SearchField.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class PostSearch(models.Model):
+    """Строка полнотекстового индекса постов.
+
+    Виртуальная таблица FTS5 и триггеры, которые держат её в актуальном
+    состоянии, создаются миграциями 0012_post_search и
+    0017_comment_search. Поле document соответствует скрытой колонке
+    с именем таблицы. rank — оценка bm25, чем меньше, тем лучше
+    совпадение.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        related_name='search'
+    )
+    text = SearchField()
+    document = SearchField(db_column='posts_search', editable=False)
+    rank = models.FloatField(editable=False)
+
+    class Meta:
+        managed = False
+        db_table = 'posts_search'
+
+
+class CommentSearch(models.Model):
+    """Строка полнотекстового индекса комментариев, по одной на комментарий.
+
+    Запись комментария меняет только свою строку. Таблица и триггеры
+    создаются миграцией 0017_comment_search.
+    """
+    comment = models.OneToOneField(
+        Comment,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        related_name='search'
+    )
+    text = SearchField()
+    document = SearchField(
+        db_column='posts_comment_search', editable=False
+    )
+    rank = models.FloatField(editable=False)
+
+    class Meta:
+        managed = False
+        db_table = 'posts_comment_search'
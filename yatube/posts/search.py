@@ -0,0 +1,71 @@
+"""Полнотекстовый поиск по постам и комментариям через SQLite FTS5.
+
+Индексы posts_search (текст постов) и posts_comment_search (по строке
+на комментарий) обновляются триггерами базы, поэтому в них попадают и
+изменения через QuerySet.update(). Запрос пользователя не передаётся
+в MATCH как есть: из него берутся слова, и каждое ищется по префиксу,
+чтобы синтаксис FTS5 не приводил к ошибкам.
+"""
+import re
+
+from django.db.models import OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Comment, CommentSearch, Post, PostSearch
+
+WORD = re.compile(r'\w+')
+# Вес совпадения в комментариях относительно совпадения в тексте поста.
+COMMENTS_WEIGHT = 0.3
+
+
+def match_query(text):
+    """Выражение для MATCH или пустая строка, если слов нет."""
+    words = WORD.findall(text.lower())
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def _matching_comments(query):
+    return CommentSearch.objects.filter(document__match=query)
+
+
+def filter_posts(posts, text, comments=True):
+    """Оставляет посты, совпавшие с запросом по тексту поста или,
+    если comments, по тексту его комментариев."""
+    query = match_query(text)
+    if not query:
+        return posts.none()
+    condition = Q(pk__in=PostSearch.objects.filter(
+        document__match=query
+    ).values('pk'))
+    if comments:
+        condition |= Q(pk__in=Comment.objects.filter(
+            pk__in=_matching_comments(query).values('pk')
+        ).values('post_id'))
+    return posts.filter(condition)
+
+
+def search_posts(text):
+    """Возвращает найденные посты и ключи для CursorPaginator.
+
+    Лучшие совпадения идут первыми: search_rank — сумма bm25 текста и
+    лучшего комментария с весом COMMENTS_WEIGHT, с обратным знаком.
+    """
+    query = match_query(text)
+    text_rank = PostSearch.objects.filter(
+        pk=OuterRef('pk'), document__match=query
+    ).values('rank')
+    # Лучший из комментариев поста: по индексу post_id, затем по rowid
+    # в FTS, а не перебор всех совпавших комментариев для каждого поста.
+    comment_rank = _matching_comments(query).filter(
+        pk__in=Subquery(Comment.objects.filter(
+            post=OuterRef(OuterRef('pk'))
+        ).values('pk'))
+    ).order_by('rank').values('rank')[:1]
+    posts = filter_posts(Post.objects.for_listing(), text).annotate(
+        search_rank=(
+            Coalesce(Subquery(text_rank), Value(0.0))
+            + Coalesce(Subquery(comment_rank), Value(0.0))
+            * COMMENTS_WEIGHT
+        ) * -1,
+    )
+    return posts, ('search_rank', 'pk')
@@ -0,0 +1,168 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import (
+    caching, counters, feed, follows, lookups, storage, thumbnails,
+    trending,
+)
+from .models import (
+    Comment, Counter, Follow, Group, Post, PulledAuthor, User
+)
+
+
+def bump(*scopes):
+    """Увеличивает версии списков сразу и ещё раз после коммита.
+
+    Иначе читатель, начавший до коммита, соберёт старый список под новой
+    версией и закеширует его на LISTING_CACHE_TIMEOUT.
+    """
+    caching.bump(*scopes)
+    transaction.on_commit(lambda: caching.bump(*scopes))
+
+
+def touch(*scopes):
+    """Отмечает изменение сразу и ещё раз после коммита.
+
+    Иначе ETag, посчитанный до коммита по новому времени и старым
+    данным, давал бы клиенту 304 на устаревшую страницу до следующего
+    изменения.
+    """
+    caching.touch(*scopes)
+    transaction.on_commit(lambda: caching.touch(*scopes))
+
+
+@receiver(post_init, sender=Post)
+def post_loaded(sender, instance, **kwargs):
+    instance._initial_group_id = instance.__dict__.get('group_id')
+    image = instance.__dict__.get('image')
+    instance._initial_image = getattr(image, 'name', image)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    old_group_id = instance._initial_group_id
+    if created:
+        readers = feed.fan_out(instance)
+        counters.change(Counter.AUTHOR_POSTS, instance.author_id, 1)
+        counters.change(Counter.GROUP_POSTS, instance.group_id, 1)
+    else:
+        readers = feed.readers(instance.author_id)
+        if old_group_id != instance.group_id:
+            counters.change(Counter.GROUP_POSTS, old_group_id, -1)
+            counters.change(Counter.GROUP_POSTS, instance.group_id, 1)
+            trending.move(instance)
+    bump(*caching.post_scopes(instance, old_group_id))
+    touch(*map(caching.feed_scope, readers))
+    instance._initial_group_id = instance.group_id
+    if instance.image:
+        name = instance.image.name
+        transaction.on_commit(lambda: thumbnails.pregenerate(name))
+    old_image = instance._initial_image
+    if old_image and old_image != instance.image.name:
+        transaction.on_commit(lambda: storage.release(old_image))
+    instance._initial_image = instance.image.name
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change(Counter.AUTHOR_POSTS, instance.author_id, -1)
+    counters.change(Counter.GROUP_POSTS, instance.group_id, -1)
+    Counter.objects.filter(
+        kind=Counter.POST_COMMENTS, object_id=instance.pk
+    ).delete()
+    bump(*caching.post_scopes(instance))
+    touch(*map(caching.feed_scope, feed.readers(instance.author_id)))
+    if instance.image:
+        name = instance.image.name
+        transaction.on_commit(lambda: storage.release(name))
+
+
+def invalidate(lookup):
+    """Сразу и ещё раз после коммита: до него другой процесс мог успеть
+    прочитать и закешировать старую строку."""
+    lookup.invalidate()
+    transaction.on_commit(lookup.invalidate)
+
+
+def forget_follows(user_id):
+    """Сразу и ещё раз после коммита, как invalidate()."""
+    follows.forget(user_id)
+    transaction.on_commit(lambda: follows.forget(user_id))
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    touch(caching.group_scope(instance.pk))
+    invalidate(lookups.groups)
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    Counter.objects.filter(
+        kind=Counter.GROUP_POSTS, object_id=instance.pk
+    ).delete()
+    invalidate(lookups.groups)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields, **kwargs):
+    if created:
+        follows.forget(instance.pk)
+    # Вход обновляет только last_login, которого в кеше нет.
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalidate(lookups.users)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    follows.forget(instance.pk)
+    invalidate(lookups.users)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change(Counter.POST_COMMENTS, instance.post_id, 1)
+        trending.record(instance)
+    touch(caching.post_scope(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change(Counter.POST_COMMENTS, instance.post_id, -1)
+    touch(caching.post_scope(instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        feed.backfill(instance)
+        counters.change(Counter.FOLLOWERS, instance.author_id, 1)
+        counters.change(Counter.FOLLOWING, instance.user_id, 1)
+        forget_follows(instance.user_id)
+    touch(
+        caching.follows_scope(instance.author_id),
+        caching.follows_scope(instance.user_id),
+        caching.feed_scope(instance.user_id),
+    )
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    feed.drop(instance)
+    counters.change(Counter.FOLLOWERS, instance.author_id, -1)
+    counters.change(Counter.FOLLOWING, instance.user_id, -1)
+    forget_follows(instance.user_id)
+    touch(
+        caching.follows_scope(instance.author_id),
+        caching.follows_scope(instance.user_id),
+        caching.feed_scope(instance.user_id),
+    )
+
+
+@receiver(post_save, sender=PulledAuthor)
+@receiver(post_delete, sender=PulledAuthor)
+def pulled_author_changed(sender, **kwargs):
+    feed.forget_pulled_authors()
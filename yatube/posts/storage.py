@@ -0,0 +1,81 @@
+"""Хранилище картинок постов, адресуемое содержимым.
+
+Файл называется по SHA-256 своего содержимого, поэтому одинаковые
+загрузки получают одно имя и записываются на диск один раз, а миниатюры
+sorl, которые строятся по имени исходника, у таких постов общие.
+Ссылками на файл считаются посты с этим именем в Post.image: release()
+удаляет файл и его миниатюры, когда на него не ссылается ни один пост.
+
+Модуль импортируется процессами пула миниатюр до django.setup(), поэтому
+модели загружаются только внутри функций.
+"""
+import hashlib
+import logging
+import os
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+from sorl.thumbnail import delete
+from sorl.thumbnail.images import ImageFile
+
+logger = logging.getLogger(__name__)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Сохраняет файл как <каталог>/ab/abcdef….jpg по хешу содержимого."""
+
+    def content_name(self, name, content):
+        """Имя по содержимому; name — имя в каталоге upload_to поля.
+
+        Каталог берётся из name как есть, поэтому уже сохранённое имя
+        вида posts/ab/… сюда передавать нельзя: см. upload_name().
+        """
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        hexdigest = digest.hexdigest()
+        return os.path.join(directory, hexdigest[:2], hexdigest + extension)
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        if self.exists(name):
+            return name
+        saved = super()._save(name, content)
+        if saved != name:
+            # Тот же файл параллельно записал другой запрос, а
+            # FileSystemStorage сохранил копию под другим именем.
+            super().delete(saved)
+        return name
+
+
+media_storage = ContentAddressedStorage()
+
+
+def upload_name(field, name):
+    """Имя файла name в корне upload_to поля, без каталогов хеша."""
+    return os.path.join(field.upload_to, os.path.basename(name))
+
+
+def is_referenced(name):
+    from .models import Post
+
+    return Post.objects.filter(image=name).exists()
+
+
+def release(name):
+    """Удаляет картинку и её миниатюры, если на неё не ссылаются посты."""
+    if not name or is_referenced(name):
+        return False
+    try:
+        delete(ImageFile(name, media_storage))
+    except (OSError, SuspiciousFileOperation):
+        # Уборка не должна ронять запрос, который удалил пост.
+        logger.exception('Не удалось удалить картинку %s', name)
+        return False
+    return True
@@ -0,0 +1,206 @@
+"""Рекомендации «на кого подписаться», которые считаются пакетно.
+
+Команда suggest_follows загружает Follow в две CSR-матрицы на array('I'):
+подписки по пользователям и подписчики по авторам. Из них считается
+похожесть авторов по общим подписчикам (косинус на выборке), а оценка
+кандидата для пользователя — сумма похожестей с его подписками плюс
+вклад групп, где пишут он сам и его авторы. Лучшие кандидаты ложатся в
+Suggestion, страницы читают их одним запросом по индексу (user, -score).
+"""
+import heapq
+import math
+import random
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from . import caching, follows
+from .models import Follow, Post, Suggestion, User
+
+EMPTY = array('I')
+
+
+class CSR:
+    """Разреженная матрица 0/1: строки — id по возрастанию, в строке —
+    отсортированные id столбцов."""
+
+    def __init__(self, pairs):
+        """pairs — пары (строка, столбец), отсортированные по строке."""
+        self.rows = array('I')
+        self.indptr = array('L', [0])
+        self.indices = array('I')
+        for row, column in pairs:
+            if not self.rows or self.rows[-1] != row:
+                if self.rows:
+                    self.indptr.append(len(self.indices))
+                self.rows.append(row)
+            self.indices.append(column)
+        if self.rows:
+            self.indptr.append(len(self.indices))
+
+    def __getitem__(self, row):
+        index = bisect_left(self.rows, row)
+        if index == len(self.rows) or self.rows[index] != row:
+            return EMPTY
+        return self.indices[self.indptr[index]:self.indptr[index + 1]]
+
+    def degree(self, row):
+        return len(self[row])
+
+
+def load_graph(chunk_size=10_000):
+    """Подписки и подписчики в CSR, потоком по индексам Follow."""
+    following = CSR(
+        Follow.objects.order_by('user_id', 'author_id')
+        .values_list('user_id', 'author_id').iterator(chunk_size)
+    )
+    followers = CSR(
+        Follow.objects.order_by('author_id', 'user_id')
+        .values_list('author_id', 'user_id').iterator(chunk_size)
+    )
+    return following, followers
+
+
+def sample(items, size, rng):
+    if len(items) <= size:
+        return items
+    return rng.sample(list(items), size)
+
+
+def similar_authors(following, followers, sample_size, neighbours, rng):
+    """Для каждого автора — до neighbours похожих по общим подписчикам.
+
+    Общие подписчики считаются по выборке из sample_size подписчиков
+    автора и sample_size подписок каждого из них; оценка нормируется
+    как косинус по полным степеням.
+    """
+    similar = {}
+    for author in followers.rows:
+        author_degree = followers.degree(author)
+        shared = Counter()
+        for user in sample(followers[author], sample_size, rng):
+            shared.update(sample(following[user], sample_size, rng))
+        shared.pop(author, None)
+        scores = (
+            (count / math.sqrt(author_degree * followers.degree(other)),
+             other)
+            for other, count in shared.items()
+        )
+        similar[author] = heapq.nlargest(neighbours, scores)
+    return similar
+
+
+def group_authors(per_group):
+    """Группы каждого автора и самые пишущие авторы каждой группы."""
+    groups_of = defaultdict(list)
+    top = defaultdict(list)
+    rows = (
+        Post.objects.exclude(group=None)
+        .values_list('group_id', 'author_id').annotate(posts=Count('pk'))
+        .order_by('group_id', '-posts').iterator()
+    )
+    for group_id, author_id, _ in rows:
+        groups_of[author_id].append(group_id)
+        if len(top[group_id]) < per_group:
+            top[group_id].append(author_id)
+    return groups_of, top
+
+
+class Recommender:
+    """Оценки кандидатов по готовым графу, похожести авторов и группам."""
+
+    def __init__(self, following, similar, groups_of, top, group_weight):
+        self.following = following
+        self.similar = similar
+        self.groups_of = groups_of
+        self.top = top
+        self.group_weight = group_weight
+
+    def suggest(self, user_id, size):
+        """До size лучших кандидатов пользователю: [(оценка, автор)]."""
+        followees = self.following[user_id]
+        scores = defaultdict(float)
+        for author in followees:
+            for score, other in self.similar.get(author, ()):
+                scores[other] += score
+        interests = Counter(self.groups_of.get(user_id, ()))
+        for author in followees:
+            interests.update(self.groups_of.get(author, ()))
+        total = sum(interests.values())
+        for group_id, count in interests.items():
+            for author in self.top[group_id]:
+                scores[author] += self.group_weight * count / total
+        return heapq.nlargest(size, (
+            (score, author) for author, score in scores.items()
+            if author != user_id and not follows.contains(followees, author)
+        ))
+
+    def store(self, user_ids, size):
+        """Заменяет рекомендации пользователей из отрезка user_ids."""
+        rows = [
+            Suggestion(user_id=user_id, author_id=author, score=score)
+            for user_id in user_ids
+            for score, author in self.suggest(user_id, size)
+        ]
+        with transaction.atomic():
+            Suggestion.objects.filter(
+                user_id__gte=user_ids[0], user_id__lte=user_ids[-1]
+            ).delete()
+            Suggestion.objects.bulk_create(rows)
+        return len(rows)
+
+
+def rebuild(size, sample_size=50, neighbours=50, group_weight=0.5,
+            per_group=20, batch_size=500, seed=0):
+    """Пересчитывает Suggestion для всех пользователей.
+
+    Строки заменяются пачками по batch_size пользователей подряд, каждая
+    пачка — в своей транзакции. Возвращает (пользователей, рекомендаций).
+    """
+    rng = random.Random(seed)
+    following, followers = load_graph()
+    recommender = Recommender(
+        following,
+        similar_authors(following, followers, sample_size, neighbours, rng),
+        *group_authors(per_group),
+        group_weight,
+    )
+    user_ids = User.objects.order_by('pk').values_list('pk', flat=True)
+    users = stored = 0
+    batch = []
+    for user_id in user_ids.iterator():
+        batch.append(user_id)
+        if len(batch) >= batch_size:
+            stored += recommender.store(batch, size)
+            users += len(batch)
+            batch = []
+    if batch:
+        stored += recommender.store(batch, size)
+        users += len(batch)
+    caching.touch(caching.suggestions_scope())
+    return users, stored
+
+
+def for_user(user):
+    """Рекомендации для страниц: один запрос по индексу (user, -score).
+
+    Авторы, на которых пользователь подписался после пересчёта,
+    отбрасываются по графу подписок из кеша.
+    """
+    if not user.is_authenticated:
+        return []
+    rows = Suggestion.objects.filter(user=user).order_by(
+        '-score'
+    ).select_related('author').only(
+        'author', 'author__username', 'author__first_name',
+        'author__last_name',
+    )[:settings.FOLLOW_SUGGESTIONS_STORED]
+    followees = follows.followees(user.pk)
+    return [
+        row.author for row in rows
+        if not follows.contains(followees, row.author_id)
+    ][:settings.FOLLOW_SUGGESTIONS_SHOWN]
@@ -0,0 +1,151 @@
+"""RSS и Atom ленты сайта, групп и авторов.
+
+Готовый XML лежит в кеше под версией списка из posts.caching, поэтому
+следующее сохранение поста в ленте делает его недоступным. Ленты
+описаны классами RSS, Atom-варианты получаются из них функцией atom().
+"""
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+
+from . import caching, lookups
+from .models import Post
+
+CACHE_KEY = 'posts:syndication:{name}:{scope}:{version}:{origin}'
+
+
+class FormatConverter:
+    """Формат ленты в адресе: rss или atom."""
+    regex = 'rss|atom'
+
+    def to_python(self, value):
+        return value
+
+    def to_url(self, value):
+        return value
+
+
+class PostsFeed(Feed):
+    """Последние посты сайта."""
+    title = 'Yatube: последние записи'
+    description = 'Последние обновления на сайте'
+
+    def __call__(self, request, *args, **kwargs):
+        try:
+            obj = self.get_object(request, *args, **kwargs)
+        except ObjectDoesNotExist:
+            raise Http404('Ленты не существует.')
+        scope = self.scope(obj)
+        # Ссылки в ленте абсолютные, поэтому ключ зависит от адреса сайта.
+        key = CACHE_KEY.format(
+            name=type(self).__name__,
+            scope=scope,
+            version=caching.get_version(scope),
+            origin=f'{request.scheme}://{request.get_host()}',
+        )
+        cached = cache.get(key)
+        if cached is None:
+            feed = self.get_feed(obj, request)
+            cached = (feed.writeString('utf-8'), feed.content_type)
+            cache.set(key, cached, caching.listing_timeout())
+        content, content_type = cached
+        return HttpResponse(content, content_type=content_type)
+
+    def scope(self, obj):
+        return caching.index_scope()
+
+    def link(self):
+        return reverse('posts:index')
+
+    def posts(self, obj):
+        return Post.objects.all()
+
+    def items(self, obj):
+        return self.posts(obj).for_syndication()[:settings.SYNDICATION_ITEMS]
+
+    def item_title(self, item):
+        return Truncator(item.text).chars(50)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', kwargs={'post_id': item.pk})
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_updateddate(self, item):
+        return item.updated
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_categories(self, item):
+        return (item.group.title,) if item.group else ()
+
+
+class GroupPostsFeed(PostsFeed):
+    """Последние посты группы."""
+
+    def get_object(self, request, slug, **kwargs):
+        return lookups.groups.get_or_404(slug)
+
+    def scope(self, obj):
+        return caching.group_scope(obj.pk)
+
+    def title(self, obj):
+        return f'Yatube: {obj.title}'
+
+    def description(self, obj):
+        return obj.description
+
+    def link(self, obj):
+        return reverse('posts:group_list', kwargs={'slug': obj.slug})
+
+    def posts(self, obj):
+        return obj.posts.all()
+
+
+class AuthorPostsFeed(PostsFeed):
+    """Последние посты автора."""
+
+    def get_object(self, request, username, **kwargs):
+        return lookups.users.get_or_404(username)
+
+    def scope(self, obj):
+        return caching.profile_scope(obj.pk)
+
+    def title(self, obj):
+        return f'Yatube: {obj.get_full_name() or obj.username}'
+
+    def description(self, obj):
+        return f'Все посты пользователя {obj.username}'
+
+    def link(self, obj):
+        return reverse('posts:profile', kwargs={'username': obj.username})
+
+    def posts(self, obj):
+        return obj.posts.all()
+
+
+def atom(feed_class):
+    """Atom-вариант ленты: описание RSS становится подзаголовком."""
+    def subtitle(self, obj):
+        return self._get_dynamic_attr('description', obj)
+
+    return type(f'Atom{feed_class.__name__}', (feed_class,), {
+        'feed_type': Atom1Feed,
+        'subtitle': subtitle,
+    })
+
+
+# Формат → экземпляр ленты.
+SITE_FEEDS = {'rss': PostsFeed(), 'atom': atom(PostsFeed)()}
+GROUP_FEEDS = {'rss': GroupPostsFeed(), 'atom': atom(GroupPostsFeed)()}
+AUTHOR_FEEDS = {'rss': AuthorPostsFeed(), 'atom': atom(AuthorPostsFeed)()}
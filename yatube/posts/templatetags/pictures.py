@@ -0,0 +1,46 @@
+import logging
+
+from django import template
+from sorl.thumbnail import get_thumbnail
+
+from posts.images import mime_type, variant_formats
+from posts.thumbnails import GEOMETRIES
+
+register = template.Library()
+logger = logging.getLogger(__name__)
+
+
+def thumbnail(image, geometry, **options):
+    """Миниатюра или None; ошибки не ломают страницу, как в {% thumbnail %}."""
+    try:
+        return get_thumbnail(image, geometry, **options)
+    except Exception:
+        logger.exception('Не удалось получить миниатюру %s', image)
+        return None
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def picture(image, geometry):
+    """<picture> с миниатюрой в JPEG и доп. форматах.
+
+    Пока JPEG-миниатюры нет, выводится заглушка; доп. форматы, которые
+    ещё не готовы, просто не попадают в <source>.
+    """
+    if not image:
+        return {}
+    options = dict(GEOMETRIES)[geometry]
+    fallback = thumbnail(image, geometry, **options)
+    sources = []
+    if fallback is not None:
+        for image_format in variant_formats():
+            variant = thumbnail(
+                image, geometry, format=image_format, **options
+            )
+            if variant is not None:
+                sources.append((mime_type(image_format), variant.url))
+    # У миниатюры пропавшего оригинала sorl не знает размеров.
+    size = fallback.size if fallback is not None else None
+    return {
+        'image': image, 'fallback': fallback, 'size': size,
+        'sources': sources,
+    }
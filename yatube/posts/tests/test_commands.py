@@ -0,0 +1,216 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from io import BytesIO, StringIO, TextIOWrapper
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .. import thumbnails
+from ..management.commands.import_data import Command as ImportCommand
+from ..models import Comment, Counter, FeedEntry, Follow, Group, Post
+from ..transfer import open_stream
+from ..urls import urlpatterns
+
+User = get_user_model()
+
+
+class BenchmarkViewsTests(SimpleTestCase):
+    def test_report(self):
+        """Отчёт содержит замеры каждой страницы posts/urls.py."""
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'report.json')
+            subprocess.run(
+                (
+                    sys.executable, 'manage.py', 'benchmark_views',
+                    '--users', '3', '--posts', '5', '--groups', '1',
+                    '--follows', '3', '--comments', '3', '--repeat', '2',
+                    '--warmup', '0', '--output', output,
+                ),
+                cwd=settings.BASE_DIR,
+                check=True,
+                capture_output=True,
+            )
+            with open(output, encoding='utf-8') as file:
+                report = json.load(file)
+        for pattern in urlpatterns:
+            with self.subTest(name=pattern.name):
+                view = report['views'][f'posts:{pattern.name}']
+                self.assertLessEqual(view['p50_ms'], view['p99_ms'])
+                self.assertGreater(view['queries'], 0)
+
+
+class BenchmarkImagesTests(SimpleTestCase):
+    def test_report(self):
+        """Для каждой миниатюры есть замер с нормализацией."""
+        out = StringIO()
+        call_command(
+            'benchmark_images', width=64, height=48, repeat=1, stdout=out
+        )
+        report = out.getvalue()
+        self.assertIn('нормализация  загрузка', report)
+        for geometry, options in thumbnails.variants():
+            with self.subTest(geometry=geometry, options=options):
+                self.assertIn(
+                    f'{geometry} {options.get("format", "JPEG")}', report
+                )
+
+
+class TransferCommandsTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        posts = [
+            Post.objects.create(
+                text=f'Пост {i}', author=author, group=group if i else None
+            )
+            for i in range(5)
+        ]
+        Comment.objects.create(post=posts[0], author=reader, text='Ответ')
+        Follow.objects.create(user=reader, author=author)
+        self.snapshot = self.dump()
+
+    def dump(self):
+        """Содержимое базы без суррогатных id пользователей и групп."""
+        return {
+            'users': list(User.objects.order_by('username').values_list(
+                'username', 'first_name', 'last_name'
+            )),
+            'groups': list(Group.objects.values_list('slug', 'title')),
+            'posts': list(Post.objects.order_by('pk').values_list(
+                'pk', 'text', 'author__username', 'group__slug',
+                'pub_date', 'updated'
+            )),
+            'comments': list(Comment.objects.values_list(
+                'pk', 'post_id', 'author__username', 'text', 'created'
+            )),
+            'follows': list(Follow.objects.values_list(
+                'user__username', 'author__username'
+            )),
+            'feed': FeedEntry.objects.count(),
+            'counters': sorted(Counter.objects.values_list('kind', 'value')),
+        }
+
+    def export(self, name):
+        path = os.path.join(self.directory.name, name)
+        call_command(
+            'export_data', output=path, chunk_size=2, stdout=StringIO()
+        )
+        return path
+
+    def clear(self):
+        for model in (Comment, Follow, Post, Group, User):
+            model.objects.all().delete()
+
+    def test_round_trip(self):
+        """Выгрузка и загрузка в пустую базу ничего не теряют."""
+        for name in ('data.ndjson', 'data.ndjson.gz'):
+            with self.subTest(name=name):
+                path = self.export(name)
+                self.clear()
+                output = StringIO()
+                call_command('import_data', path, batch_size=2, stdout=output)
+                self.assertEqual(self.dump(), self.snapshot)
+                self.assertIn('записей/с', output.getvalue())
+                self.assertFalse(os.path.exists(f'{path}.progress'))
+
+    def test_skips_unresolved(self):
+        path = os.path.join(self.directory.name, 'data.ndjson')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(json.dumps({
+                'type': 'post', 'id': 100, 'author': 'nobody', 'group': None,
+                'text': 'Пост', 'pub_date': '2020-01-01T00:00:00+00:00',
+                'updated': '2020-01-01T00:00:00+00:00', 'image': '',
+            }) + '\n')
+        output = StringIO()
+        call_command('import_data', path, stdout=output)
+        self.assertFalse(Post.objects.filter(pk=100).exists())
+        self.assertIn('пропущено 1', output.getvalue())
+
+    def test_posts_reach_existing_followers(self):
+        """Загруженные посты попадают в ленты подписок, которые уже есть."""
+        author = User.objects.get(username='author')
+        reader = User.objects.get(username='reader')
+        path = os.path.join(self.directory.name, 'data.ndjson')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(json.dumps({
+                'type': 'post', 'id': 100, 'author': 'author',
+                'group': None, 'text': 'Загруженный пост',
+                'pub_date': '2020-01-01T00:00:00+00:00',
+                'updated': '2020-01-01T00:00:00+00:00', 'image': '',
+            }) + '\n')
+        call_command('import_data', path, stdout=StringIO())
+        self.assertTrue(FeedEntry.objects.filter(
+            user=reader, post_id=100, author=author
+        ).exists())
+
+    def test_follows_backfilled_in_batches(self):
+        """Ленты загруженных подписок заполняются без запроса на подписку."""
+        reader = User.objects.get(username='reader')
+        Follow.objects.all().delete()
+        authors = ['author'] + [f'writer{i}' for i in range(3)]
+        for name in authors[1:]:
+            writer = User.objects.create_user(username=name)
+            for i in range(3):
+                Post.objects.create(text=f'Пост {i}', author=writer)
+        path = os.path.join(self.directory.name, 'data.ndjson')
+        queries = []
+        for count in (1, len(authors)):
+            with open(path, 'w', encoding='utf-8') as file:
+                for name in authors[:count]:
+                    file.write(json.dumps({
+                        'type': 'follow', 'user': 'reader', 'author': name,
+                    }) + '\n')
+            with self.settings(FEED_BACKFILL_SIZE=2), \
+                    CaptureQueriesContext(connection) as context:
+                call_command('import_data', path, stdout=StringIO())
+            queries.append(len(context))
+        self.assertEqual(queries[0], queries[1])
+        self.assertEqual(FeedEntry.objects.filter(user=reader).count(), 8)
+        self.assertFalse(FeedEntry.objects.filter(
+            user=reader, post__text='Пост 0'
+        ).exclude(author__username='author').exists())
+
+    def test_dash_stream_left_open(self):
+        """with open_stream('-') не закрывает stdin и stdout."""
+        for name, mode in (('stdin', 'rb'), ('stdout', 'wb')):
+            with self.subTest(name=name):
+                stream = TextIOWrapper(BytesIO())
+                with mock.patch(f'sys.{name}', stream):
+                    with open_stream('-', mode) as file:
+                        self.assertIs(file, stream.buffer)
+                self.assertFalse(stream.buffer.closed)
+
+    def test_resume(self):
+        """Прерванный импорт продолжается с сохранённой позиции."""
+        path = self.export('data.ndjson')
+        self.clear()
+        with mock.patch.object(
+            ImportCommand, 'import_comment', side_effect=RuntimeError
+        ), self.assertRaises(RuntimeError):
+            call_command('import_data', path, batch_size=2, stdout=StringIO())
+        self.assertTrue(os.path.exists(f'{path}.progress'))
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertFalse(Comment.objects.exists())
+        with mock.patch.object(
+            ImportCommand, 'import_post', side_effect=AssertionError
+        ):
+            call_command(
+                'import_data', path, resume=True, batch_size=2,
+                stdout=StringIO()
+            )
+        self.assertEqual(self.dump(), self.snapshot)
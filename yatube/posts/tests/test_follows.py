@@ -0,0 +1,137 @@
+from array import array
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import feed, follows
+from ..models import Follow, Post, PulledAuthor
+
+User = get_user_model()
+
+
+class FollowGraphTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader')
+        self.authors = [
+            User.objects.create_user(username=f'author-{number}')
+            for number in range(3)
+        ]
+        self.client.force_login(self.user)
+
+    def test_followees_sorted_and_cached(self):
+        for author in reversed(self.authors[:2]):
+            Follow.objects.create(user=self.user, author=author)
+        expected = array('I', sorted(a.pk for a in self.authors[:2]))
+        self.assertEqual(follows.followees(self.user.pk), expected)
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                follows.is_following(self.user.pk, self.authors[0].pk)
+            )
+            self.assertFalse(
+                follows.is_following(self.user.pk, self.authors[2].pk)
+            )
+
+    def test_signals_forget_followees(self):
+        """Подписка и отписка сбрасывают массив, а не правят его."""
+        follows.followees(self.user.pk)
+        follow = Follow.objects.create(user=self.user, author=self.authors[1])
+        self.assertIsNone(cache.get(follows.KEY.format(self.user.pk)))
+        Follow.objects.create(user=self.user, author=self.authors[0])
+        follows.followees(self.user.pk)
+        follow.delete()
+        self.assertIsNone(cache.get(follows.KEY.format(self.user.pk)))
+        self.assertEqual(
+            list(follows.followees(self.user.pk)), [self.authors[0].pk]
+        )
+        with self.assertNumQueries(0):
+            follows.followees(self.user.pk)
+
+    def test_stale_cache_on_follow(self):
+        """Отставший кеш не ломает повторную подписку."""
+        author = self.authors[0]
+        Follow.objects.create(user=self.user, author=author)
+        cache.set(follows.KEY.format(self.user.pk), array('I').tobytes())
+        response = self.client.get(
+            reverse('posts:profile_follow', kwargs={'username': author})
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            Follow.objects.filter(user=self.user, author=author).count(), 1
+        )
+        self.assertTrue(follows.is_following(self.user.pk, author.pk))
+
+    def test_empty_feed_without_queries(self):
+        posts, keys = feed.feed_posts(self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(list(posts), [])
+
+    def test_pulled_authors_in_feed(self):
+        """Посты автора из PulledAuthor попадают в ленту подписчика."""
+        pulled, regular, _ = self.authors
+        for author in (pulled, regular):
+            Follow.objects.create(user=self.user, author=author)
+        self.assertEqual(list(feed.pulled_authors()), [])
+        PulledAuthor.objects.create(author=pulled)
+        post = Post.objects.create(text='Без раскладки', author=pulled)
+        self.assertEqual(list(feed.pulled_authors()), [pulled.pk])
+        posts, keys = feed.feed_posts(self.user)
+        self.assertEqual(keys, ('feed_date', 'feed_post'))
+        self.assertIn(post, posts)
+
+    @override_settings(NUMBER_OF_POSTS=3)
+    def test_pulled_authors_merged_by_index(self):
+        """Лента с автором из PulledAuthor идёт страницами по курсору, а
+        каждая часть читается своим индексом без обхода всех постов."""
+        pulled, regular, _ = self.authors
+        for author in (pulled, regular):
+            Follow.objects.create(user=self.user, author=author)
+        PulledAuthor.objects.create(author=pulled)
+        feed.forget_pulled_authors()
+        expected = []
+        for number in range(4):
+            for author in (pulled, regular):
+                expected.append(Post.objects.create(
+                    text=f'Пост {number}', author=author
+                ).pk)
+        expected.reverse()
+        seen, query = [], ''
+        with CaptureQueriesContext(connection) as queries:
+            while query is not None:
+                page = self.client.get(
+                    reverse('posts:follow_index') + '?' + query
+                ).context['page_obj']
+                seen += [post.pk for post in page]
+                query = page.paginator.next_query
+        self.assertEqual(seen, expected)
+        with connection.cursor() as cursor:
+            for captured in queries.captured_queries:
+                if 'posts_post' not in captured['sql']:
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + captured['sql'])
+                plan = ' '.join(row[-1] for row in cursor.fetchall())
+                self.assertNotIn('SCAN posts_post', plan)
+
+    def test_intersect(self):
+        self.assertEqual(
+            feed._intersect(array('I', [1, 3, 5, 7]), array('I', [3, 4, 7])),
+            [3, 7],
+        )
+
+
+class FollowGraphCommitTests(TransactionTestCase):
+    def test_followees_forgotten_after_commit(self):
+        """Массив, собранный до коммита подписки, после него сброшен."""
+        cache.clear()
+        user, author = [
+            User.objects.create_user(username=name)
+            for name in ('reader', 'author')
+        ]
+        with transaction.atomic():
+            Follow.objects.create(user=user, author=author)
+            cache.set(follows.KEY.format(user.pk), array('I').tobytes())
+        self.assertTrue(follows.is_following(user.pk, author.pk))
@@ -1,11 +1,15 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.contrib.auth import get_user_model
 from django.conf import settings
+from django.core.cache import caches
 from django.test import Client, TestCase, override_settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
+from PIL import Image
+
 from ..models import Post
 
 User = get_user_model()
@@ -21,6 +25,7 @@ class TestsForms(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        caches['ratelimit'].clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.user = User.objects.create(username='test-user')
@@ -57,11 +62,9 @@ class TestsForms(TestCase):
             follow=True
         )
         self.assertEqual(Post.objects.count(), posts_count + 1)
-        self.assertTrue(
-            Post.objects.filter(
-                text='Тестовый текст поста',
-                image='posts/small.gif'
-            ).exists()
+        post = Post.objects.get(text='Тестовый текст поста')
+        self.assertRegex(
+            post.image.name, r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$'
         )
 
     def test_edit_post(self):
@@ -103,3 +106,57 @@ class TestsForms(TestCase):
             ('Загрузите правильное изображение. Файл, который вы загрузили, '
              'поврежден или не является изображением.')
         )
+
+    def upload(self, image, name, **params):
+        """Создаёт пост с картинкой и возвращает её, открытую заново."""
+        content = BytesIO()
+        image.save(content, **params)
+        self.authorized_client.post(reverse('posts:post_create'), data={
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile(name, content.getvalue()),
+        })
+        post = Post.objects.get(text='Пост с картинкой')
+        return Image.open(post.image.path)
+
+    @override_settings(IMAGE_MAX_SIZE=100)
+    def test_image_normalized(self):
+        """Снимок уменьшается, поворачивается по EXIF и теряет EXIF."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'Камера'
+        image = self.upload(
+            Image.new('RGB', (300, 200), 'red'), 'photo.jpeg',
+            format='JPEG', exif=exif.tobytes(),
+        )
+        self.assertEqual(image.format, 'JPEG')
+        self.assertEqual(image.size, (67, 100))
+        self.assertNotIn('exif', image.info)
+        self.assertTrue(image.info.get('progressive'))
+
+    def test_transparent_image_stays_png(self):
+        image = self.upload(
+            Image.new('RGBA', (20, 10), (0, 0, 0, 0)), 'logo.png',
+            format='PNG',
+        )
+        self.assertEqual(image.format, 'PNG')
+        self.assertEqual(image.mode, 'RGBA')
+
+    @override_settings(IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels(self):
+        """Картинка больше предела отклоняется до распаковки."""
+        content = BytesIO()
+        Image.new('RGB', (20, 10)).save(content, 'PNG')
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Огромная картинка',
+                'image': SimpleUploadedFile('huge.png', content.getvalue()),
+            },
+        )
+        self.assertFormError(
+            response, 'form', 'image',
+            'Слишком большое изображение: 200 пикселей.'
+        )
+        self.assertFalse(
+            Post.objects.filter(text='Огромная картинка').exists()
+        )
@@ -0,0 +1,94 @@
+import multiprocessing
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import Http404
+from django.test import TestCase, override_settings
+
+from core import timing
+
+from .. import caching, lookups
+from ..models import Group
+
+User = get_user_model()
+
+
+@override_settings(LOOKUP_VERSION_CHECK=0)
+class LookupCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        timing.reset()
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+
+    def test_hit_without_queries(self):
+        self.assertEqual(lookups.groups.get('group'), self.group)
+        with self.assertNumQueries(0):
+            group = lookups.groups.get('group')
+        self.assertEqual(group.title, 'Группа')
+        self.assertEqual(
+            timing.lookup_summary()['group'],
+            {'misses': 1, 'hits': 1, 'hit_ratio': 0.5},
+        )
+
+    def test_negative_cache(self):
+        """Повторный 404 не ходит в базу, а новый пользователь виден сразу."""
+        with self.assertRaises(Http404):
+            lookups.users.get_or_404('ghost')
+        with self.assertNumQueries(0), self.assertRaises(Http404):
+            lookups.users.get_or_404('ghost')
+        user = User.objects.create_user(username='ghost')
+        self.assertEqual(lookups.users.get('ghost'), user)
+        self.assertEqual(timing.lookup_summary()['user']['negative_hits'], 1)
+
+    def test_changed_group_invalidated(self):
+        lookups.groups.get('group')
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertEqual(lookups.groups.get('group').title, 'Новое название')
+        self.group.delete()
+        self.assertIsNone(lookups.groups.get('group'))
+
+    def test_other_process_invalidation(self):
+        """Версия в общем кеше сбрасывает словарь процесса."""
+        lookups.groups.get('group')
+        Group.objects.filter(pk=self.group.pk).update(title='Мимо сигналов')
+        self.assertEqual(lookups.groups.get('group').title, 'Группа')
+        caching.bump(lookups.groups.scope)
+        self.assertEqual(lookups.groups.get('group').title, 'Мимо сигналов')
+
+    def test_invalidation_from_another_process(self):
+        """Сброс в другом процессе виден через кеш default."""
+        lookups.groups.get('group')
+        Group.objects.filter(pk=self.group.pk).update(title='Мимо сигналов')
+        process = multiprocessing.get_context('fork').Process(
+            target=caching.bump, args=(lookups.groups.scope,)
+        )
+        process.start()
+        process.join()
+        self.assertEqual(process.exitcode, 0)
+        self.assertEqual(lookups.groups.get('group').title, 'Мимо сигналов')
+
+    @override_settings(LOOKUP_VERSION_CHECK=60)
+    def test_version_checked_periodically(self):
+        lookups.groups.invalidate()
+        lookups.groups.get('group')
+        caching.bump(lookups.groups.scope)
+        with self.assertNumQueries(0):
+            lookups.groups.get('group')
+
+    def test_login_keeps_cache(self):
+        """Вход меняет только last_login и кеш не сбрасывает."""
+        user = User.objects.create_user(username='author', password='pass')
+        lookups.users.get('author')
+        self.client.login(username='author', password='pass')
+        with self.assertNumQueries(0):
+            self.assertEqual(lookups.users.get('author'), user)
+
+    @override_settings(LOOKUP_CACHE_SIZE=2)
+    def test_size_limit(self):
+        for slug in ('one', 'two', 'group'):
+            lookups.groups.get(slug)
+        with self.assertNumQueries(1):
+            lookups.groups.get('one')
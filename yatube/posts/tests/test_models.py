@@ -1,7 +1,11 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Group, Post
+from .. import counters
+from ..models import Comment, Counter, Follow, Group, Post
 
 User = get_user_model()
 
@@ -59,3 +63,61 @@ class PostModelTest(TestCase):
                 self.assertEqual(
                     post._meta.get_field(field).help_text,
                     expected_value)
+
+
+class CounterTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        self.post = Post.objects.create(
+            author=self.author,
+            text='Тестовый пост',
+            group=self.group,
+        )
+
+    def values(self):
+        return counters.get(
+            (Counter.AUTHOR_POSTS, self.author.pk),
+            (Counter.GROUP_POSTS, self.group.pk),
+            (Counter.FOLLOWERS, self.author.pk),
+            (Counter.FOLLOWING, self.reader.pk),
+            (Counter.POST_COMMENTS, self.post.pk),
+        )
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются вместе с постами, комментариями и подписками."""
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(list(self.values().values()), [1, 1, 1, 1, 1])
+        follow.delete()
+        self.post.group = None
+        self.post.save()
+        self.assertEqual(list(self.values().values()), [1, 0, 0, 0, 1])
+        self.post.delete()
+        self.assertEqual(list(self.values().values()), [0, 0, 0, 0, 0])
+
+    def test_stale_counter_does_not_block_delete(self):
+        """Обнулённый счётчик не мешает удалить пост и не уходит в минус."""
+        Counter.objects.filter(kind=Counter.AUTHOR_POSTS).update(value=0)
+        self.post.delete()
+        self.assertFalse(Post.objects.exists())
+        self.assertEqual(
+            self.values()[Counter.AUTHOR_POSTS, self.author.pk], 0
+        )
+
+    def test_reconcile_counters(self):
+        """Команда reconcile_counters исправляет разошедшиеся счётчики."""
+        Counter.objects.filter(kind=Counter.AUTHOR_POSTS).update(value=42)
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('1', out.getvalue())
+        self.assertEqual(
+            self.values()[Counter.AUTHOR_POSTS, self.author.pk], 1
+        )
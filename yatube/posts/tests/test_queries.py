@@ -0,0 +1,147 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+from ..urls import urlpatterns
+
+User = get_user_model()
+
+# Предельное число SQL-запросов на страницу с холодным кешем.
+# Число не должно расти вместе с числом постов и комментариев на странице.
+# Страницы с ETag тратят ещё один запрос на время изменения.
+QUERY_BUDGETS = {
+    'index': 4,
+    'trending': 4,
+    'group_list': 6,
+    'group_trending': 4,
+    'profile': 8,
+    'post_detail': 7,
+    'comments': 4,
+    'post_create': 5,
+    'post_edit': 6,
+    'add_comment': 8,
+    'follow_index': 7,
+    'search': 4,
+    'site_feed': 3,
+    'group_feed': 4,
+    'profile_feed': 4,
+    'profile_follow': 16,
+    'profile_unfollow': 10,
+}
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = [
+            User.objects.create_user(
+                username=f'user-{i}',
+                first_name='Имя',
+                last_name=f'Фамилия {i}'
+            )
+            for i in range(5)
+        ]
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {i}',
+                slug=f'group-{i}',
+                description='Тестовое описание'
+            )
+            for i in range(3)
+        ]
+        for i in range(15):
+            cls.post = Post.objects.create(
+                text=f'Тестовый пост {i}',
+                author=cls.users[i % 5],
+                group=cls.groups[i % 3]
+            )
+        for user in cls.users:
+            Comment.objects.create(
+                post=cls.post,
+                author=user,
+                text='Тестовый комментарий'
+            )
+        cls.reader = User.objects.create_user(username='reader')
+        for user in cls.users[1:]:
+            Follow.objects.create(user=cls.reader, author=user)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(QueryBudgetTests.post.author)
+
+    def requests(self):
+        """Запрос к каждому адресу posts/urls.py: (имя, метод, url, данные)."""
+        post = QueryBudgetTests.post
+        author = QueryBudgetTests.users[0].username
+        return (
+            ('index', self.client.get, reverse('posts:index')),
+            ('trending', self.client.get, reverse('posts:trending')),
+            ('group_trending', self.client.get, reverse(
+                'posts:group_trending', kwargs={'slug': 'group-0'}
+            )),
+            ('group_list', self.client.get, reverse(
+                'posts:group_list', kwargs={'slug': 'group-0'}
+            )),
+            ('profile', self.client.get, reverse(
+                'posts:profile', kwargs={'username': post.author.username}
+            )),
+            ('post_detail', self.client.get, reverse(
+                'posts:post_detail', kwargs={'post_id': post.pk}
+            )),
+            ('comments', self.client.get, reverse(
+                'posts:comments', kwargs={'post_id': post.pk}
+            )),
+            ('post_create', self.client.get, reverse('posts:post_create')),
+            ('post_edit', self.author_client.get, reverse(
+                'posts:post_edit', kwargs={'post_id': post.pk}
+            )),
+            ('add_comment', self.client.post, reverse(
+                'posts:add_comment', kwargs={'post_id': post.pk}
+            ), {'text': 'Тестовый комментарий'}),
+            ('follow_index', self.client.get, reverse('posts:follow_index')),
+            ('search', self.client.get, reverse('posts:search'), {
+                'q': 'тестовый'
+            }),
+            ('site_feed', self.client.get, reverse(
+                'posts:site_feed', kwargs={'format': 'rss'}
+            )),
+            ('group_feed', self.client.get, reverse(
+                'posts:group_feed', kwargs={'slug': 'group-0', 'format': 'rss'}
+            )),
+            ('profile_feed', self.client.get, reverse(
+                'posts:profile_feed',
+                kwargs={'username': author, 'format': 'atom'}
+            )),
+            ('profile_follow', self.client.get, reverse(
+                'posts:profile_follow', kwargs={'username': author}
+            )),
+            ('profile_unfollow', self.client.get, reverse(
+                'posts:profile_unfollow', kwargs={'username': author}
+            )),
+        )
+
+    def test_every_url_has_budget(self):
+        """У каждого адреса из posts/urls.py есть бюджет запросов."""
+        names = {pattern.name for pattern in urlpatterns}
+        self.assertEqual(names, set(QUERY_BUDGETS))
+        self.assertEqual(names, {name for name, *_ in self.requests()})
+
+    def test_query_budgets(self):
+        """Страницы укладываются в бюджет SQL-запросов."""
+        for name, method, url, *data in self.requests():
+            with self.subTest(name=name):
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    method(url, *data)
+                self.assertLessEqual(
+                    len(queries),
+                    QUERY_BUDGETS[name],
+                    '\n'.join(query['sql'] for query in queries)
+                )
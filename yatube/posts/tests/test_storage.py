@@ -0,0 +1,123 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from sorl.thumbnail import get_thumbnail
+
+from ..models import Post
+from ..storage import media_storage
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ContentAddressedStorageTests(TransactionTestCase):
+    """Файлы освобождаются после коммита, поэтому тесты без транзакции."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create(username='author')
+
+    def create(self, name='small.gif', content=SMALL_GIF):
+        return Post.objects.create(
+            text='Пост', author=self.user,
+            image=SimpleUploadedFile(name, content),
+        )
+
+    def test_same_content_same_file(self):
+        """Одинаковые загрузки хранятся одним файлом."""
+        first = self.create('one.gif')
+        second = self.create('two.GIF')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(
+            first.image.name, r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.gif$'
+        )
+        directory = os.path.dirname(first.image.path)
+        self.assertEqual(os.listdir(directory), [
+            os.path.basename(first.image.name)
+        ])
+
+    def test_file_removed_with_last_reference(self):
+        """Файл и миниатюры удаляются вместе с последним постом."""
+        first = self.create()
+        second = self.create()
+        path = first.image.path
+        thumbnail = get_thumbnail(first.image, '10x10')
+        self.assertTrue(media_storage.exists(thumbnail.name))
+
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(media_storage.exists(thumbnail.name))
+
+    def test_replaced_image_released(self):
+        post = self.create()
+        path = post.image.path
+        post.image = SimpleUploadedFile('new.gif', SMALL_GIF + b'\x00')
+        post.save()
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(os.path.exists(post.image.path))
+
+    def test_dedupe_media(self):
+        """Файлы под исходными именами сливаются в один по содержимому."""
+        legacy = FileSystemStorage()
+        posts = [
+            Post.objects.create(
+                text='Старый пост', author=self.user,
+                image=legacy.save(name, ContentFile(SMALL_GIF)),
+            )
+            for name in ('posts/a.gif', 'posts/b.gif')
+        ]
+        out = StringIO()
+        call_command('dedupe_media', stdout=out)
+        self.assertIn(
+            'Перенесено файлов: 1, слито с копиями: 1', out.getvalue()
+        )
+        names = {post.image.name for post in Post.objects.all()}
+        self.assertEqual(len(names), 1)
+        self.assertTrue(media_storage.exists(names.pop()))
+        for post in posts:
+            self.assertFalse(legacy.exists(post.image.name))
+
+    def test_dedupe_media_idempotent(self):
+        """Повторный запуск не трогает имена по содержимому и сливает
+        старые файлы с уже загруженными."""
+        uploaded = self.create()
+        legacy = FileSystemStorage()
+        old = Post.objects.create(
+            text='Старый пост', author=self.user,
+            image=legacy.save('posts/old.gif', ContentFile(SMALL_GIF)),
+        )
+        for _ in range(2):
+            out = StringIO()
+            call_command('dedupe_media', stdout=out)
+        self.assertIn(
+            'Перенесено файлов: 0, слито с копиями: 0', out.getvalue()
+        )
+        old.refresh_from_db()
+        self.assertEqual(old.image.name, uploaded.image.name)
+        self.assertTrue(media_storage.exists(uploaded.image.name))
@@ -0,0 +1,92 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import suggestions
+from ..models import Follow, Group, Post, Suggestion
+
+User = get_user_model()
+
+
+class SuggestionsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = {
+            name: User.objects.create_user(username=name)
+            for name in ('a', 'b', 'c', 'x', 'y', 'z')
+        }
+        for user, authors in (('a', 'xy'), ('b', 'xyz'), ('c', 'x')):
+            for author in authors:
+                Follow.objects.create(
+                    user=self.users[user], author=self.users[author]
+                )
+
+    def suggested(self, name):
+        return [
+            row.author.username for row in Suggestion.objects.filter(
+                user=self.users[name]
+            ).order_by('-score')
+        ]
+
+    def test_csr(self):
+        matrix = suggestions.CSR([(1, 5), (1, 7), (4, 2)])
+        self.assertEqual(list(matrix[1]), [5, 7])
+        self.assertEqual(list(matrix[4]), [2])
+        self.assertEqual(list(matrix[3]), [])
+        self.assertEqual(matrix.degree(1), 2)
+
+    def test_co_follow(self):
+        """Предлагаются авторы, которых читают вместе с подписками."""
+        users, stored = suggestions.rebuild(size=5)
+        self.assertEqual(users, len(self.users))
+        self.assertEqual(self.suggested('c'), ['y', 'z'])
+        self.assertEqual(self.suggested('a'), ['z'])
+        self.assertEqual(self.suggested('b'), [])
+        self.assertEqual(stored, 3)
+
+    def test_shared_groups(self):
+        """Без подписок выручают авторы групп, где пишет сам пользователь."""
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        newcomer = User.objects.create_user(username='newcomer')
+        self.users['newcomer'] = newcomer
+        for author in (newcomer, self.users['z']):
+            Post.objects.create(text='Пост', author=author, group=group)
+        suggestions.rebuild(size=5)
+        self.assertEqual(self.suggested('newcomer'), ['z'])
+
+    def test_rebuild_replaces_rows(self):
+        suggestions.rebuild(size=5)
+        Follow.objects.create(user=self.users['c'], author=self.users['y'])
+        suggestions.rebuild(size=5)
+        self.assertEqual(self.suggested('c'), ['z'])
+
+    def test_pages_show_suggestions(self):
+        """Страницы показывают рекомендации без уже оформленных подписок."""
+        suggestions.rebuild(size=5)
+        Follow.objects.create(user=self.users['c'], author=self.users['z'])
+        self.client.force_login(self.users['c'])
+        for url in (
+            reverse('posts:follow_index'),
+            reverse('posts:profile', kwargs={'username': 'x'}),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                names = [
+                    user.username for user in response.context['suggestions']
+                ]
+                self.assertEqual(names, ['y'])
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'y'})
+        )
+        self.assertEqual(response.context['suggestions'], [])
+
+    def test_command(self):
+        out = StringIO()
+        call_command('suggest_follows', stdout=out)
+        self.assertIn('рекомендаций: 3', out.getvalue())
@@ -0,0 +1,131 @@
+import math
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import trending
+from ..models import Comment, Group, Post, Trending
+
+User = get_user_model()
+
+
+@override_settings(TRENDING_HALF_LIFE=60 * 60, TRENDING_WINDOW=24 * 60 * 60)
+class TrendingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader')
+        self.groups = [
+            Group.objects.create(
+                title=f'Группа {number}',
+                slug=f'group-{number}',
+                description='Тестовое описание'
+            )
+            for number in range(2)
+        ]
+        self.posts = [
+            Post.objects.create(
+                text=f'Тестовый пост {number}',
+                author=self.user,
+                group=self.groups[number % 2]
+            )
+            for number in range(3)
+        ]
+
+    def comment(self, post, age=0):
+        """Комментарий, оставленный age часов назад.
+
+        Сигнал учитывает его как свежий, давность видна только rollup().
+        """
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Комментарий'
+        )
+        Comment.objects.filter(pk=comment.pk).update(
+            created=timezone.now() - timedelta(hours=age)
+        )
+
+    def score(self, post):
+        return Trending.objects.get(post=post).score
+
+    def test_logaddexp(self):
+        self.assertAlmostEqual(trending.logaddexp(0, 0), math.log(2))
+        self.assertEqual(trending.logaddexp(1e4, -1e4), 1e4)
+
+    def test_record_accumulates(self):
+        """Каждый новый комментарий прибавляет к активности единицу."""
+        for _ in range(3):
+            self.comment(self.posts[0])
+        self.assertAlmostEqual(
+            trending.activity(self.score(self.posts[0])), 3, 2
+        )
+
+    def test_recent_comment_outweighs_old(self):
+        """Два комментария двухчасовой давности весят как половина
+        свежего при периоде полураспада в час."""
+        self.comment(self.posts[0], age=2)
+        self.comment(self.posts[0], age=2)
+        self.comment(self.posts[1])
+        trending.rollup()
+        self.assertAlmostEqual(
+            math.exp(self.score(self.posts[0]) - self.score(self.posts[1])),
+            0.5,
+            4,
+        )
+        self.assertEqual(
+            list(trending.top()), [self.posts[1].pk, self.posts[0].pk]
+        )
+
+    def test_group_top_follows_post(self):
+        post = self.posts[0]
+        self.comment(post)
+        self.assertEqual(list(trending.top(self.groups[0].pk)), [post.pk])
+        cache.clear()
+        post.group = self.groups[1]
+        post.save()
+        self.assertEqual(list(trending.top(self.groups[0].pk)), [])
+        self.assertEqual(list(trending.top(self.groups[1].pk)), [post.pk])
+
+    def test_top_cached(self):
+        self.comment(self.posts[0])
+        trending.top()
+        with self.assertNumQueries(0):
+            self.assertEqual(list(trending.top()), [self.posts[0].pk])
+
+    def test_rollup(self):
+        """Rollup пересчитывает оценки и убирает посты вне окна."""
+        self.comment(self.posts[0], age=1)
+        self.comment(self.posts[1], age=30)
+        Trending.objects.filter(post=self.posts[0]).update(score=0)
+        self.assertEqual(trending.rollup(), (1, 2))
+        self.assertAlmostEqual(
+            trending.activity(self.score(self.posts[0])), 0.5, 2
+        )
+        self.assertFalse(Trending.objects.filter(post=self.posts[1]))
+        self.assertEqual(trending.rollup(), (1, 0))
+
+    def test_pages(self):
+        self.comment(self.posts[1])
+        self.comment(self.posts[2])
+        self.comment(self.posts[2])
+        response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(
+            response.context['posts'], [self.posts[2], self.posts[1]]
+        )
+        response = self.client.get(reverse(
+            'posts:group_trending', kwargs={'slug': self.groups[1].slug}
+        ))
+        self.assertEqual(response.context['posts'], [self.posts[1]])
+        self.assertEqual(self.client.get(reverse(
+            'posts:group_trending', kwargs={'slug': 'missing'}
+        )).status_code, 404)
+
+    def test_command(self):
+        self.comment(self.posts[0])
+        out = StringIO()
+        call_command('rollup_trending', stdout=out)
+        self.assertIn('Постов: 1, исправлено оценок: 0', out.getvalue())
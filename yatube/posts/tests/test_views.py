@@ -1,15 +1,29 @@
 import shutil
+import time
 import tempfile
+from unittest import mock
 
 from django.contrib.auth import get_user_model
 from django.conf import settings
-from django.test import Client, TestCase, override_settings
+from django.test import (
+    Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+)
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.core.cache import cache
+from django.core.cache import cache, caches
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.conf import settings
-from django import forms
-from ..models import Post, Group, Follow
+from django import forms, shortcuts
+from django.utils import timezone
+from ..caching import (
+    get_version, index_scope, listing_cache_context, modified, post_scope
+)
+from ..conditional import feed_modified
+from ..utils import encode_cursor
+from ..models import (
+    Comment, CommentSearch, FeedEntry, Follow, Group, Post, PulledAuthor
+)
 
 User = get_user_model()
 
@@ -53,6 +67,7 @@ class ViewsTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        caches['ratelimit'].clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(ViewsTests.user)
@@ -98,6 +113,22 @@ class ViewsTests(TestCase):
                 form_field = response.context.get('form').fields.get(value)
                 self.assertIsInstance(form_field, expected)
 
+    def test_form_pages_render_outside_transaction(self):
+        """Формы отрисовываются без открытой транзакции на запись."""
+        depth = len(connection.savepoint_ids)
+        depths = []
+
+        def render(*args, **kwargs):
+            depths.append(len(connection.savepoint_ids))
+            return shortcuts.render(*args, **kwargs)
+
+        with mock.patch('posts.views.render', render):
+            self.authorized_client.get(reverse('posts:post_create'))
+            self.authorized_client.get(
+                reverse('posts:post_edit', kwargs={'post_id': self.post.pk})
+            )
+        self.assertEqual(depths, [depth, depth])
+
     def test_post_edit_page_show_correct_context(self):
         """Шаблон view-функции post_edit
         сформирован с правильным контекстом."""
@@ -187,7 +218,7 @@ class ViewsTests(TestCase):
         for response in responses:
             with self.subTest(response=response):
                 gif = response.context['page_obj'][0].image
-                self.assertEqual(gif, 'posts/small.gif')
+                self.assertEqual(gif, ViewsTests.post.image.name)
 
     def test_post_detail_image_context(self):
         """Проверяет, что при выводе поста с картинкой на страницу post_detail
@@ -197,19 +228,82 @@ class ViewsTests(TestCase):
             kwargs={'post_id': ViewsTests.post.pk}
         ))
         gif = response.context['post'].image
-        self.assertEqual(gif, 'posts/small.gif')
+        self.assertEqual(gif, ViewsTests.post.image.name)
 
-    def test_cache_index(self):
-        """Тестирование кеширования главной страницы."""
+    def test_thumbnail_placeholder(self):
+        """Пока миниатюра в очереди, вместо картинки выводится заглушка."""
         post = Post.objects.create(
-            text='Тест кеша',
+            text='Пост с новой картинкой',
             author=ViewsTests.user,
+            # Другое содержимое: у той же картинки миниатюры уже общие.
+            image=SimpleUploadedFile(
+                'fresh.gif', ViewsTests.small_gif + b'\x00',
+                content_type='image/gif'
+            )
+        )
+        with mock.patch('posts.thumbnails.use_pool', return_value=True), \
+                mock.patch('posts.thumbnails.enqueue') as enqueue:
+            response = self.authorized_client.get(reverse(
+                'posts:post_detail', kwargs={'post_id': post.pk}
+            ))
+        self.assertContains(response, 'Изображение обрабатывается')
+        enqueue.assert_called_once()
+        self.assertEqual(enqueue.call_args[0][0], post.image.name)
+
+    def test_picture_sources(self):
+        """Готовые миниатюры в доп. форматах попадают в <source>."""
+        def thumbnail(image, geometry, format='JPEG', **options):
+            return mock.Mock(
+                url=f'/media/cache/{geometry}.{format.lower()}',
+                size=(960, 339),
+            )
+
+        with mock.patch(
+            'posts.templatetags.pictures.variant_formats',
+            return_value=['WEBP'],
+        ), mock.patch('posts.templatetags.pictures.thumbnail', thumbnail):
+            response = self.authorized_client.get(reverse(
+                'posts:post_detail', kwargs={'post_id': ViewsTests.post.pk}
+            ))
+        self.assertContains(
+            response,
+            '<source type="image/webp" srcset="/media/cache/960x339.webp">'
+        )
+        self.assertContains(
+            response,
+            '<img class="card-img my-2" src="/media/cache/960x339.jpeg" '
+            'width="960" height="339">',
+            html=True,
         )
+
+    def test_cache_index(self):
+        """Тестирование кеширования главной страницы."""
+        self.authorized_client.get(reverse('posts:index'))
+        Post.objects.filter(pk=ViewsTests.post.pk).update(text='Мимо кеша')
         response = self.authorized_client.get(reverse('posts:index'))
-        self.assertNotContains(response, post)
+        self.assertNotContains(response, 'Мимо кеша')
         cache.clear()
         response = self.authorized_client.get(reverse('posts:index'))
-        self.assertContains(response, post)
+        self.assertContains(response, 'Мимо кеша')
+
+    def test_new_post_resets_listing_cache(self):
+        """Новый пост сразу появляется в закешированных списках."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'test-user'}),
+        )
+        for url in urls:
+            self.authorized_client.get(url)
+        Post.objects.create(
+            text='Свежий пост',
+            author=ViewsTests.user,
+            group=ViewsTests.group
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, 'Свежий пост')
 
     def test_authorized_client_create_comment(self):
         """После успешной отправки комментарий появляется на странице поста,
@@ -253,6 +347,7 @@ class TestSubscriptions(TestCase):
         )
 
     def setUp(self):
+        caches['ratelimit'].clear()
         self.follower = User.objects.create_user(username='follower')
         self.follower_client = Client()
         self.follower_client.force_login(self.follower)
@@ -319,6 +414,38 @@ class TestSubscriptions(TestCase):
         count_2 = len(Follow.objects.all())
         self.assertEqual(count_1, count_2)
 
+    def test_feed_is_materialized(self):
+        """Посты раскладываются по лентам при подписке и публикации
+        и убираются из ленты при отписке."""
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.follower).count(), 1
+        )
+        Post.objects.create(text='Новый пост', author=TestSubscriptions.author)
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.follower).count(), 2
+        )
+        self.follower_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': TestSubscriptions.author}
+        ))
+        self.assertFalse(FeedEntry.objects.filter(user=self.follower).exists())
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_popular_author_posts_are_read_on_demand(self):
+        """Посты автора с множеством подписчиков не раскладываются
+        по лентам, но видны в ленте подписки."""
+        post = Post.objects.create(
+            text='Пост популярного автора',
+            author=TestSubscriptions.author
+        )
+        self.assertTrue(PulledAuthor.objects.filter(
+            author=TestSubscriptions.author
+        ).exists())
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+        self.assertEqual(len(response.context['page_obj']), 2)
+
 
 class PaginatorViewsTests(TestCase):
     @classmethod
@@ -382,3 +509,577 @@ class PaginatorViewsTests(TestCase):
                     len(response.context['page_obj']),
                     PaginatorViewsTests.PAGE_TEST_OFFSET
                 )
+
+    def test_cursor_links_lead_to_next_page(self):
+        """Ссылка «Следующая» ведёт на вторую страницу по курсору."""
+        response = self.authorized_client.get(reverse('posts:index'))
+        next_query = response.context['page_obj'].paginator.next_query
+        self.assertIn('after=', next_query)
+        response = self.authorized_client.get(
+            reverse('posts:index') + '?' + next_query
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.number, 2)
+        self.assertEqual(len(page_obj), PaginatorViewsTests.PAGE_TEST_OFFSET)
+        self.assertEqual(page_obj[-1].text, 'Тестовый пост номер 0')
+
+    def test_paginator_does_not_count_posts(self):
+        """Постраничный вывод обходится без COUNT(*) и OFFSET."""
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(reverse(
+                'posts:group_list',
+                kwargs={'slug': 'test-slug'}
+            ))
+        for query in queries.captured_queries:
+            with self.subTest(sql=query['sql']):
+                self.assertNotIn('COUNT(', query['sql'])
+                self.assertNotIn('OFFSET', query['sql'])
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Битый курсор открывает первую страницу."""
+        response = self.authorized_client.get(
+            reverse('posts:index') + '?after=broken'
+        )
+        self.assertEqual(response.context['page_obj'].number, 1)
+
+    def test_cursor_of_other_type_falls_back(self):
+        """Курсор с ключом не того типа открывает первую страницу."""
+        number_token = encode_cursor(1.5, 1, 2)
+        date_token = encode_cursor(timezone.now(), 1, 2)
+        post = Post.objects.first()
+        for url, token in (
+            (reverse('posts:index'), number_token),
+            (reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+             number_token),
+            (reverse('posts:search') + '?q=Тестовый&', date_token),
+        ):
+            for param in ('after', 'before'):
+                with self.subTest(url=url, param=param):
+                    separator = '' if url.endswith('&') else '?'
+                    response = self.authorized_client.get(
+                        f'{url}{separator}{param}={token}'
+                    )
+                    self.assertEqual(response.status_code, 200)
+
+    def test_pages_are_cached_separately(self):
+        """Вторая страница не берётся из кеша первой."""
+        url = reverse('posts:index')
+        self.authorized_client.get(url)
+        response = self.authorized_client.get(url + '?page=2')
+        self.assertNotContains(response, 'Тестовый пост номер 12')
+        self.assertContains(response, 'Тестовый пост номер 0')
+
+    def test_warm_listing_reads_no_posts(self):
+        """С тёплым кешем страницы списков не читают посты из базы."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=2',
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'test-user'}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                cold = self.client.get(url)
+                with CaptureQueriesContext(connection) as queries:
+                    warm = self.client.get(url)
+                self.assertEqual(warm.content, cold.content)
+                self.assertEqual([
+                    query['sql'] for query in queries.captured_queries
+                    if 'FROM "posts_post"' in query['sql']
+                ], [])
+
+    def test_page_links_drop_unknown_params(self):
+        """Посторонние параметры не попадают в ссылки закешированной
+        страницы."""
+        url = reverse('posts:index')
+        self.client.get(url, {'page': 2, 'utm': 'x'})
+        response = self.client.get(url, {'page': 2})
+        self.assertNotContains(response, 'utm')
+        self.assertEqual(
+            len(response.context['page_obj']), self.PAGE_TEST_OFFSET
+        )
+
+    def test_page_key_ignores_unknown_params(self):
+        """Лишние параметры адреса не заводят новых фрагментов в кеше."""
+        factory = RequestFactory()
+        keys = {
+            listing_cache_context(
+                factory.get('/', params), 'index'
+            )['listing_page']
+            for params in ({'page': 2}, {'page': 2, 'utm': 'x'},
+                           {'utm': 'y', 'page': 2})
+        }
+        self.assertEqual(keys, {'page=2'})
+
+
+class SearchViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        cls.best = Post.objects.create(
+            text='Котики, котики и ещё раз котики', author=cls.user
+        )
+        cls.other = Post.objects.create(
+            text='Один котик среди собак', author=cls.user
+        )
+        cls.commented = Post.objects.create(
+            text='Без ключевого слова', author=cls.user
+        )
+        Comment.objects.create(
+            post=cls.commented, author=cls.user, text='А где котэ?'
+        )
+        for i in range(settings.NUMBER_OF_POSTS + 3):
+            Post.objects.create(text=f'Черепаха номер {i}', author=cls.user)
+
+    def setUp(self):
+        self.client = Client()
+
+    def search(self, query, **params):
+        return self.client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+
+    def test_search_ranks_results(self):
+        """Поиск по префиксу слова, лучшие совпадения первыми."""
+        posts = list(self.search('КОТ').context['page_obj'])
+        self.assertEqual(
+            posts,
+            [SearchViewsTests.best, SearchViewsTests.other,
+             SearchViewsTests.commented]
+        )
+
+    def test_search_finds_comments(self):
+        """Пост находится по тексту комментария."""
+        response = self.search('котэ')
+        self.assertEqual(
+            list(response.context['page_obj']), [SearchViewsTests.commented]
+        )
+
+    def test_search_index_follows_changes(self):
+        """Триггеры обновляют индекс при update() и удалении."""
+        Post.objects.filter(pk=SearchViewsTests.other.pk).update(
+            text='Теперь про жирафа'
+        )
+        self.assertEqual(
+            list(self.search('жираф').context['page_obj']),
+            [SearchViewsTests.other]
+        )
+        Comment.objects.filter(post=SearchViewsTests.commented).delete()
+        Post.objects.filter(pk=SearchViewsTests.best.pk).delete()
+        self.assertEqual(list(self.search('кот').context['page_obj']), [])
+
+    def test_comment_index_rows(self):
+        """Каждый комментарий — своя строка индекса, поиск видит правки."""
+        comment = Comment.objects.create(
+            post=SearchViewsTests.other, author=SearchViewsTests.user,
+            text='Про енота'
+        )
+        self.assertEqual(
+            CommentSearch.objects.filter(document__match='енот*').get(),
+            CommentSearch.objects.get(comment=comment),
+        )
+        Comment.objects.filter(pk=comment.pk).update(text='Про барсука')
+        self.assertEqual(list(self.search('енот').context['page_obj']), [])
+        self.assertEqual(
+            list(self.search('барсук').context['page_obj']),
+            [SearchViewsTests.other]
+        )
+
+    def test_search_triggers_exist(self):
+        """Триггеры индексов на месте: пересборка таблицы в миграции
+        на SQLite удаляет их молча."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+                "AND name LIKE 'posts_%search%'"
+            )
+            names = {name for name, in cursor.fetchall()}
+        self.assertEqual(names, {
+            'posts_search_post_insert', 'posts_search_post_update',
+            'posts_search_post_delete', 'posts_comment_search_insert',
+            'posts_comment_search_update', 'posts_comment_search_delete',
+        })
+
+    def test_search_cursor_pages(self):
+        """Страницы результатов идут по курсору без повторов и пропусков."""
+        response = self.search('черепаха')
+        seen = [post.pk for post in response.context['page_obj']]
+        next_query = response.context['page_obj'].paginator.next_query
+        self.assertIn('q=', next_query)
+        response = self.client.get(reverse('posts:search') + '?' + next_query)
+        seen += [post.pk for post in response.context['page_obj']]
+        self.assertEqual(len(seen), settings.NUMBER_OF_POSTS + 3)
+        self.assertEqual(len(set(seen)), len(seen))
+
+    def test_search_ignores_query_syntax(self):
+        """Служебные символы FTS5 в запросе не приводят к ошибке."""
+        for query in ('', '"', 'AND (', '*', 'кот OR NOT'):
+            with self.subTest(query=query):
+                response = self.search(query)
+                self.assertEqual(response.status_code, 200)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит посты через индекс по их тексту."""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'password')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'котик'}
+        )
+        self.assertEqual(
+            set(response.context['cl'].result_list),
+            {SearchViewsTests.best, SearchViewsTests.other}
+        )
+
+
+@override_settings(COMMENTS_PER_PAGE=5)
+class CommentsPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Комментарий {i}'
+            )
+            for i in range(12)
+        ]
+
+    def setUp(self):
+        self.client = Client()
+        self.url = reverse(
+            'posts:comments',
+            kwargs={'post_id': CommentsPaginationTests.post.pk}
+        )
+
+    def test_post_detail_shows_first_page(self):
+        """На странице поста только первые комментарии по порядку."""
+        response = self.client.get(reverse(
+            'posts:post_detail',
+            kwargs={'post_id': CommentsPaginationTests.post.pk}
+        ))
+        self.assertEqual(
+            list(response.context['comments']),
+            CommentsPaginationTests.comments[:5]
+        )
+        self.assertContains(response, 'Следующие комментарии')
+
+    def test_json_pages(self):
+        """Комментарии подгружаются страницами вперёд и назад."""
+        pages = [self.client.get(self.url).json()]
+        while pages[-1]['next']:
+            pages.append(
+                self.client.get(f'{self.url}?{pages[-1]["next"]}').json()
+            )
+        ids = [comment['id'] for page in pages for comment in page['comments']]
+        self.assertEqual(
+            ids, [comment.pk for comment in CommentsPaginationTests.comments]
+        )
+        self.assertIsNone(pages[0]['previous'])
+        previous = self.client.get(f'{self.url}?{pages[1]["previous"]}')
+        self.assertEqual(previous.json()['comments'], pages[0]['comments'])
+
+    def test_html_fragment(self):
+        """Фрагмент HTML содержит комментарии и ссылку на следующие."""
+        response = self.client.get(self.url, {'format': 'html'})
+        self.assertContains(response, 'Комментарий 4')
+        self.assertNotContains(response, 'Комментарий 5')
+        self.assertNotContains(response, '<html')
+        self.assertNotContains(response, 'format=html')
+        self.assertContains(response, 'data-direction="next"')
+
+    def test_missing_post(self):
+        response = self.client.get(
+            reverse('posts:comments', kwargs={'post_id': 10_000})
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.author, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        caches['ratelimit'].clear()
+        self.client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(ConditionalGetTests.reader)
+        self.urls = {
+            'index': reverse('posts:index'),
+            'group_list': reverse(
+                'posts:group_list', kwargs={'slug': 'test-slug'}
+            ),
+            'profile': reverse(
+                'posts:profile', kwargs={'username': 'author'}
+            ),
+            'post_detail': reverse(
+                'posts:post_detail',
+                kwargs={'post_id': ConditionalGetTests.post.pk}
+            ),
+        }
+
+    def revalidate(self, client, url):
+        """Повторный запрос с валидаторами из первого ответа."""
+        response = client.get(url)
+        return client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_not_modified(self):
+        """Неизменённая страница отдаётся как 304 без тела."""
+        for name, url in self.urls.items():
+            with self.subTest(name=name):
+                response = self.revalidate(self.client, url)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+    def test_not_modified_without_rendering(self):
+        """304 на главной не выбирает посты и не рендерит шаблон."""
+        url = self.urls['index']
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0), mock.patch(
+            'posts.views.render'
+        ) as render:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        render.assert_not_called()
+
+    def test_if_modified_since(self):
+        response = self.client.get(self.urls['index'])
+        response = self.client.get(
+            self.urls['index'],
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_post_changes_listings(self):
+        """Новый пост меняет ETag главной, группы, профиля и поста."""
+        etags = {
+            name: self.client.get(url)['ETag']
+            for name, url in self.urls.items()
+        }
+        Post.objects.create(
+            text='Новый пост',
+            author=ConditionalGetTests.author,
+            group=ConditionalGetTests.group
+        )
+        for name, url in self.urls.items():
+            with self.subTest(name=name):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[name])
+                self.assertEqual(response.status_code, 200)
+
+    def test_edit_changes_post_detail(self):
+        url = self.urls['post_detail']
+        etag = self.client.get(url)['ETag']
+        post = Post.objects.get(pk=ConditionalGetTests.post.pk)
+        post.text = 'Изменённый текст'
+        post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Изменённый текст')
+
+    def test_comment_changes_post_detail(self):
+        url = self.urls['post_detail']
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(
+            post=ConditionalGetTests.post,
+            author=ConditionalGetTests.reader,
+            text='Новый комментарий'
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Новый комментарий')
+
+    def test_follow_changes_profile_and_feed(self):
+        urls = (self.urls['profile'], reverse('posts:follow_index'))
+        etags = [self.reader_client.get(url)['ETag'] for url in urls]
+        self.reader_client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'author'})
+        )
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Тестовый пост')
+
+    def test_etag_depends_on_user(self):
+        """Страница другого пользователя не считается закешированной."""
+        url = self.urls['index']
+        etag = self.client.get(url)['ETag']
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_feed_changes_with_followed_posts(self):
+        """Новый и отредактированный пост автора меняют ETag ленты."""
+        Follow.objects.create(
+            user=ConditionalGetTests.reader, author=ConditionalGetTests.author
+        )
+        url = reverse('posts:follow_index')
+        etag = self.reader_client.get(url)['ETag']
+        post = Post.objects.create(
+            text='Пост в ленту', author=ConditionalGetTests.author
+        )
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Пост в ленту')
+        post.text = 'Исправленный пост'
+        post.save()
+        response = self.reader_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertContains(response, 'Исправленный пост')
+
+    def test_feed_modified_skips_fanned_out_authors(self):
+        """Время ленты не читается по области на каждую подписку."""
+        pulled = User.objects.create_user(username='pulled')
+        PulledAuthor.objects.create(author=pulled)
+        for author in (ConditionalGetTests.author, pulled):
+            Follow.objects.create(
+                user=ConditionalGetTests.reader, author=author
+            )
+        reader_id = ConditionalGetTests.reader.pk
+        with mock.patch.object(
+            cache, 'get_many', wraps=cache.get_many
+        ) as get_many:
+            feed_modified(mock.Mock(user=ConditionalGetTests.reader))
+        self.assertCountEqual(get_many.call_args[0][0], [
+            f'posts:modified:{scope}' for scope in (
+                f'follows:{reader_id}', 'suggestions',
+                f'feed:{reader_id}', 'feeds', f'profile:{pulled.pk}',
+            )
+        ])
+
+    def test_missing_objects(self):
+        for url in (
+            reverse('posts:group_list', kwargs={'slug': 'missing'}),
+            reverse('posts:profile', kwargs={'username': 'missing'}),
+            reverse('posts:post_detail', kwargs={'post_id': 10_000}),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH='*')
+                self.assertEqual(response.status_code, 404)
+
+
+class SyndicationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        for i in range(3):
+            Post.objects.create(
+                text=f'Тестовый пост {i}',
+                author=cls.author,
+                group=cls.group if i else None
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def feed_urls(self):
+        for format in ('rss', 'atom'):
+            yield reverse('posts:site_feed', kwargs={'format': format})
+            yield reverse('posts:group_feed', kwargs={
+                'slug': 'test-slug', 'format': format
+            })
+            yield reverse('posts:profile_feed', kwargs={
+                'username': 'author', 'format': format
+            })
+
+    def test_feeds(self):
+        for url in self.feed_urls():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('xml', response['Content-Type'])
+                self.assertContains(response, 'Тестовый пост 2')
+                self.assertIn('ETag', response)
+
+    def test_group_feed_has_only_group_posts(self):
+        response = self.client.get(reverse(
+            'posts:group_feed', kwargs={'slug': 'test-slug', 'format': 'rss'}
+        ))
+        self.assertNotContains(response, 'Тестовый пост 0')
+        self.assertContains(response, 'Тестовая группа')
+
+    @override_settings(SYNDICATION_ITEMS=2)
+    def test_items_bounded(self):
+        response = self.client.get(
+            reverse('posts:site_feed', kwargs={'format': 'rss'})
+        )
+        self.assertEqual(response.content.count(b'<item>'), 2)
+
+    def test_cached_until_post_saved(self):
+        """Лента берётся из кеша, пока не сохранён новый пост."""
+        url = reverse('posts:site_feed', kwargs={'format': 'atom'})
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, 'Тестовый пост 2')
+        Post.objects.create(text='Свежий пост', author=self.author)
+        self.assertContains(self.client.get(url), 'Свежий пост')
+
+    def test_not_modified(self):
+        for url in self.feed_urls():
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_missing_objects(self):
+        for url in (
+            reverse('posts:group_feed', kwargs={
+                'slug': 'missing', 'format': 'rss'
+            }),
+            reverse('posts:profile_feed', kwargs={
+                'username': 'missing', 'format': 'atom'
+            }),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_pages_link_feeds(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(
+            response, reverse('posts:site_feed', kwargs={'format': 'rss'})
+        )
+
+
+class ListingVersionCommitTests(TransactionTestCase):
+    def test_version_bumped_after_commit(self):
+        """Версия списка меняется и после коммита: список, собранный по
+        старым данным во время транзакции, под ней не останется."""
+        author = User.objects.create_user(username='author')
+        with transaction.atomic():
+            Post.objects.create(text='Новый пост', author=author)
+            inside = get_version(index_scope())
+        self.assertNotEqual(get_version(index_scope()), inside)
+
+    def test_modified_touched_after_commit(self):
+        """Время изменения поста обновляется и после коммита
+        комментария."""
+        author = User.objects.create_user(username='author')
+        post = Post.objects.create(text='Пост', author=author)
+        with transaction.atomic():
+            Comment.objects.create(post=post, author=author, text='Ответ')
+            inside = modified(post_scope(post.pk))
+            time.sleep(0.01)
+        self.assertGreater(modified(post_scope(post.pk)), inside)
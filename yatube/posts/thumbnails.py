@@ -0,0 +1,178 @@
+"""Фоновая подготовка миниатюр sorl-thumbnail.
+
+Шаблоны не генерируют миниатюры сами: если миниатюры ещё нет в хранилище
+ключей sorl, бэкенд ставит её в очередь пула процессов и возвращает None,
+а тег {% picture %} выводит вместо неё заглушку.
+
+Модуль импортируется процессами пула до django.setup(), поэтому модели
+загружаются только внутри функций.
+"""
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.db import connection
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from core import timing
+
+from . import caching
+from .images import variant_formats
+from .storage import media_storage
+
+logger = logging.getLogger(__name__)
+
+# Все размеры, которые используют шаблоны posts/.
+GEOMETRIES = (
+    ('960x480', {'crop': 'center', 'upscale': True}),
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+
+
+def variants():
+    """Все миниатюры картинки: размеры шаблонов в JPEG и доп. форматах."""
+    formats = variant_formats()
+    for geometry, options in GEOMETRIES:
+        yield geometry, dict(options)
+        for image_format in formats:
+            yield geometry, dict(options, format=image_format)
+
+
+_pool = None
+_queued = set()
+
+
+def _init_worker():
+    import django
+
+    django.setup()
+
+
+def generate(name, geometry, options):
+    """Создаёт миниатюру в процессе пула."""
+    try:
+        ThumbnailBackend().get_thumbnail(
+            ImageFile(name, media_storage), geometry, **options
+        )
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s %s', name, geometry)
+        return False
+    return True
+
+
+def generate_task(task):
+    """generate() для pool.map: принимает (name, geometry, options)."""
+    return task[0], generate(*task)
+
+
+def use_pool():
+    """Пул работает только с базой, которую видят другие процессы."""
+    if not settings.THUMBNAIL_WORKERS:
+        return False
+    return not (
+        connection.vendor == 'sqlite' and connection.is_in_memory_db()
+    )
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+        )
+    return _pool
+
+
+def refresh_listings(name):
+    """Сбрасывает кеш списков, где вместо картинки стояла заглушка."""
+    from .models import Post
+
+    for post in Post.objects.filter(image=name).only('author', 'group'):
+        caching.bump(*caching.post_scopes(post))
+
+
+def _done(key):
+    def callback(future):
+        _queued.discard(key)
+        if not future.cancelled() and future.exception() is None and (
+            future.result()
+        ):
+            refresh_listings(key[0])
+    return callback
+
+
+def enqueue(name, geometry, options):
+    """Ставит миниатюру в очередь, если она ещё не ждёт там.
+
+    Без пула миниатюра создаётся сразу.
+    """
+    global _pool
+    if not use_pool():
+        generate(name, geometry, options)
+        return
+    key = (name, geometry, tuple(sorted(options.items())))
+    if key in _queued:
+        return
+    _queued.add(key)
+    try:
+        future = get_pool().submit(generate, name, geometry, options)
+    except BrokenProcessPool:
+        logger.exception('Пул миниатюр упал, создаём новый')
+        _queued.discard(key)
+        _pool = None
+        return
+    future.add_done_callback(_done(key))
+
+
+def pregenerate(name):
+    """Ставит в очередь все миниатюры для картинки поста."""
+    backend = PregeneratedThumbnailBackend()
+    for geometry, options in variants():
+        if backend.cached(name, geometry, **options) is None:
+            enqueue(name, geometry, options)
+
+
+class PregeneratedThumbnailBackend(ThumbnailBackend):
+    """Отдаёт только готовые миниатюры, остальные отправляет в очередь."""
+
+    def _full_options(self, source, options):
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def cached(self, file_, geometry_string, **options):
+        """Готовая миниатюра из хранилища ключей или None."""
+        # Ключ исходника в sorl зависит от хранилища: по одному имени
+        # шаблоны и очередь должны находить одну и ту же миниатюру.
+        source = ImageFile(file_, media_storage)
+        name = self._get_thumbnail_filename(
+            source, geometry_string, self._full_options(source, dict(options))
+        )
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        with timing.measure('thumbnail'):
+            if not use_pool():
+                return super().get_thumbnail(
+                    file_, geometry_string, **options
+                )
+            if not file_:
+                raise ValueError('falsey file_ argument in get_thumbnail()')
+            thumbnail = self.cached(file_, geometry_string, **options)
+            if thumbnail is None:
+                enqueue(ImageFile(file_).name, geometry_string, options)
+            return thumbnail
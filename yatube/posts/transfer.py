@@ -0,0 +1,127 @@
+"""Формат NDJSON для команд export_data и import_data.
+
+Каждая строка — одна запись {"type": ..., поля}. Записи идут в порядке
+TYPES, чтобы при импорте авторы и группы появлялись раньше постов, а
+посты — раньше комментариев. Авторы и группы указываются username и
+slug, посты и комментарии сохраняют свои id.
+"""
+import gzip
+import sys
+from contextlib import contextmanager, nullcontext
+
+from django.contrib.auth import get_user_model
+
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Тип записи → (модель, поле записи → путь для values()).
+TYPES = {
+    'group': (Group, {
+        'slug': 'slug',
+        'title': 'title',
+        'description': 'description',
+    }),
+    'user': (User, {
+        'username': 'username',
+        'first_name': 'first_name',
+        'last_name': 'last_name',
+        'email': 'email',
+        'date_joined': 'date_joined',
+    }),
+    'post': (Post, {
+        'id': 'pk',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'updated': 'updated',
+        'image': 'image',
+    }),
+    'comment': (Comment, {
+        'id': 'pk',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    }),
+    'follow': (Follow, {
+        'user': 'user__username',
+        'author': 'author__username',
+    }),
+}
+
+# Поля, которые Django заполняет сам и перетёр бы при bulk_create.
+DATE_FIELDS = (
+    (Post, 'pub_date'),
+    (Post, 'updated'),
+    (Comment, 'created'),
+)
+
+
+def open_stream(path, mode):
+    """Файл, .gz со сжатием или '-' для stdin/stdout, в байтах.
+
+    stdin и stdout отдаются обёрнутыми: with их не закрывает.
+    """
+    if path == '-':
+        return nullcontext((sys.stdin if mode == 'rb' else sys.stdout).buffer)
+    if path.endswith('.gz'):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def records(type_name, chunk_size):
+    """Записи одного типа по порядку id, не больше chunk_size в памяти."""
+    model, fields = TYPES[type_name]
+    queryset = model.objects.order_by('pk').values(*fields.values())
+    for row in queryset.iterator(chunk_size=chunk_size):
+        record = {'type': type_name}
+        for name, path in fields.items():
+            record[name] = row[path]
+        yield record
+
+
+@contextmanager
+def keep_dates():
+    """Отключает auto_now и auto_now_add, чтобы сохранить даты из файла."""
+    saved = []
+    for model, name in DATE_FIELDS:
+        field = model._meta.get_field(name)
+        saved.append((field, field.auto_now, field.auto_now_add))
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Resolver:
+    """Переводит username или slug в id пачками запросов.
+
+    Найденные id держит в словаре не больше size штук, чтобы память не
+    росла с размером импорта.
+    """
+    # Запас до лимита переменных SQLite в одном запросе.
+    chunk = 500
+
+    def __init__(self, model, field, size=100_000):
+        self.model = model
+        self.field = field
+        self.size = size
+        self.ids = {}
+
+    def resolve(self, keys):
+        """Возвращает {ключ: id} для найденных ключей."""
+        keys = set(keys) - {None}
+        missing = list(keys - self.ids.keys())
+        if len(self.ids) + len(missing) > self.size:
+            self.ids = {key: self.ids[key] for key in keys & self.ids.keys()}
+        for start in range(0, len(missing), self.chunk):
+            self.ids.update(
+                self.model.objects.filter(**{
+                    f'{self.field}__in': missing[start:start + self.chunk]
+                }).values_list(self.field, 'pk')
+            )
+        return {key: self.ids[key] for key in keys if key in self.ids}
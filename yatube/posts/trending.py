@@ -0,0 +1,138 @@
+"""«Популярное»: посты по затухающей активности комментариев.
+
+Вклад комментария убывает вдвое каждые TRENDING_HALF_LIFE секунд. Чтобы
+оценки не приходилось пересчитывать с ходом времени, Trending.score
+хранит логарифм суммы exp(λ·(t − EPOCH)) по комментариям поста, где
+λ = ln 2 / TRENDING_HALF_LIFE. Текущая активность — exp(score − λ·(now −
+EPOCH)), поэтому порядок по score совпадает с порядком по ней в любой
+момент, а новый комментарий прибавляется одним UPDATE: score =
+logaddexp(score, λ·(t − EPOCH)).
+
+Удалённые комментарии и записи в обход сигналов исправляет команда
+rollup_trending: она пересчитывает оценки по комментариям за
+TRENDING_WINDOW и убирает посты без свежих комментариев. Страницы читают
+из кеша готовый топ — id постов в array('I') — и сами посты одним
+запросом.
+"""
+import math
+from array import array
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+from django.utils import timezone
+
+from .models import Comment, Post, Trending
+
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+KEY = 'posts:trending:{}'
+
+
+def weight(moment):
+    """Логарифм вклада комментария, оставленного в момент moment."""
+    rate = math.log(2) / settings.TRENDING_HALF_LIFE
+    return (moment - EPOCH).total_seconds() * rate
+
+
+def activity(score, now=None):
+    """Затухающее число комментариев поста на момент now."""
+    return math.exp(score - weight(now or timezone.now()))
+
+
+def logaddexp(a, b):
+    """log(exp(a) + exp(b)) без переполнения."""
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def record(comment):
+    """Прибавляет к оценке поста вклад нового комментария."""
+    value = weight(comment.created)
+    rows = Trending.objects.filter(post_id=comment.post_id)
+    score = Greatest(F('score'), Value(value)) + Ln(
+        1 + Exp(-Abs(F('score') - Value(value)))
+    )
+    if rows.update(score=score):
+        return
+    try:
+        with transaction.atomic():
+            Trending.objects.create(
+                post_id=comment.post_id,
+                group_id=comment.post.group_id,
+                score=value,
+            )
+    except IntegrityError:
+        rows.update(score=score)
+
+
+def move(post):
+    """Переносит пост в топ его новой группы."""
+    Trending.objects.filter(post_id=post.pk).update(group_id=post.group_id)
+
+
+def rollup(now=None):
+    """Пересчитывает Trending по комментариям за TRENDING_WINDOW.
+
+    Возвращает (постов в Trending, исправленных оценок). Оценка
+    считается исправленной, если активность поменялась больше чем на
+    процент, — вклад комментариев старше окна сюда не попадает.
+    """
+    now = now or timezone.now()
+    since = now - timedelta(seconds=settings.TRENDING_WINDOW)
+    groups = {}
+    actual = {}
+    with transaction.atomic():
+        rows = Comment.objects.filter(created__gte=since).order_by(
+        ).values_list('post_id', 'post__group_id', 'created')
+        for post_id, group_id, created in rows.iterator():
+            value = weight(created)
+            groups[post_id] = group_id
+            actual[post_id] = (
+                logaddexp(actual[post_id], value) if post_id in actual
+                else value
+            )
+        stored = dict(Trending.objects.values_list('post_id', 'score'))
+        fixed = sum(
+            post_id not in stored or post_id not in actual
+            or abs(stored[post_id] - actual[post_id]) > math.log(1.01)
+            for post_id in stored.keys() | actual.keys()
+        )
+        Trending.objects.all().delete()
+        Trending.objects.bulk_create(
+            Trending(post_id=post_id, group_id=groups[post_id], score=score)
+            for post_id, score in actual.items()
+        )
+    return len(actual), fixed
+
+
+def top(group_id=None):
+    """id популярных постов по убыванию оценки, до TRENDING_SIZE.
+
+    Топ хранится в кеше TRENDING_CACHE_TIMEOUT секунд: новые комментарии
+    его не сбрасывают, иначе на активном сайте он бы не доживал до
+    следующего запроса.
+    """
+    key = KEY.format('all' if group_id is None else group_id)
+    blob = cache.get(key)
+    if blob is not None:
+        ids = array('I')
+        ids.frombytes(blob)
+        return ids
+    rows = Trending.objects.order_by('-score')
+    if group_id is not None:
+        rows = rows.filter(group_id=group_id)
+    ids = array('I', rows.values_list(
+        'post_id', flat=True
+    )[:settings.TRENDING_SIZE])
+    cache.set(key, ids.tobytes(), settings.TRENDING_CACHE_TIMEOUT)
+    return ids
+
+
+def posts(group_id=None):
+    """Популярные посты для страницы: топ из кеша и один запрос постов."""
+    ids = top(group_id)
+    found = Post.objects.for_listing().in_bulk(list(ids))
+    return [found[pk] for pk in ids if pk in found]
@@ -1,22 +1,48 @@
-from django.urls import path
+from django.urls import path, register_converter
 
 from . import views
+from .syndication import FormatConverter
+
+register_converter(FormatConverter, 'feed_format')
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('<feed_format:format>/', views.site_feed, name='site_feed'),
+    path('trending/', views.trending_posts, name='trending'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    path(
+        'group/<slug:slug>/trending/',
+        views.group_trending,
+        name='group_trending'
+    ),
+    path(
+        'group/<slug:slug>/<feed_format:format>/',
+        views.group_feed,
+        name='group_feed'
+    ),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path(
+        'profile/<str:username>/<feed_format:format>/',
+        views.profile_feed,
+        name='profile_feed'
+    ),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='comments'
+    ),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment,
         name='add_comment'
     ),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
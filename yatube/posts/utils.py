@@ -1,9 +1,294 @@
-from django.core.paginator import Paginator
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import namedtuple
+from datetime import datetime
+from math import ceil, isfinite
+
 from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db.models import DateField, Q
+from django.http import QueryDict
+from django.utils.dateparse import parse_datetime
+
+PageLink = namedtuple('PageLink', ('number', 'query'))
+
+CURSOR_PARAMS = ('page', 'after', 'before')
+
+
+def encode_cursor(key, pk, number):
+    """Упаковывает позицию в ленте и номер страницы в непрозрачный токен.
+
+    Ключ — дата публикации или число, например оценка в поиске.
+    """
+    key = key.isoformat() if hasattr(key, 'isoformat') else repr(key)
+    raw = f'{key}|{pk}|{number}'.encode()
+    return urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (key, pk, number) или None для битого токена."""
+    if not token:
+        return None
+    try:
+        raw = urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        key, pk, number = raw.split('|')
+        key = parse_datetime(key) or float(key)
+        pk, number = int(pk), int(number)
+    except ValueError:
+        return None
+    if number < 1 or isinstance(key, float) and not isfinite(key):
+        return None
+    return key, pk, number
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (pub_date, id) без COUNT(*) и OFFSET.
+
+    Вместо pub_date можно передать другой ключ в keys, например оценку
+    совпадения в поиске. По умолчанию записи идут от больших ключей к
+    меньшим, с ascending=True — наоборот.
+
+    Страницы переключаются токенами ?after=/?before=, в которых зашиты
+    позиция и номер страницы. Общее число записей неизвестно: num_pages
+    и page_range описывают только скользящее окно вокруг текущей
+    страницы. Старые ссылки ?page=N обслуживаются через OFFSET, но не
+    дальше max_offset_page.
+    """
+    keys = ('pub_date', 'pk')
+
+    def __init__(self, object_list, per_page, window=None,
+                 max_offset_page=None, keys=None, ascending=False):
+        self.keys = keys or self.keys
+        self.ascending = ascending
+        self.order = tuple(
+            key if ascending else f'-{key}' for key in self.keys
+        )
+        self.reverse_order = tuple(
+            f'-{key}' if ascending else key for key in self.keys
+        )
+        super().__init__(object_list.order_by(*self.order), per_page)
+        self.window = window or settings.PAGINATOR_WINDOW
+        self.max_offset_page = (
+            max_offset_page or settings.PAGINATOR_MAX_OFFSET_PAGE
+        )
+        self.params = QueryDict(mutable=True)
+        self.number = 1
+        self.links = []
+        self.known = 0
+
+    @property
+    def count(self):
+        """Число записей, известных по текущему окну, а не по всей ленте."""
+        return self.known
+
+    @property
+    def num_pages(self):
+        return self.links[-1].number if self.links else 1
+
+    @property
+    def page_range(self):
+        return [link.number for link in self.links]
+
+    def _query(self, **cursor):
+        params = self.params.copy()
+        for name, value in cursor.items():
+            params[name] = value
+        return params.urlencode()
+
+    def _link(self, number, **cursor):
+        return PageLink(number, self._query(**cursor))
+
+    def _key(self, item):
+        """Ключ записи: модели или словаря из values()."""
+        if isinstance(item, dict):
+            return tuple(item[key] for key in self.keys)
+        return tuple(getattr(item, key) for key in self.keys)
+
+    def _key_is_date(self):
+        """Дата ли первый ключ: поле модели или аннотация, как в поиске."""
+        name = self.keys[0]
+        annotation = self.object_list.query.annotations.get(name)
+        if annotation is not None:
+            field = annotation.output_field
+        else:
+            field = self.object_list.model._meta.get_field(name)
+        return isinstance(field, DateField)
 
+    def _cursor(self, token):
+        """Позиция из токена или None, если токен битый или ключ в нём
+        другого типа, чем в списке: дата вместо оценки и наоборот."""
+        cursor = decode_cursor(token)
+        if cursor is None:
+            return None
+        if isinstance(cursor[0], datetime) != self._key_is_date():
+            return None
+        return cursor
 
-def paginator_context(post_list, request):
-    paginator = Paginator(post_list, settings.NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    def _beyond(self, key, pk, lookup):
+        sort_key, pk_key = self.keys
+        return self.object_list.filter(
+            Q(**{f'{sort_key}__{lookup}': key})
+            | Q(**{sort_key: key, f'{pk_key}__{lookup}': pk})
+        )
+
+    def _after(self, key, pk):
+        """Записи после позиции в порядке списка."""
+        return self._beyond(key, pk, 'gt' if self.ascending else 'lt')
+
+    def _before(self, key, pk):
+        """Записи перед позицией, ближайшие первыми."""
+        return self._beyond(
+            key, pk, 'lt' if self.ascending else 'gt'
+        ).order_by(*self.reverse_order)
+
+    def _offset_page(self, number):
+        bottom = (number - 1) * self.per_page
+        return list(self.object_list[bottom:bottom + self.per_page])
+
+    def _fetch(self, params):
+        """Возвращает записи и номер страницы по параметрам запроса.
+
+        Номер 0 означает первую страницу, до которой не нужно искать
+        более новые записи.
+        """
+        after = self._cursor(params.get('after'))
+        if after:
+            items = list(self._after(*after[:2])[:self.per_page])
+            if items:
+                return items, after[2]
+        before = self._cursor(params.get('before'))
+        if before:
+            items = list(self._before(*before[:2])[:self.per_page])
+            if len(items) == self.per_page:
+                return items[::-1], before[2]
+        try:
+            number = int(params.get('page', 1))
+        except (TypeError, ValueError):
+            number = 1
+        number = min(max(number, 1), self.max_offset_page)
+        items = self._offset_page(number) if number > 1 else []
+        if items:
+            return items, number
+        return self._offset_page(1), 0
+
+    def _window(self, items):
+        """Ключи записей на window страниц вперёд и назад от текущей.
+
+        Назад берётся на одну запись больше, чтобы знать, есть ли страницы
+        перед окном.
+        """
+        limit = self.per_page * self.window
+        ahead = list(
+            self._after(*self._key(items[-1]))
+            .values_list(*self.keys)[:limit]
+        )
+        behind = []
+        if self.number:
+            behind = list(
+                self._before(*self._key(items[0]))
+                .values_list(*self.keys)[:limit + 1]
+            )
+        return ahead, behind
+
+    def paginate(self, params):
+        """Возвращает страницу для GET-параметров запроса."""
+        self.params = params.copy()
+        for name in CURSOR_PARAMS:
+            self.params.pop(name, None)
+        items, self.number = self._fetch(params)
+        if not items:
+            self.number = 1
+            self.links = [self._link(1)]
+            return Page(items, 1, self)
+        ahead, behind = self._window(items)
+        reached_top = len(behind) <= self.per_page * self.window
+        behind = behind[:self.per_page * self.window]
+        pages_ahead = ceil(len(ahead) / self.per_page)
+        pages_behind = ceil(len(behind) / self.per_page)
+        if reached_top:
+            self.number = pages_behind + 1
+        else:
+            self.number = max(self.number, pages_behind + 1)
+
+        links = []
+        for step in range(pages_behind, 0, -1):
+            number = self.number - step
+            if reached_top and step == pages_behind:
+                links.append(self._link(number))
+                continue
+            key = behind[self.per_page * (step - 1) - 1] if step > 1 else (
+                self._key(items[0])
+            )
+            links.append(
+                self._link(number, before=encode_cursor(*key, number))
+            )
+        links.append(self._link(self.number))
+        for step in range(1, pages_ahead + 1):
+            number = self.number + step
+            key = ahead[self.per_page * (step - 1) - 1] if step > 1 else (
+                self._key(items[-1])
+            )
+            links.append(
+                self._link(number, after=encode_cursor(*key, number))
+            )
+        self.links = links
+        self.known = (
+            (self.number - 1) * self.per_page + len(items) + len(ahead)
+        )
+        return Page(items, self.number, self)
+
+    def state(self, page):
+        """Положение страницы для restore(): номер, ссылки и id записей."""
+        return (
+            self.number, self.links, self.known,
+            [item.pk for item in page.object_list],
+        )
+
+    def restore(self, params, state):
+        """Страница по сохранённому state() без запросов к базе.
+
+        Записи читаются лениво, при первом обращении к странице.
+        """
+        self.params = params.copy()
+        for name in CURSOR_PARAMS:
+            self.params.pop(name, None)
+        self.number, self.links, self.known, ids = state
+        return Page(self.object_list.filter(pk__in=ids), self.number, self)
+
+    def query_for(self, number):
+        """Строка запроса для страницы из окна или None."""
+        for link in self.links:
+            if link.number == number:
+                return link.query
+        return None
+
+    @property
+    def first_query(self):
+        return self._query()
+
+    @property
+    def previous_query(self):
+        return self.query_for(self.number - 1)
+
+    @property
+    def next_query(self):
+        return self.query_for(self.number + 1)
+
+
+def paginator_context(post_list, request, keys=None):
+    paginator = CursorPaginator(
+        post_list, settings.NUMBER_OF_POSTS, keys=keys
+    )
+    page_obj = paginator.paginate(request.GET)
     return {'page_obj': page_obj}
+
+
+def comments_page(post, params):
+    """Страница комментариев поста по порядку создания."""
+    paginator = CursorPaginator(
+        post.comments.for_listing(),
+        settings.COMMENTS_PER_PAGE,
+        window=1,
+        keys=('created', 'pk'),
+        ascending=True,
+    )
+    return paginator.paginate(params)
@@ -1,54 +1,101 @@
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
 from django.contrib.auth.decorators import login_required
-from .models import Post, Group, User, Follow
-from .forms import PostForm, CommentForm
-from .utils import paginator_context
+from django.db import IntegrityError, transaction
 
+from core.ratelimit import rate_limited
 
+from .models import Post, Follow
+from .forms import PostForm, CommentForm
+from . import (
+    counters, follows, lookups, suggestions, syndication, trending
+)
+from .conditional import (
+    conditional, feed_modified, group_modified, index_modified,
+    post_modified, profile_modified
+)
+from .caching import (
+    group_scope, index_scope, listing_context, profile_scope
+)
+from .feed import feed_posts
+from .search import search_posts
+from .utils import comments_page, paginator_context
+
+
+@conditional(index_modified)
 def index(request):
-    post_list = Post.objects.all()
-    context = paginator_context(post_list, request)
+    context = listing_context(
+        request, Post.objects.for_listing(), index_scope()
+    )
     return render(request, 'posts/index.html/', context)
 
 
+@conditional(group_modified)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
+    group = lookups.groups.get_or_404(slug)
+    post_list = group.posts.for_listing()
     context = {
         'group': group,
+        'counters': counters.for_group(group),
     }
-    context.update(paginator_context(post_list, request))
+    context.update(
+        listing_context(request, post_list, group_scope(group.pk))
+    )
     return render(request, 'posts/group_list.html/', context)
 
 
+def trending_posts(request):
+    context = {'posts': trending.posts()}
+    return render(request, 'posts/trending.html/', context)
+
+
+def group_trending(request, slug):
+    group = lookups.groups.get_or_404(slug)
+    context = {
+        'group': group,
+        'posts': trending.posts(group.pk),
+    }
+    return render(request, 'posts/trending.html/', context)
+
+
+@conditional(profile_modified)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    following = request.user.is_authenticated and Follow.objects.filter(
-        user=request.user,
-        author=author
-    ).exists()
+    author = lookups.users.get_or_404(username)
+    posts = author.posts.for_listing()
+    following = request.user.is_authenticated and follows.is_following(
+        request.user.pk, author.pk
+    )
     context = {
         'author': author,
-        'following': following
+        'following': following,
+        'counters': counters.for_author(author),
+        'suggestions': [
+            suggested for suggested in suggestions.for_user(request.user)
+            if suggested.pk != author.pk
+        ],
     }
-    context.update(paginator_context(posts, request))
+    context.update(
+        listing_context(request, posts, profile_scope(author.pk))
+    )
     return render(request, 'posts/profile.html/', context)
 
 
+@conditional(post_modified)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(Post.objects.for_detail(), pk=post_id)
     form = CommentForm()
     context = {
         'post': post,
-        'comments': post.comments.all(),
-        'form': form
+        'comments': comments_page(post, request.GET),
+        'form': form,
+        'counters': counters.for_post(post),
     }
     return render(request, 'posts/post_detail.html/', context)
 
 
 @login_required
+@rate_limited(methods=('POST',))
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -58,7 +105,8 @@ def post_create(request):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        with transaction.atomic():
+            post.save()
         return redirect('posts:profile', request.user)
     return render(request, 'posts/create_post.html/', {'form': form})
 
@@ -66,7 +114,7 @@ def post_create(request):
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
-    if post.author != request.user:
+    if post.author_id != request.user.pk:
         return redirect('posts:post_detail', post_id=post_id)
 
     form = PostForm(
@@ -75,7 +123,8 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        with transaction.atomic():
+            form.save()
         return redirect('posts:post_detail', post_id=post_id)
     context = {
         'post': post,
@@ -84,7 +133,34 @@ def post_edit(request, post_id):
     return render(request, 'posts/create_post.html/', context)
 
 
+def post_comments(request, post_id):
+    """Страница комментариев для подгрузки: JSON или ?format=html."""
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    params = request.GET.copy()
+    html = params.pop('format', None) == ['html']
+    comments = comments_page(post, params)
+    if html:
+        return render(request, 'posts/includes/comment_list.html', {
+            'post': post,
+            'comments': comments,
+        })
+    return JsonResponse({
+        'comments': [
+            {
+                'id': comment.pk,
+                'author': comment.author.username,
+                'text': comment.text,
+                'created': comment.created.isoformat(),
+            }
+            for comment in comments
+        ],
+        'previous': comments.paginator.previous_query,
+        'next': comments.paginator.next_query,
+    })
+
+
 @login_required
+@rate_limited(methods=('POST',))
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -92,30 +168,62 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
+@conditional(feed_modified)
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    context = paginator_context(posts, request)
+    posts, keys = feed_posts(request.user)
+    context = paginator_context(posts, request, keys=keys)
+    context['suggestions'] = suggestions.for_user(request.user)
     return render(request, 'posts/follow.html/', context)
 
 
 @login_required
+@rate_limited()
 def profile_follow(request, username):
     user = request.user
-    author = get_object_or_404(User, username=username)
-    is_follower = Follow.objects.filter(user=user, author=author)
-    if user != author and not is_follower.exists():
-        Follow.objects.create(user=user, author=author)
+    author = lookups.users.get_or_404(username)
+    if user != author and not follows.is_following(user.pk, author.pk):
+        try:
+            with transaction.atomic():
+                Follow.objects.create(user=user, author=author)
+        except IntegrityError:
+            # Подписки в кеше отстали от базы.
+            follows.forget(user.pk)
     return redirect(reverse('posts:profile', kwargs={'username': author}))
 
 
 @login_required
 def profile_unfollow(request, username):
     user = request.user
-    author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=user, author=author).delete()
+    author = lookups.users.get_or_404(username)
+    with transaction.atomic():
+        Follow.objects.filter(user=user, author=author).delete()
     return redirect(reverse('posts:profile', kwargs={'username': author}))
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    posts, keys = search_posts(query)
+    context = {'query': query}
+    context.update(paginator_context(posts, request, keys=keys))
+    return render(request, 'posts/search.html/', context)
+
+
+@conditional(index_modified)
+def site_feed(request, format):
+    return syndication.SITE_FEEDS[format](request)
+
+
+@conditional(group_modified)
+def group_feed(request, slug, format):
+    return syndication.GROUP_FEEDS[format](request, slug=slug)
+
+
+@conditional(profile_modified)
+def profile_feed(request, username, format):
+    return syndication.AUTHOR_FEEDS[format](request, username=username)
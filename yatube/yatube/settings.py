@@ -29,6 +29,7 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig',
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -39,6 +40,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.LoadSheddingMiddleware',
+    'core.middleware.PrimaryPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,7 +57,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.backends.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -76,11 +80,28 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # sqlite3 с WAL, BEGIN IMMEDIATE и настроенными PRAGMA.
+        'ENGINE': 'core.sqlite',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 600,
     }
 }
 
+# Реплики для чтения: YATUBE_REPLICAS=2 заводит replica1 и replica2 —
+# копии основной базы, которые обновляет команда sync_replicas.
+REPLICA_DATABASES = [
+    f'replica{i}'
+    for i in range(1, int(os.environ.get('YATUBE_REPLICAS', 0)) + 1)
+]
+for alias in REPLICA_DATABASES:
+    DATABASES[alias] = {
+        'ENGINE': 'core.sqlite',
+        'NAME': os.path.join(BASE_DIR, f'db.{alias}.sqlite3'),
+        'CONN_MAX_AGE': 600,
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -135,9 +156,139 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 NUMBER_OF_POSTS = 10
-
+# Постов в RSS и Atom лентах.
+SYNDICATION_ITEMS = 20
+
+# default общий для всех процессов машины: через него процессы узнают
+# о сбросах словарей posts.lookups, читают общие версии списков, графы
+# подписок. Кеш в памяти процесса здесь не подходит.
+# Если машин несколько, default должен быть общим и для них, например
+# memcached.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.backends.TimedFileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, '.cache', 'default'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # Корзины core.ratelimit: общие, как default, но отдельно от него,
+    # чтобы фрагменты списков не вытесняли их и не обнуляли лимиты.
+    'ratelimit': {
+        'BACKEND': 'core.backends.TimedFileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, '.cache', 'ratelimit'),
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+    # Копии страниц для сброса нагрузки: отдельно, чтобы они не
+    # вытесняли из default версии списков.
+    'stale': {
+        'BACKEND': 'core.backends.TimedLocMemCache',
+        'LOCATION': 'stale-pages',
+        'OPTIONS': {'MAX_ENTRIES': 500},
+    },
+}
+
+# Тесты чистят кеш, поэтому идут на временных файловых кешах, а не на
+# кешах работающего сайта.
+TEST_RUNNER = 'core.testing.IsolatedCachesRunner'
+
+# Ссылки на соседние страницы по обе стороны от текущей.
+PAGINATOR_WINDOW = 2
+# Комментарии на странице поста и в одной подгрузке.
+COMMENTS_PER_PAGE = 20
+# Дальше этой страницы старые ссылки ?page=N не обслуживаются.
+PAGINATOR_MAX_OFFSET_PAGE = 50
+
+# Авторы, у которых подписчиков больше, не раскладываются по лентам.
+FEED_FANOUT_LIMIT = 1000
+# Сколько последних постов автора попадает в ленту при подписке.
+FEED_BACKFILL_SIZE = 200
+FEED_BATCH_SIZE = 500
+# Сколько хранить в кеше подписки пользователя и список авторов из
+# PulledAuthor.
+FOLLOW_GRAPH_TIMEOUT = 60 * 60
+# Рекомендаций подписок: хранится на пользователя и видно на странице.
+FOLLOW_SUGGESTIONS_STORED = 20
+FOLLOW_SUGGESTIONS_SHOWN = 5
+
+# «Популярное»: вклад комментария убывает вдвое за TRENDING_HALF_LIFE
+# секунд, rollup_trending учитывает комментарии за TRENDING_WINDOW. На
+# странице до TRENDING_SIZE постов, топ живёт в кеше
+# TRENDING_CACHE_TIMEOUT секунд.
+TRENDING_HALF_LIFE = 6 * 60 * 60
+TRENDING_WINDOW = 3 * 24 * 60 * 60
+TRENDING_SIZE = 30
+TRENDING_CACHE_TIMEOUT = 60
+
+# Фрагменты со списками постов сбрасываются версией, а не таймаутом.
+LISTING_CACHE_TIMEOUT = 60 * 60
+
+# Миниатюры готовятся в пуле процессов; 0 — создавать прямо в запросе.
+THUMBNAIL_BACKEND = 'posts.thumbnails.PregeneratedThumbnailBackend'
+THUMBNAIL_WORKERS = 2
+
+# Загруженные картинки уменьшаются до этой стороны и пересохраняются
+# без EXIF; больше IMAGE_MAX_PIXELS пикселей не принимаются вовсе.
+IMAGE_MAX_SIZE = 1920
+IMAGE_MAX_PIXELS = 50_000_000
+IMAGE_QUALITY = 85
+# Дополнительные форматы миниатюр для <picture>, если их умеет Pillow.
+IMAGE_VARIANT_FORMATS = ('AVIF', 'WEBP')
+
+# Кеш групп и пользователей по адресу в памяти процесса: сколько хранить
+# найденную строку и 404, как часто сверять версию с другими процессами
+# и сколько строк держать.
+LOOKUP_CACHE_TIMEOUT = 5 * 60
+LOOKUP_NEGATIVE_TIMEOUT = 30
+LOOKUP_VERSION_CHECK = 1
+LOOKUP_CACHE_SIZE = 10_000
+
+# Записей на странице API и предел ?ids= за один запрос.
+API_PAGE_SIZE = 20
+API_MAX_IDS = 100
+
+# Сброс нагрузки: предел запросов в работе у процесса и сглаженного
+# ожидания в очереди, в секундах. Адрес из SHED_RULES сбрасывается, когда
+# нагрузка превысила его долю пределов: 'stale' отдаёт гостю сохранённую
+# копию страницы не старше SHED_STALE_TIMEOUT, а без неё, как и 'reject',
+# — 503 с Retry-After. Копия в кеше 'stale' обновляется не чаще раза в
+# SHED_STALE_REFRESH секунд.
+SHED_MAX_IN_FLIGHT = 16
+# Ставит ли прокси перед сайтом X-Request-Start. Без прокси заголовок
+# приходит от клиента, и верить ему нельзя.
+SHED_TRUST_REQUEST_START = False
+SHED_MAX_QUEUE_WAIT = 1.0
+SHED_RETRY_AFTER = 5
+SHED_STALE_TIMEOUT = 10 * 60
+SHED_STALE_REFRESH = 30
+SHED_RULES = {
+    'posts:search': ('reject', 0.5),
+    'posts:site_feed': ('reject', 0.5),
+    'posts:group_feed': ('reject', 0.5),
+    'posts:profile_feed': ('reject', 0.5),
+    'posts:comments': ('reject', 0.75),
+    'posts:index': ('stale', 0.75),
+    'posts:follow_index': ('reject', 0.75),
+    'posts:trending': ('stale', 0.75),
+    'posts:group_trending': ('stale', 0.75),
+    'posts:group_list': ('stale', 0.9),
+    'posts:profile': ('stale', 0.9),
 }
+
+# Частота записи: адрес → {'user' | 'ip': (запросов, за секунд)}. Сверх
+# неё запросы получают 429; IP берётся из request.META[RATE_LIMIT_IP_META],
+# за прокси — из заголовка, который он ставит, например HTTP_X_REAL_IP.
+RATE_LIMITS = {
+    'posts:add_comment': {'user': (20, 60), 'ip': (60, 60)},
+    'posts:post_create': {'user': (10, 60), 'ip': (30, 60)},
+    'posts:profile_follow': {'user': (30, 60), 'ip': (90, 60)},
+}
+RATE_LIMIT_IP_META = 'REMOTE_ADDR'
+
+# Сколько последних запросов каждого адреса входит в сводку /timings/.
+TIMING_WINDOW = 1000
+
+# Насколько реплики могут отставать; столько живут списки постов,
+# собранные по данным реплики.
+REPLICA_MAX_LAG = 30
+# Сколько секунд после записи пользователь читает из основной базы.
+# Меньше REPLICA_MAX_LAG не бывает: routers.pin_seconds() берёт большее.
+PRIMARY_PIN_SECONDS = REPLICA_MAX_LAG